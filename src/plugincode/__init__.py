@@ -17,6 +17,8 @@ from pluggy import PluginManager as PluggyPluginManager
 
 from commoncode import cliutils
 
+from plugincode.tracing import tracer
+
 # Tracing flags
 TRACE = False
 
@@ -67,6 +69,12 @@ class BasePlugin(object):
     # is determined by the sort_order then the plugin name
     resource_attributes = dict()
 
+    # A list of scalar (int, float or bool) attribute names from
+    # resource_attributes that can be copied in typed array columns indexed by
+    # Resource for vectorized aggregations. See plugincode.columnar.
+    # Subclasses should set this as needed.
+    columnar_resource_attributes = []
+
     # List of PluggableCommandLineOption CLI options for this plugin.
     # Subclasses should set this as needed
     options = []
@@ -93,6 +101,23 @@ class BasePlugin(object):
     # Subclasses should set this as needed.
     required_resource_attributes = []
 
+    # A list of existing Codebase attribute name strings that this plugin
+    # updates in addition to its own declared codebase_attributes.
+    # This is used to compute which plugins of a stage can run concurrently: a
+    # plugin that does not declare any attribute it writes never runs
+    # concurrently with another plugin.
+    # Subclasses should set this as needed.
+    updated_codebase_attributes = []
+
+    # A list of existing Resource attribute name strings (such as "is_filtered")
+    # that this plugin updates in addition to its own declared
+    # resource_attributes.
+    # This is used to compute which plugins of a stage can run concurrently: a
+    # plugin that does not declare any attribute it writes never runs
+    # concurrently with another plugin.
+    # Subclasses should set this as needed.
+    updated_resource_attributes = []
+
     # A relative sort order number (integer or float).
     # This is used in scan results, results from scanners are sorted by
     # this sort_order then by plugin "name".
@@ -150,6 +175,13 @@ class CodebasePlugin(BasePlugin):
     Base class for plugins that process a whole codebase at once.
     """
 
+    # Flag set to True if the attributes computed by this plugin for a Resource
+    # depend on the Resource descendants, such as summaries or counts
+    # aggregated up the directory tree. This is used by incremental
+    # re-execution to also recompute the ancestors of changed Resources.
+    # Subclasses should set this as needed.
+    aggregates_descendants = False
+
     def process_codebase(self, codebase, **kwargs):
         """
         Process a `codebase` Codebase object updating its Resources as needed.
@@ -158,6 +190,56 @@ class CodebasePlugin(BasePlugin):
         """
         raise NotImplementedError
 
+    def process_resource(self, resource, **kwargs):
+        """
+        Process a single `resource` and return a mapping of {attribute name:
+        value} of updates to apply to this resource or None if there are no
+        updates. Subclasses can override optionally when their processing is a
+        "for each resource, compute X" such that the engine can process the
+        resources in parallel and apply the returned updates in batch.
+        This receives all the ScanCode call arguments as kwargs.
+
+        The `resource` is a read-only ResourceView with the essential Resource
+        attributes (path, name, location, is_file, size, etc.) and only the
+        attributes listed in `required_resource_attributes`. The returned
+        attribute names must be declared in `resource_attributes` or
+        `updated_resource_attributes`.
+
+        This method may be executed through multiprocessing: the plugin and the
+        kwargs must be picklable.
+        """
+        raise NotImplementedError
+
+    @classmethod
+    def has_process_resource(cls):
+        """
+        Return True if this plugin implements process_resource().
+        """
+        return cls.process_resource is not CodebasePlugin.process_resource
+
+    def get_visitors(self, **kwargs):
+        """
+        Return a tuple of (pre-order visitor, post-order visitor) callables
+        where either can be None. Subclasses can override optionally when their
+        processing is a walk of the codebase such that the engine can run all
+        the visitors of a stage in a single codebase traversal.
+        This receives all the ScanCode call arguments as kwargs.
+
+        A visitor accepts two `resource` and `codebase` arguments and returns
+        True if it modified the `resource` (that the engine then saves). The
+        pre-order visitor is called on a Resource before its descendants and
+        the post-order visitor after its descendants (for instance to aggregate
+        data of the children of a Resource).
+        """
+        raise NotImplementedError
+
+    @classmethod
+    def has_visitors(cls):
+        """
+        Return True if this plugin implements get_visitors().
+        """
+        return cls.get_visitors is not CodebasePlugin.get_visitors
+
 
 class PluginManager(object):
     """
@@ -180,6 +262,7 @@ class PluginManager(object):
         self.entrypoint = entrypoint
         self.plugin_base_class = plugin_base_class
         self.manager.add_hookspecs(sys.modules[module_qname])
+        tracer.register_manager(self.manager)
 
         # set to True once this manager is initialized by running its setup()
         self.initialized = False
@@ -196,7 +279,8 @@ class PluginManager(object):
         plugin_classes = []
         plugin_options = []
         for stage, manager in cls.managers.items():
-            mgr_setup = manager.setup()
+            with tracer.span("load_plugins", stage=stage):
+                mgr_setup = manager.setup()
             if not mgr_setup:
                 msg = "Cannot load plugins for stage: %(stage)s" % locals()
                 raise PlugincodeError(msg)
@@ -220,7 +304,8 @@ class PluginManager(object):
 
         entrypoint = self.entrypoint
         try:
-            self.manager.load_setuptools_entrypoints(entrypoint)
+            with tracer.span("load_setuptools_entrypoints", entrypoint=entrypoint):
+                self.manager.load_setuptools_entrypoints(entrypoint)
         except ImportError as e:
             raise e
         stage = self.stage
@@ -0,0 +1,253 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/plugincode for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+
+"""
+Mergeable accumulators to compute codebase-level summaries during a scan.
+
+A ScanPlugin can return accumulators from its get_accumulators() method as a
+mapping of {codebase attribute name: Accumulator}. Each scan worker folds the
+scan results of each Resource in its own empty copy of these accumulators and
+the parent process merges these partial states as they come back. The
+summaries are then stored as Codebase attributes when the scan ends without
+another pass over all the Resources.
+
+An Accumulator reads one `attribute` of the mapping returned by a scanner. A
+list value is folded item by item. An optional `key` callable (which must be
+picklable, such as a top-level function) computes the value to fold from each
+item.
+"""
+
+import heapq
+from collections import Counter
+
+from plugincode import PlugincodeError
+from plugincode.timing import LogHistogram
+
+
+class Accumulator(object):
+    """
+    Base class for mergeable accumulators. Subclasses must implement add(),
+    merge() and summary().
+    """
+
+    def __init__(self, attribute, key=None):
+        self.attribute = attribute
+        self.key = key
+
+    def empty(self):
+        """
+        Return a new empty accumulator with the same settings as this one.
+        """
+        raise NotImplementedError
+
+    def fold(self, scan_result):
+        """
+        Fold the `attribute` value of a `scan_result` mapping in this
+        accumulator.
+        """
+        values = scan_result.get(self.attribute)
+        if values is None:
+            return
+        if not isinstance(values, (list, tuple)):
+            values = [values]
+        key = self.key
+        for value in values:
+            if key:
+                value = key(value)
+            if value is not None:
+                self.add(value)
+
+    def add(self, value):
+        raise NotImplementedError
+
+    def merge(self, other):
+        """
+        Merge the state of an `other` accumulator of the same type in this
+        accumulator.
+        """
+        raise NotImplementedError
+
+    def summary(self):
+        """
+        Return a JSON-serializable summary of this accumulator.
+        """
+        raise NotImplementedError
+
+
+class CounterAccumulator(Accumulator):
+    """
+    Count the occurrences of each value.
+    """
+
+    def __init__(self, attribute, key=None):
+        super(CounterAccumulator, self).__init__(attribute, key)
+        self.counts = Counter()
+
+    def empty(self):
+        return CounterAccumulator(self.attribute, self.key)
+
+    def add(self, value):
+        self.counts[value] += 1
+
+    def merge(self, other):
+        self.counts.update(other.counts)
+
+    def summary(self):
+        """
+        Return a list of {value, count} mappings sorted by decreasing count.
+        """
+        items = sorted(self.counts.items(), key=lambda vc: (-vc[1], str(vc[0])))
+        return [dict(value=value, count=count) for value, count in items]
+
+
+class SetAccumulator(Accumulator):
+    """
+    Collect the set of distinct values.
+    """
+
+    def __init__(self, attribute, key=None):
+        super(SetAccumulator, self).__init__(attribute, key)
+        self.values = set()
+
+    def empty(self):
+        return SetAccumulator(self.attribute, self.key)
+
+    def add(self, value):
+        self.values.add(value)
+
+    def merge(self, other):
+        self.values.update(other.values)
+
+    def summary(self):
+        return sorted(self.values, key=str)
+
+
+class TopKAccumulator(Accumulator):
+    """
+    Keep the `k` largest values.
+    """
+
+    def __init__(self, attribute, k=10, key=None):
+        super(TopKAccumulator, self).__init__(attribute, key)
+        self.k = k
+        # min-heap of the k largest values
+        self.heap = []
+
+    def empty(self):
+        return TopKAccumulator(self.attribute, self.k, self.key)
+
+    def add(self, value):
+        if len(self.heap) < self.k:
+            heapq.heappush(self.heap, value)
+        elif value > self.heap[0]:
+            heapq.heapreplace(self.heap, value)
+
+    def merge(self, other):
+        for value in other.heap:
+            self.add(value)
+
+    def summary(self):
+        return sorted(self.heap, reverse=True)
+
+
+class HistogramAccumulator(Accumulator):
+    """
+    Count positive numeric values (such as sizes) in a LogHistogram.
+    """
+
+    def __init__(self, attribute, key=None, min_value=1, growth=2):
+        super(HistogramAccumulator, self).__init__(attribute, key)
+        self.histogram = LogHistogram(min_value=min_value, growth=growth)
+
+    def empty(self):
+        histogram = self.histogram
+        return HistogramAccumulator(
+            self.attribute, self.key, min_value=histogram.min_value, growth=histogram.growth
+        )
+
+    def add(self, value):
+        self.histogram.add(value)
+
+    def merge(self, other):
+        self.histogram.merge(other.histogram)
+
+    def summary(self):
+        return self.histogram.to_dict()
+
+
+class Accumulators(object):
+    """
+    A mapping of {codebase attribute name: Accumulator} for all the plugins of
+    a scan.
+    """
+
+    def __init__(self, accumulators=None):
+        self.accumulators = dict(accumulators or {})
+
+    def __len__(self):
+        return len(self.accumulators)
+
+    def empty(self):
+        """
+        Return a new empty Accumulators, such as to fold scan results in a
+        worker process.
+        """
+        return Accumulators({name: acc.empty() for name, acc in self.accumulators.items()})
+
+    def fold(self, scan_result):
+        """
+        Fold a Resource `scan_result` mapping in all the accumulators.
+        """
+        for accumulator in self.accumulators.values():
+            accumulator.fold(scan_result)
+
+    def merge(self, other):
+        """
+        Merge an `other` partial Accumulators state in this one.
+        """
+        for name, accumulator in other.accumulators.items():
+            mine = self.accumulators.get(name)
+            if mine is None:
+                self.accumulators[name] = mine = accumulator.empty()
+            mine.merge(accumulator)
+
+    def to_dict(self):
+        return {name: acc.summary() for name, acc in sorted(self.accumulators.items())}
+
+    def set_codebase_attributes(self, codebase):
+        """
+        Store each accumulator summary in the `codebase` attribute of the same
+        name.
+        """
+        for name, summary in self.to_dict().items():
+            setattr(codebase.attributes, name, summary)
+
+
+def get_accumulators(plugins, **kwargs):
+    """
+    Return an Accumulators for the accumulators of a list of ScanPlugin
+    `plugins` instances. Raise a PlugincodeError if an accumulator name is not a
+    declared codebase attribute of its plugin or if two plugins use the same
+    name.
+    This receives all the ScanCode call arguments as kwargs.
+    """
+    accumulators = {}
+    for plugin in plugins:
+        plugin_accumulators = plugin.get_accumulators(**kwargs) or {}
+        for name, accumulator in plugin_accumulators.items():
+            if name not in (plugin.codebase_attributes or {}):
+                raise PlugincodeError(
+                    "Invalid plugin: {}: accumulator {!r} is not a declared "
+                    "codebase attribute.".format(plugin.qname(), name)
+                )
+            if name in accumulators:
+                raise PlugincodeError(
+                    "Invalid plugin: {}: accumulator {!r} is already used by "
+                    "another plugin.".format(plugin.qname(), name)
+                )
+            accumulators[name] = accumulator
+    return Accumulators(accumulators)
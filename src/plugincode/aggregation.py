@@ -0,0 +1,130 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/plugincode for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+
+"""
+Bottom-up aggregation of Resource data up the Codebase directory tree.
+
+A per-Resource `mapper` function computes a value for each Resource and an
+associative `reducer` function combines two values. All the directory
+aggregates are computed in a single post-order pass over a compact array of
+parent indexes built from one top-down walk of the codebase.
+"""
+
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+
+
+class TreeIndex(object):
+    """
+    A compact index of a codebase tree: the Resource paths in top-down walk
+    (pre-order) order and an array of the index of each Resource parent (-1 for
+    the root). In pre-order, the descendants of a Resource always come after
+    this Resource.
+    """
+
+    def __init__(self):
+        self.paths = []
+        self.parents = array("l")
+        self.is_file = array("b")
+        self._index_by_path = {}
+
+    def __len__(self):
+        return len(self.paths)
+
+    def walk(self, codebase):
+        """
+        Yield the Resources of a `codebase` walked top-down, adding each
+        Resource to this index.
+        """
+        index_by_path = self._index_by_path
+        for resource in codebase.walk(topdown=True):
+            path = resource.path
+            index_by_path[path] = len(self.paths)
+            self.paths.append(path)
+            self.is_file.append(resource.is_file)
+            parent_index = -1
+            if not resource.is_root:
+                parent_index = index_by_path.get(resource.parent_path(), -1)
+            self.parents.append(parent_index)
+            yield resource
+        self._index_by_path = {}
+
+    @classmethod
+    def from_codebase(cls, codebase):
+        """
+        Return a new TreeIndex for a `codebase`.
+        """
+        tree_index = cls()
+        for _resource in tree_index.walk(codebase):
+            pass
+        return tree_index
+
+
+def aggregate_tree(codebase, mapper, reducer, max_workers=0):
+    """
+    Return a tuple of (TreeIndex, list of aggregates) for a `codebase` where
+    each aggregate is the value of the Resource at the same index in the
+    TreeIndex combined with the aggregates of all its descendants.
+
+    `mapper` accepts a Resource and returns its own value or None if it has no
+    value. `reducer` accepts two values and returns their combination. It must
+    be associative: values are always combined in the walk order.
+
+    If `max_workers` is more than one, `mapper` is called on file Resources
+    using a pool of `max_workers` threads (which is useful for a `mapper` that
+    does I/O or releases the GIL).
+    """
+    tree_index = TreeIndex()
+    if max_workers and max_workers > 1:
+        values = []
+        files = []
+        for resource in tree_index.walk(codebase):
+            if resource.is_file:
+                files.append((len(values), resource))
+                values.append(None)
+            else:
+                values.append(mapper(resource))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            mapped = executor.map(mapper, (resource for _, resource in files))
+            for (index, _), value in zip(files, mapped):
+                values[index] = value
+    else:
+        values = [mapper(resource) for resource in tree_index.walk(codebase)]
+
+    parents = tree_index.parents
+    # combined aggregates of the children of each Resource in walk order
+    children_aggregates = {}
+    # iterate in reverse pre-order: all the descendants of a Resource are
+    # processed before this Resource.
+    for index in range(len(values) - 1, -1, -1):
+        value = values[index]
+        children = children_aggregates.pop(index, None)
+        if children is not None:
+            value = children if value is None else reducer(value, children)
+            values[index] = value
+
+        parent = parents[index]
+        if parent < 0 or value is None:
+            continue
+        siblings = children_aggregates.get(parent)
+        # siblings are processed in reverse order: prepend to keep walk order
+        children_aggregates[parent] = value if siblings is None else reducer(value, siblings)
+
+    return tree_index, values
+
+
+def save_aggregates(codebase, tree_index, aggregates, attribute, skip_files=False):
+    """
+    Save `aggregates` computed with aggregate_tree() in the `attribute` of the
+    Resources of a `codebase`. Skip file Resources if `skip_files` is True.
+    """
+    for path, is_file, value in zip(tree_index.paths, tree_index.is_file, aggregates):
+        if skip_files and is_file:
+            continue
+        resource = codebase.get_resource(path)
+        setattr(resource, attribute, value)
+        codebase.save_resource(resource)
@@ -0,0 +1,340 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/plugincode for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+
+"""
+Columnar Parquet and Arrow IPC output of scan results for analytics tools.
+
+The serialized files of a codebase are converted to columns in row groups of a
+fixed number of files as the codebase walk proceeds, such that memory stays
+bounded by the size of a row group. Scalar values become scalar columns, lists
+become list columns and mappings become struct columns.
+
+The standard Resource fields have fixed types and the types of the other columns
+are inferred from their values unless an explicit schema is provided. A column
+whose values are all empty or None (such as empty lists) has a null type that
+is widened when real values show up: row groups are kept pending (up to a few
+row groups) until all the column types are known. Once the first row group is
+written the schema is fixed, and a PlugincodeError is raised for new columns,
+new mapping keys or values that do not fit the schema: use an explicit schema
+in these cases.
+
+pyarrow is an optional dependency: a PlugincodeError is raised when writing
+columnar output and pyarrow is not installed.
+"""
+
+from plugincode import PlugincodeError
+from plugincode.execution import chunked
+from plugincode.output import OutputPlugin
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+# Tracing flags
+TRACE = False
+
+
+def logger_debug(*args):
+    pass
+
+
+if TRACE:
+    import logging
+    import sys
+
+    logger = logging.getLogger(__name__)
+    logging.basicConfig(stream=sys.stdout)
+    logger.setLevel(logging.DEBUG)
+
+    def logger_debug(*args):
+        return logger.debug(" ".join(isinstance(a, str) and a or repr(a) for a in args))
+
+
+FORMATS = ("parquet", "arrow")
+
+
+def get_column_names(files):
+    """
+    Return a list of the column names of a list of `files` mappings in the
+    order of their first occurrence.
+    """
+    names = {}
+    for file_data in files:
+        for name in file_data:
+            names[name] = None
+    return list(names)
+
+
+def to_columns(files, names):
+    """
+    Return a mapping of {column name: list of values} for a list of `files`
+    mappings and a list of column `names`. Missing values are None.
+    For example:
+    >>> to_columns([dict(path="a", size=1), dict(path="b")], ["path", "size"])
+    {'path': ['a', 'b'], 'size': [1, None]}
+    """
+    return {name: [file_data.get(name) for file_data in files] for name in names}
+
+
+def get_resource_types():
+    """
+    Return a mapping of {column name: pyarrow type} for the standard Resource
+    fields of the serialized files.
+    """
+    string = pyarrow.string()
+    int64 = pyarrow.int64()
+    return dict(
+        path=string,
+        type=string,
+        name=string,
+        base_name=string,
+        extension=string,
+        size=int64,
+        files_count=int64,
+        dirs_count=int64,
+        size_count=int64,
+        scan_time=pyarrow.float64(),
+        scan_timings=pyarrow.map_(string, pyarrow.float64()),
+        scan_errors=pyarrow.list_(string),
+    )
+
+
+def needs_inference(arrow_type):
+    """
+    Return True if the values of an `arrow_type` column must be converted with
+    an inferred type: null types are widened and mapping keys are checked.
+    """
+    if pyarrow.types.is_null(arrow_type) or pyarrow.types.is_struct(arrow_type):
+        return True
+    if pyarrow.types.is_list(arrow_type):
+        return needs_inference(arrow_type.value_type)
+    return False
+
+
+def needs_null_widening(arrow_type):
+    """
+    Return True if an `arrow_type` is or contains a null type.
+    """
+    if pyarrow.types.is_null(arrow_type):
+        return True
+    if pyarrow.types.is_list(arrow_type):
+        return needs_null_widening(arrow_type.value_type)
+    if pyarrow.types.is_struct(arrow_type):
+        return any(needs_null_widening(field.type) for field in arrow_type)
+    return False
+
+
+class ColumnarOutputPlugin(OutputPlugin):
+    """
+    Base class for output plugins that write the files of a codebase as
+    columnar row groups. Subclasses set the `columnar_format` and must provide
+    a CLI option to pass a binary `output` file.
+    """
+
+    # one of "parquet" or "arrow"
+    columnar_format = "parquet"
+
+    # number of files in each row group
+    row_group_size = 10000
+
+    # optional pyarrow.Schema of all the files columns, inferred if None
+    columnar_schema = None
+
+    def process_codebase(self, codebase, output, **kwargs):
+        self.write_columnar_files(
+            codebase,
+            output,
+            columnar_format=self.columnar_format,
+            row_group_size=self.row_group_size,
+            schema=self.columnar_schema,
+            **kwargs,
+        )
+
+    @classmethod
+    def write_columnar_files(
+        cls,
+        codebase,
+        output_file,
+        columnar_format="parquet",
+        row_group_size=10000,
+        schema=None,
+        **kwargs,
+    ):
+        """
+        Write the files of a `codebase` to the `output_file` path or binary
+        file-like object in the `columnar_format` with row groups of
+        `row_group_size` files. Return the number of files written.
+        """
+        writer = ColumnarWriter(output_file, columnar_format=columnar_format, schema=schema)
+        count = 0
+        try:
+            for files in chunked(cls.get_files(codebase, **kwargs), row_group_size):
+                writer.write_row_group(files)
+                count += len(files)
+        finally:
+            writer.close()
+        return count
+
+
+def merge_types(known, inferred, name, allow_new_keys=True):
+    """
+    Return a pyarrow type that can hold values of both the `known` type and
+    the `inferred` type of a column `name`: null types are widened, integers
+    are widened to floats and the keys of structs are merged if
+    `allow_new_keys` is True. Raise a PlugincodeError if the types cannot be
+    merged.
+    """
+    types = pyarrow.types
+    if known is None or types.is_null(known):
+        return inferred
+    if types.is_null(inferred) or known == inferred:
+        return known
+    if types.is_list(known) and types.is_list(inferred):
+        value_type = merge_types(known.value_type, inferred.value_type, name, allow_new_keys)
+        return pyarrow.list_(value_type)
+    if types.is_struct(known) and types.is_struct(inferred):
+        fields = {field.name: field.type for field in known}
+        for field in inferred:
+            if field.name in fields:
+                fields[field.name] = merge_types(
+                    fields[field.name], field.type, name, allow_new_keys
+                )
+            elif allow_new_keys:
+                fields[field.name] = field.type
+            else:
+                raise PlugincodeError(
+                    "Unknown key {!r} in column {!r}, "
+                    "use an explicit schema instead.".format(field.name, name)
+                )
+        return pyarrow.struct(list(fields.items()))
+    if types.is_floating(known) and types.is_integer(inferred):
+        return known
+    if types.is_integer(known) and types.is_floating(inferred):
+        return inferred
+    raise PlugincodeError(
+        "Incompatible types for column {!r}: {} and {}, "
+        "use an explicit schema instead.".format(name, known, inferred)
+    )
+
+
+class ColumnarWriter(object):
+    """
+    Write row groups of serialized files to the `output_file` path or binary
+    file-like object in the `columnar_format` "parquet" or "arrow" (the Arrow
+    IPC file format) using an optional pyarrow `schema`. Without a schema, up
+    to `max_pending_row_groups` row groups are kept pending until no column has
+    a null type.
+    """
+
+    def __init__(
+        self, output_file, columnar_format="parquet", schema=None, max_pending_row_groups=4
+    ):
+        if pyarrow is None:
+            raise PlugincodeError("Columnar output requires pyarrow which is not installed.")
+        if columnar_format not in FORMATS:
+            raise PlugincodeError("Unknown columnar format: {!r}".format(columnar_format))
+        self.output_file = output_file
+        self.columnar_format = columnar_format
+        self.schema = schema
+        self.max_pending_row_groups = max_pending_row_groups
+        # an explicit schema is fixed
+        self.fixed = schema is not None
+        # mapping of {column name: pyarrow type} in column order
+        self.types = dict(zip(schema.names, schema.types)) if schema is not None else {}
+        self.resource_types = get_resource_types()
+        # list of ({column name: pyarrow array}, number of rows) not written yet
+        self.pending = []
+        self.writer = None
+
+    def _open(self):
+        self.fixed = True
+        if self.schema is None:
+            self.schema = pyarrow.schema(list(self.types.items()))
+        if TRACE:
+            logger_debug("ColumnarWriter: schema:", self.schema)
+        if self.columnar_format == "parquet":
+            self.writer = pyarrow.parquet.ParquetWriter(self.output_file, self.schema)
+        else:
+            self.writer = pyarrow.ipc.new_file(self.output_file, self.schema)
+
+    def _to_array(self, name, values):
+        """
+        Return a pyarrow array for the `values` of the column `name` and update
+        the type of this column.
+        """
+        known = self.types.get(name)
+        if known is None:
+            if self.fixed:
+                raise PlugincodeError(
+                    "Unknown column {!r}, use an explicit schema instead.".format(name)
+                )
+            known = self.resource_types.get(name)
+
+        if known is not None and not needs_inference(known):
+            array = pyarrow.array(values, type=known)
+        else:
+            array = pyarrow.array(values)
+            merged = merge_types(known, array.type, name, allow_new_keys=not self.fixed)
+            if self.fixed and merged != known:
+                raise PlugincodeError(
+                    "Cannot widen column {!r} from {} to {} after the first row group "
+                    "is written, use an explicit schema instead.".format(name, known, merged)
+                )
+            known = merged
+        self.types[name] = known
+        return array
+
+    def write_row_group(self, files):
+        """
+        Write a list of `files` mappings as one row group.
+        """
+        arrays = {}
+        for name, values in to_columns(files, get_column_names(files)).items():
+            try:
+                arrays[name] = self._to_array(name, values)
+            except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError) as e:
+                raise PlugincodeError(
+                    "Cannot convert column {!r} to the columnar schema, "
+                    "use an explicit schema instead: {}".format(name, e)
+                ) from e
+        self.pending.append((arrays, len(files)))
+
+        if self.writer is None:
+            has_null_types = any(needs_null_widening(t) for t in self.types.values())
+            if not has_null_types or len(self.pending) >= self.max_pending_row_groups:
+                self._open()
+        if self.writer is not None:
+            self._write_pending()
+
+    def _write_pending(self):
+        schema = self.schema
+        for arrays, rows_count in self.pending:
+            columns = []
+            for field in schema:
+                array = arrays.get(field.name)
+                if array is None:
+                    array = pyarrow.nulls(rows_count, type=field.type)
+                elif array.type != field.type:
+                    array = array.cast(field.type)
+                columns.append(array)
+            self.writer.write_table(pyarrow.Table.from_arrays(columns, schema=schema))
+        self.pending = []
+
+    def close(self):
+        """
+        Write the pending row groups and close the writer. Write an empty table
+        if no row group was written and a schema is known.
+        """
+        if self.writer is None and self.types:
+            self._open()
+        if self.writer is not None:
+            self._write_pending()
+            self.writer.close()
@@ -0,0 +1,206 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/plugincode for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+
+"""
+Binary length-prefixed record streams of scan results encoded with msgpack or
+CBOR.
+
+A stream starts with a magic marker, a format version and a codec id byte. It
+is followed by records, each made of a one byte record kind, a four bytes
+big-endian payload length and the encoded payload. The record kinds are:
+
+- "H" for the scan headers (a list of mappings).
+- "F" for one serialized file mapping.
+- "S" for the codebase attributes (such as summaries) as a mapping.
+
+Records can be read one at a time and skipped without decoding. The msgpack and
+cbor2 libraries are optional dependencies: a PlugincodeError is raised when
+using a codec whose library is not installed.
+"""
+
+import struct
+
+import attr
+
+from plugincode import PlugincodeError
+from plugincode.output import OutputPlugin
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+
+
+MAGIC = b"PLCB"
+VERSION = 1
+
+HEADERS = b"H"
+FILE = b"F"
+SUMMARY = b"S"
+
+# mapping of {codec name: codec id}
+CODEC_IDS = {"msgpack": 1, "cbor": 2}
+
+_record_header = struct.Struct(">cI")
+
+
+def get_codec(name):
+    """
+    Return a tuple of (dumps, loads) functions for the codec `name` (one of
+    "msgpack" or "cbor"). Raise a PlugincodeError if it is not available.
+    """
+    if name == "msgpack" and msgpack is not None:
+        packer = msgpack.Packer(use_bin_type=True)
+        return packer.pack, lambda data: msgpack.unpackb(data, raw=False, strict_map_key=False)
+    if name == "cbor" and cbor2 is not None:
+        return cbor2.dumps, cbor2.loads
+    raise PlugincodeError("Binary codec is not available: {!r}".format(name))
+
+
+class RecordWriter(object):
+    """
+    Write a binary record stream to the `output_file` binary file-like object
+    using the `codec` name.
+    """
+
+    def __init__(self, output_file, codec="msgpack"):
+        self.output_file = output_file
+        self.dumps, _loads = get_codec(codec)
+        output_file.write(MAGIC + bytes([VERSION, CODEC_IDS[codec]]))
+
+    def write(self, kind, data):
+        payload = self.dumps(data)
+        self.output_file.write(_record_header.pack(kind, len(payload)) + payload)
+
+    def write_headers(self, headers):
+        self.write(HEADERS, headers)
+
+    def write_file(self, file_data):
+        self.write(FILE, file_data)
+
+    def write_files(self, files):
+        """
+        Write the `files` iterable of serialized files mappings and return the
+        number of files written.
+        """
+        count = 0
+        for file_data in files:
+            self.write(FILE, file_data)
+            count += 1
+        return count
+
+    def write_summary(self, summary):
+        self.write(SUMMARY, summary)
+
+
+def iter_records(input_file, kinds=None):
+    """
+    Yield tuples of (record kind, decoded data) read one at a time from the
+    `input_file` binary file-like object of a record stream. If `kinds` is a
+    set of record kinds, skip the other records without decoding them.
+    """
+    marker = input_file.read(len(MAGIC) + 2)
+    if len(marker) != len(MAGIC) + 2 or marker[: len(MAGIC)] != MAGIC:
+        raise PlugincodeError("Not a binary scan record stream.")
+    version, codec_id = marker[len(MAGIC)], marker[len(MAGIC) + 1]
+    if version != VERSION:
+        raise PlugincodeError("Unsupported binary record stream version: {}".format(version))
+    codecs = {cid: name for name, cid in CODEC_IDS.items()}
+    if codec_id not in codecs:
+        raise PlugincodeError("Unknown binary record stream codec: {}".format(codec_id))
+    _dumps, loads = get_codec(codecs[codec_id])
+
+    read = input_file.read
+    # streams such as pipes cannot seek and skipped records are read instead
+    seekable = input_file.seekable()
+    header_size = _record_header.size
+    while True:
+        header = read(header_size)
+        if not header:
+            return
+        if len(header) != header_size:
+            raise PlugincodeError("Truncated binary record stream.")
+        kind, length = _record_header.unpack(header)
+        if kinds is not None and kind not in kinds:
+            if seekable:
+                input_file.seek(length, 1)
+            elif len(read(length)) != length:
+                raise PlugincodeError("Truncated binary record stream.")
+            continue
+        payload = read(length)
+        if len(payload) != length:
+            raise PlugincodeError("Truncated binary record stream.")
+        yield kind, loads(payload)
+
+
+def load_files(input_file, attributes=None):
+    """
+    Yield the serialized files mappings of the `input_file` binary record
+    stream. If `attributes` is a list of attribute names, only keep the "path"
+    and these attributes.
+    """
+    for _kind, file_data in iter_records(input_file, kinds={FILE}):
+        if attributes is not None:
+            file_data = {k: file_data[k] for k in ["path"] + list(attributes) if k in file_data}
+        yield file_data
+
+
+def load_resources_attributes(codebase, input_file, attributes, strip_root=False):
+    """
+    Set the `attributes` list of Resource attribute names (such as the
+    `required_resource_attributes` of a plugin) of the Resources of a
+    `codebase` from the serialized files of the `input_file` binary record
+    stream. Files paths are stripped of their root segment if `strip_root` is
+    True. Return the number of updated Resources.
+    """
+    root_name = codebase.root.name
+    updated = 0
+    for file_data in load_files(input_file, attributes):
+        path = file_data.pop("path")
+        if strip_root:
+            path = root_name + "/" + path if path else root_name
+        resource = codebase.get_resource(path)
+        if resource is None or not file_data:
+            continue
+        for name, value in file_data.items():
+            setattr(resource, name, value)
+        codebase.save_resource(resource)
+        updated += 1
+    return updated
+
+
+class BinaryOutputPlugin(OutputPlugin):
+    """
+    Base class for output plugins that write scan results as a binary record
+    stream with the headers, the files and the codebase attributes summary.
+    Subclasses set the `codec` and must provide a CLI option to pass a binary
+    `output` file.
+    """
+
+    # one of "msgpack" or "cbor"
+    codec = "msgpack"
+
+    def process_codebase(self, codebase, output, **kwargs):
+        self.write_records(codebase, output, codec=self.codec, **kwargs)
+
+    @classmethod
+    def write_records(cls, codebase, output_file, codec="msgpack", **kwargs):
+        """
+        Write a `codebase` as a binary record stream to the `output_file`
+        binary file-like object using the `codec` name. Return the number of
+        files written.
+        """
+        writer = RecordWriter(output_file, codec=codec)
+        writer.write_headers(codebase.get_headers())
+        count = writer.write_files(cls.get_files(codebase, **kwargs))
+        writer.write_summary(attr.asdict(codebase.attributes))
+        return count
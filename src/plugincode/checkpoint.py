@@ -0,0 +1,366 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/plugincode for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+
+"""
+Support for resumable scans with checkpointing.
+
+The scan results of each completed Resource are appended to a local journal
+file. When a scan is restarted with the same inputs, options and plugins, the
+Resources already recorded in the journal are restored from the journal and are
+not scanned again.
+
+The journal is keyed by a hash of the input location, the scan options and the
+fingerprints of the plugins used for the scan (including the name and version of
+the installed distribution that provides each plugin): changing any of these
+yields a different key and a stale journal is discarded instead of being reused.
+"""
+
+import functools
+import hashlib
+import inspect
+import json
+import os
+import time
+
+from plugincode import PlugincodeError
+
+try:
+    from importlib import metadata as importlib_metadata
+except ImportError:
+    # Python 3.7
+    importlib_metadata = None
+
+
+# Tracing flags
+TRACE = False
+
+
+def logger_debug(*args):
+    pass
+
+
+if TRACE:
+    import logging
+    import sys
+
+    logger = logging.getLogger(__name__)
+    logging.basicConfig(stream=sys.stdout)
+    logger.setLevel(logging.DEBUG)
+
+    def logger_debug(*args):
+        return logger.debug(" ".join(isinstance(a, str) and a or repr(a) for a in args))
+
+
+# version of the journal file format
+JOURNAL_FORMAT = 1
+
+# scan options that do not change the scan results and are ignored when
+# computing a journal key
+IGNORED_OPTIONS = (
+    "processes",
+    "timeout",
+    "quiet",
+    "verbose",
+    "timing",
+    "max_in_memory",
+    "checkpoint",
+)
+
+
+class CheckpointError(PlugincodeError):
+    """Raised when a scan journal cannot be read or written"""
+
+
+@functools.lru_cache(maxsize=None)
+def get_file_digest(location, size, mtime):
+    """
+    Return a SHA1 hex digest of the file at `location`. This is cached by
+    `location`, `size` and `mtime` such that a modified file is read again.
+    """
+    with open(location, "rb") as source:
+        return hashlib.sha1(source.read()).hexdigest()
+
+
+def get_source_digest(obj):
+    """
+    Return a SHA1 hex digest of the source file where `obj` (a class or module)
+    is defined or None if the source file is not available.
+    """
+    try:
+        location = inspect.getsourcefile(obj)
+    except TypeError:
+        location = None
+
+    if not location or not os.path.exists(location):
+        return
+
+    stat = os.stat(location)
+    return get_file_digest(location, stat.st_size, stat.st_mtime)
+
+
+@functools.lru_cache(maxsize=None)
+def get_packages_distributions():
+    """
+    Return a mapping of {top-level package name: [distribution names]} of the
+    installed distributions.
+    """
+    packages_distributions = getattr(importlib_metadata, "packages_distributions", None)
+    if packages_distributions is None:
+        # Python 3.9 and older
+        return {}
+    return packages_distributions()
+
+
+@functools.lru_cache(maxsize=None)
+def get_distribution_version(module_name):
+    """
+    Return a "name==version" string for the installed distribution that
+    provides the top-level package of `module_name` or None if not found.
+    For example:
+    >>> get_distribution_version("attr._make").startswith("attrs==")
+    True
+    """
+    if importlib_metadata is None:
+        return
+    top_level = module_name.partition(".")[0]
+    for name in get_packages_distributions().get(top_level) or [top_level]:
+        try:
+            return "{}=={}".format(name, importlib_metadata.version(name))
+        except importlib_metadata.PackageNotFoundError:
+            continue
+
+
+def get_plugin_fingerprint(plugin_class):
+    """
+    Return a fingerprint string for a `plugin_class`. The fingerprint changes
+    when the plugin code, the version of its distribution, its declared
+    attributes or its options change.
+    """
+    data = dict(
+        qname=plugin_class.qname(),
+        cls="{}.{}".format(plugin_class.__module__, plugin_class.__qualname__),
+        source=get_source_digest(plugin_class),
+        distribution=get_distribution_version(plugin_class.__module__),
+        resource_attributes=sorted(plugin_class.resource_attributes or {}),
+        codebase_attributes=sorted(plugin_class.codebase_attributes or {}),
+        options=sorted(getattr(o, "name", repr(o)) for o in plugin_class.options or []),
+    )
+    data = json.dumps(data, sort_keys=True)
+    return hashlib.sha1(data.encode("utf-8")).hexdigest()
+
+
+def get_journal_key(input_location, plugin_classes, ignored_options=IGNORED_OPTIONS, **kwargs):
+    """
+    Return a journal key string for a scan of `input_location` using a list of
+    `plugin_classes` and the scan options as `kwargs` (typically all the
+    ScanCode call arguments). Options listed in `ignored_options` are not
+    considered. Non-JSON option values are considered using their repr().
+    """
+    options = {
+        k: v if isinstance(v, (str, int, float, bool, type(None))) else repr(v)
+        for k, v in kwargs.items()
+        if k not in ignored_options
+    }
+    data = dict(
+        input=os.path.abspath(os.fsdecode(input_location)),
+        options=options,
+        plugins=sorted(get_plugin_fingerprint(pc) for pc in plugin_classes),
+    )
+    data = json.dumps(data, sort_keys=True)
+    return hashlib.sha1(data.encode("utf-8")).hexdigest()
+
+
+def get_journal_location(journal_dir, journal_key):
+    """
+    Return the location of the journal file for `journal_key` in `journal_dir`.
+    """
+    return os.path.join(journal_dir, "scan-journal-{}.jsonl".format(journal_key))
+
+
+class ScanJournal(object):
+    """
+    An append-only journal of completed Resource scan results stored as JSON
+    lines. The first line is a header with the journal key. Each other line is
+    a record mapping with at least a "path" key.
+
+    Records are buffered and flushed (and synced to disk) every `flush_every`
+    records or every `flush_interval` seconds, whichever comes first.
+    """
+
+    def __init__(self, location, journal_key, flush_every=100, flush_interval=30):
+        self.location = location
+        self.journal_key = journal_key
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+
+        # set of paths of the Resources recorded in this journal
+        self.completed_paths = set()
+
+        self._file = None
+        self._pending = []
+        self._last_flush = time.monotonic()
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, *args, **kwargs):
+        self.close()
+
+    def open(self):
+        """
+        Open this journal for appending and load the paths of its completed
+        Resources. Discard an existing journal with a different key. Return
+        self.
+        """
+        valid_size = self._load()
+        if valid_size is None:
+            self._file = open(self.location, "w", encoding="utf-8")
+            header = dict(journal_key=self.journal_key, format=JOURNAL_FORMAT)
+            self._file.write(json.dumps(header) + "\n")
+            self._file.flush()
+        else:
+            self._file = open(self.location, "r+", encoding="utf-8")
+            # drop any partially written trailing line left by a crash
+            self._file.truncate(valid_size)
+            self._file.seek(valid_size)
+        return self
+
+    def _load(self):
+        """
+        Load the completed paths of an existing journal. Return the byte size of
+        the valid part of the journal or None if there is no valid journal.
+        """
+        if not os.path.exists(self.location):
+            return
+
+        with open(self.location, "rb") as journal:
+            header = journal.readline()
+            try:
+                header = json.loads(header)
+            except ValueError:
+                header = {}
+
+            if (
+                header.get("journal_key") != self.journal_key
+                or header.get("format") != JOURNAL_FORMAT
+            ):
+                if TRACE:
+                    logger_debug("ScanJournal: discarding stale journal:", self.location)
+                return
+
+            valid_size = journal.tell()
+            for line in journal:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                self.completed_paths.add(record["path"])
+                valid_size += len(line)
+
+        return valid_size
+
+    def is_completed(self, path):
+        """
+        Return True if the Resource with `path` is recorded in this journal.
+        """
+        return path in self.completed_paths
+
+    def record(self, path, **data):
+        """
+        Record the completed scan of the Resource with `path` with its `data`
+        such as "scan_results" and "scan_errors".
+        """
+        if not self._file:
+            raise CheckpointError("Cannot record in a closed journal: {}".format(self.location))
+        data["path"] = path
+        self._pending.append(json.dumps(data, separators=(",", ":")))
+        self.completed_paths.add(path)
+
+        if (
+            len(self._pending) >= self.flush_every
+            or time.monotonic() - self._last_flush >= self.flush_interval
+        ):
+            self.flush()
+
+    def flush(self):
+        """
+        Write pending records to the journal and sync them to disk.
+        """
+        if self._pending:
+            self._file.write("\n".join(self._pending) + "\n")
+            self._pending = []
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        """
+        Flush and close this journal.
+        """
+        if self._file:
+            self.flush()
+            self._file.close()
+            self._file = None
+
+    def iter_records(self):
+        """
+        Yield the record mappings stored in this journal.
+        """
+        if self._file:
+            self.flush()
+
+        if not os.path.exists(self.location):
+            return
+
+        with open(self.location, "rb") as journal:
+            # skip header
+            journal.readline()
+            for line in journal:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    break
+
+
+def set_scan_results(resource, scan_results):
+    """
+    Set the `scan_results` mapping returned by scanners on a `resource`. Keys
+    starting with "extra_data." are stored in the Resource.extra_data mapping.
+    """
+    for key, value in (scan_results or {}).items():
+        if key.startswith("extra_data."):
+            resource.extra_data[key[len("extra_data.") :]] = value
+        else:
+            setattr(resource, key, value)
+
+
+def resume_resources(codebase, journal, resources=None):
+    """
+    Restore the scan results recorded in `journal` on the matching Resources of
+    `codebase` and yield the `resources` (all the codebase file Resources by
+    default) that still need to be scanned.
+    """
+    for record in journal.iter_records():
+        resource = codebase.get_resource(record["path"])
+        if not resource:
+            continue
+        set_scan_results(resource, record.get("scan_results"))
+        resource.scan_errors.extend(record.get("scan_errors") or [])
+        resource.scan_time = record.get("scan_time") or 0
+        resource.scan_timings = record.get("scan_timings") or {}
+        codebase.save_resource(resource)
+
+    if resources is None:
+        resources = (r for r in codebase.walk() if r.is_file)
+
+    for resource in resources:
+        if not journal.is_completed(resource.path):
+            yield resource
@@ -0,0 +1,156 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/plugincode for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+
+"""
+Columnar snapshots of scalar Resource attributes for vectorized aggregations.
+
+Plugins opt-in per attribute by listing scalar attributes of their
+`resource_attributes` in `columnar_resource_attributes`. A ColumnStore copies
+these from the Resources in typed array columns indexed by a Resource row
+number (its position in the codebase walk order). Columns are exposed as NumPy
+arrays (sharing the same memory) when NumPy is available to run vectorized
+aggregations, or as plain arrays otherwise.
+
+A ColumnStore is an aggregation-time snapshot: the values stay stored on each
+Resource and the columns are a copy. Column updates are visible on the Resources
+only once saved explicitly with ColumnStore.to_codebase().
+"""
+
+from array import array
+
+import attr
+
+from plugincode import PlugincodeError
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# mapping of {Python type: array typecode}
+TYPECODES = {
+    bool: "b",
+    int: "q",
+    float: "d",
+}
+
+
+def get_typecode(attribute):
+    """
+    Return an array typecode for an `attribute` attr.Attribute based on its
+    declared type or the type of its default value. Raise a PlugincodeError if
+    this is not a scalar attribute.
+    """
+    attr_type = attribute.type
+    if attr_type not in TYPECODES:
+        default = attribute.default
+        if isinstance(default, attr.Factory):
+            default = None
+        attr_type = type(default)
+    typecode = TYPECODES.get(attr_type)
+    if not typecode:
+        raise PlugincodeError(
+            "Cannot store non-scalar attribute in a column: {!r}".format(attribute.name)
+        )
+    return typecode
+
+
+def get_columnar_attributes(plugins):
+    """
+    Return a mapping of {attribute name: array typecode} for all the columnar
+    Resource attributes declared by a list of `plugins`.
+    """
+    columns = {}
+    for plugin in plugins:
+        names = plugin.columnar_resource_attributes or []
+        if not names:
+            continue
+        resource_attributes = plugin.resource_attributes or {}
+        # use an attr class to get public attr.Attribute definitions
+        attributes = {
+            a.name: a for a in attr.fields(attr.make_class("Columns", resource_attributes))
+        }
+        for name in names:
+            attribute = attributes.get(name)
+            if attribute is None:
+                raise PlugincodeError(
+                    "Invalid plugin: {}: columnar attribute {!r} is not a declared "
+                    "resource attribute.".format(plugin.qname(), name)
+                )
+            columns[name] = get_typecode(attribute)
+    return columns
+
+
+class ColumnStore(object):
+    """
+    Typed array columns of scalar Resource attributes indexed by Resource row
+    number. This is a snapshot of the Resources values: see the module
+    documentation.
+    """
+
+    def __init__(self, paths):
+        # list of Resource paths in row order
+        self.paths = list(paths)
+        # mapping of {path: row number}
+        self.rows = {path: row for row, path in enumerate(self.paths)}
+        # mapping of {attribute name: array}
+        self.columns = {}
+
+    def __len__(self):
+        return len(self.paths)
+
+    @classmethod
+    def from_codebase(cls, codebase, columns):
+        """
+        Return a new ColumnStore for a `codebase` loaded with the `columns`
+        mapping of {attribute name: array typecode} from its Resources in walk
+        order.
+        """
+        resources = list(codebase.walk())
+        store = cls(r.path for r in resources)
+        for name, typecode in columns.items():
+            store.columns[name] = array(typecode, (getattr(r, name) or 0 for r in resources))
+        return store
+
+    def add_column(self, name, typecode, default=0):
+        """
+        Add a new column `name` of `typecode` filled with a `default` value.
+        """
+        self.columns[name] = array(typecode, [default]) * len(self.paths)
+
+    def column(self, name):
+        """
+        Return the column `name` as a NumPy array sharing this column memory if
+        NumPy is available or as an array otherwise.
+        """
+        values = self.columns[name]
+        if numpy is not None:
+            return numpy.frombuffer(values, dtype=values.typecode)
+        return values
+
+    def get(self, path, name):
+        return self.columns[name][self.rows[path]]
+
+    def set(self, path, name, value):
+        self.columns[name][self.rows[path]] = value
+
+    def to_codebase(self, codebase, names=None):
+        """
+        Save the values of the `names` columns (all by default) in the
+        corresponding Resources of `codebase`.
+        """
+        names = list(names or self.columns)
+        columns = [(name, self.columns[name]) for name in names]
+        for row, path in enumerate(self.paths):
+            resource = codebase.get_resource(path)
+            for name, values in columns:
+                value = values[row]
+                if values.typecode == "b":
+                    value = bool(value)
+                setattr(resource, name, value)
+            codebase.save_resource(resource)
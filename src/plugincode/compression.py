@@ -0,0 +1,189 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/plugincode for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+
+"""
+Multithreaded compressed output streams.
+
+Written data is buffered in blocks and each block is compressed independently
+on a pool of threads while the caller keeps serializing: zlib and zstd release
+the GIL while compressing. Compressed blocks are written in order as standalone
+gzip members or zstd frames. A concatenation of gzip members is a valid gzip
+stream and a concatenation of zstd frames is a valid zstd stream, that are
+decompressed by the standard tools as a whole.
+
+The zstandard library is an optional dependency: a PlugincodeError is raised
+when using zstd compression and it is not installed.
+"""
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import functools
+import os
+import zlib
+
+from plugincode import PlugincodeError
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# Tracing flags
+TRACE = False
+
+
+def logger_debug(*args):
+    pass
+
+
+if TRACE:
+    import logging
+    import sys
+
+    logger = logging.getLogger(__name__)
+    logging.basicConfig(stream=sys.stdout)
+    logger.setLevel(logging.DEBUG)
+
+    def logger_debug(*args):
+        return logger.debug(" ".join(isinstance(a, str) and a or repr(a) for a in args))
+
+
+COMPRESSIONS = ("gzip", "zstd")
+
+# size in bytes of the uncompressed blocks
+BLOCK_SIZE = 1024 * 1024
+
+
+def gzip_compress(block, level=6):
+    """
+    Return a `block` of bytes compressed as a standalone gzip member.
+    """
+    # a wbits of 31 writes a gzip header and trailer with a zero mtime
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return compressor.compress(block) + compressor.flush()
+
+
+def zstd_compress(block, level=3):
+    """
+    Return a `block` of bytes compressed as a standalone zstd frame.
+    """
+    # compressors are not thread-safe: use one for each block
+    return zstandard.ZstdCompressor(level=level).compress(block)
+
+
+def get_compressor(compression, level=None):
+    """
+    Return a function that compresses a block of bytes as a standalone member
+    for a `compression` name (one of "gzip" or "zstd") and optional `level`.
+    Raise a PlugincodeError if it is not available.
+    """
+    if compression == "gzip":
+        compress = gzip_compress
+    elif compression == "zstd" and zstandard is not None:
+        compress = zstd_compress
+    else:
+        raise PlugincodeError("Compression is not available: {!r}".format(compression))
+    if level is None:
+        return compress
+    return functools.partial(compress, level=level)
+
+
+class CompressedWriter(object):
+    """
+    A file-like object that compresses the text or bytes written to it and
+    writes them to the `output_file` binary file-like object with a
+    `compression` name and optional `level`.
+
+    Blocks of `block_size` bytes are compressed on up to `threads` threads
+    (the number of CPUs by default). At most twice as many blocks are pending
+    at once to keep memory bounded. The `output_file` is not closed on close().
+    """
+
+    def __init__(
+        self, output_file, compression="gzip", level=None, threads=None, block_size=BLOCK_SIZE
+    ):
+        self.output_file = output_file
+        self.compress = get_compressor(compression, level)
+        self.block_size = block_size
+        threads = threads or os.cpu_count() or 1
+        self.max_pending = threads * 2
+        self.executor = ThreadPoolExecutor(max_workers=threads)
+        self.pending = deque()
+        self.buffer = []
+        self.buffered = 0
+        self.blocks_count = 0
+        self.closed = False
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        self.buffer.append(data)
+        self.buffered += len(data)
+        if self.buffered >= self.block_size:
+            self._submit()
+
+    def _submit(self):
+        block = b"".join(self.buffer)
+        self.buffer = []
+        self.buffered = 0
+        self.pending.append(self.executor.submit(self.compress, block))
+        self.blocks_count += 1
+        self._write_compressed()
+
+    def _write_compressed(self, wait=False):
+        """
+        Write the compressed blocks that are done in order. Wait for the blocks
+        if `wait` is True or if too many blocks are pending.
+        """
+        pending = self.pending
+        while pending and (wait or pending[0].done() or len(pending) > self.max_pending):
+            self.output_file.write(pending.popleft().result())
+
+    def flush(self):
+        """
+        Compress and write all the buffered data.
+        """
+        if self.buffer:
+            self._submit()
+        self._write_compressed(wait=True)
+        self.output_file.flush()
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            # an empty stream is still a valid compressed stream
+            if self.buffer or not self.blocks_count:
+                self._submit()
+            self._write_compressed(wait=True)
+            self.output_file.flush()
+        finally:
+            self.closed = True
+            for future in self.pending:
+                future.cancel()
+            self.executor.shutdown()
+        if TRACE:
+            logger_debug("CompressedWriter.close: blocks:", self.blocks_count)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def get_binary_file(output_file):
+    """
+    Return the binary file-like object of an `output_file` text file-like
+    object opened on a binary buffer or the `output_file` itself otherwise.
+    """
+    buffer = getattr(output_file, "buffer", None)
+    if buffer is None:
+        return output_file
+    output_file.flush()
+    return buffer
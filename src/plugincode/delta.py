@@ -0,0 +1,250 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/plugincode for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+
+"""
+Delta output of scan results against a previous scan.
+
+A delta is a list of records for the files that were added, removed or changed
+since a previous scan. Changes are detected per attribute by comparing hashes
+of the serialized attribute values, and a changed record only contains the
+changed attribute values. An added record contains the whole file mapping and
+the path of the file that precedes it in the new walk order ("after", or None
+for the first file) such that the full result is reconstructed in the same
+order with merge_delta().
+
+Delta output is written as JSON Lines: a first line with the scan headers as
+{"headers": [...]}, then one line for each delta record and a last line with
+the codebase attributes as {"attributes": {...}}.
+
+The previous scan is read one file at a time from a JSON Lines output (see
+plugincode.jsonlines) or a binary record stream (see plugincode.binary) and
+only the path and the attribute hashes of each previous file are kept.
+"""
+
+import hashlib
+import json
+
+import attr
+
+from plugincode import PlugincodeError
+from plugincode.binary import MAGIC
+from plugincode.binary import load_files
+from plugincode.compression import get_binary_file
+from plugincode.encoders import get_encoder
+from plugincode.output import OutputPlugin
+
+# Tracing flags
+TRACE = False
+
+
+def logger_debug(*args):
+    pass
+
+
+if TRACE:
+    import logging
+    import sys
+
+    logger = logging.getLogger(__name__)
+    logging.basicConfig(stream=sys.stdout)
+    logger.setLevel(logging.DEBUG)
+
+    def logger_debug(*args):
+        return logger.debug(" ".join(isinstance(a, str) and a or repr(a) for a in args))
+
+
+ADDED = "added"
+REMOVED = "removed"
+CHANGED = "changed"
+
+HASH_SIZE = 16
+
+# encode values with sorted keys such that equal values have the same hash
+_canonical_encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"), sort_keys=True)
+
+
+def get_value_hash(value):
+    """
+    Return a hash bytes string of a JSON-serializable `value`.
+    """
+    encoded = _canonical_encoder.encode(value).encode("utf-8")
+    return hashlib.blake2b(encoded, digest_size=HASH_SIZE).digest()
+
+
+def get_attribute_hashes(file_data):
+    """
+    Return a mapping of {attribute name: value hash} for a serialized
+    `file_data` mapping, except for its "path".
+    """
+    return {name: get_value_hash(value) for name, value in file_data.items() if name != "path"}
+
+
+def get_delta(previous_files, files):
+    """
+    Yield delta records for the `files` iterable of serialized file mappings
+    compared to the `previous_files` iterable of serialized file mappings of a
+    previous scan, both in walk order. Only the attribute hashes of the
+    previous files are kept in memory.
+    """
+    # mapping of {path: (tuple of attribute names, concatenated attribute
+    # hashes)} where equal tuples of attribute names are shared
+    previous = {}
+    names_tuples = {}
+    for file_data in previous_files:
+        hashes = get_attribute_hashes(file_data)
+        names = tuple(hashes)
+        names = names_tuples.setdefault(names, names)
+        previous[file_data["path"]] = names, b"".join(hashes.values())
+
+    after = None
+    for file_data in files:
+        path = file_data["path"]
+        previous_entry = previous.pop(path, None)
+        if previous_entry is None:
+            yield dict(action=ADDED, after=after, file=file_data)
+        else:
+            names, packed = previous_entry
+            previous_hashes = {
+                name: packed[i * HASH_SIZE : (i + 1) * HASH_SIZE] for i, name in enumerate(names)
+            }
+            hashes = get_attribute_hashes(file_data)
+            changed = {
+                name: file_data[name]
+                for name, value_hash in hashes.items()
+                if previous_hashes.get(name) != value_hash
+            }
+            fields_changed = list(hashes) != list(previous_hashes)
+            if changed or fields_changed:
+                record = dict(action=CHANGED, path=path, changed=changed)
+                if fields_changed:
+                    # the new fields in order, to rebuild the mapping
+                    record["fields"] = list(file_data)
+                yield record
+        after = path
+
+    for path in previous:
+        yield dict(action=REMOVED, path=path)
+
+
+def merge_delta(previous_files, delta):
+    """
+    Yield the serialized file mappings of a full scan reconstructed in walk
+    order from the `previous_files` iterable of serialized file mappings of a
+    previous scan and the `delta` iterable of delta records.
+    """
+    # mapping of {path of the preceding file: added file}: a file is preceded by
+    # at most one added file
+    added_after = {}
+    changes = {}
+    removed = set()
+    for record in delta:
+        action = record.get("action")
+        if action == ADDED:
+            added_after[record["after"]] = record["file"]
+        elif action == CHANGED:
+            changes[record["path"]] = record
+        elif action == REMOVED:
+            removed.add(record["path"])
+
+    def iter_added(path):
+        added = added_after.pop(path, None)
+        while added is not None:
+            yield added
+            added = added_after.pop(added["path"], None)
+
+    yield from iter_added(None)
+    for file_data in previous_files:
+        path = file_data["path"]
+        if path in removed:
+            continue
+        change = changes.get(path)
+        if change:
+            updated = dict(file_data, **change["changed"])
+            fields = change.get("fields")
+            if fields:
+                updated = {name: updated[name] for name in fields}
+            file_data = updated
+        yield file_data
+        yield from iter_added(path)
+
+
+def load_previous_files(location):
+    """
+    Yield the serialized file mappings of a previous scan at `location` read
+    one at a time from a JSON Lines output or a binary record stream. Raise a
+    PlugincodeError for other formats.
+    """
+    with open(location, "rb") as input_file:
+        is_binary = input_file.read(len(MAGIC)) == MAGIC
+        input_file.seek(0)
+        if is_binary:
+            yield from load_files(input_file)
+            return
+
+        for line in input_file:
+            try:
+                data = json.loads(line)
+            except ValueError:
+                data = None
+            if not isinstance(data, dict):
+                raise PlugincodeError(
+                    "Previous scan is not JSON Lines or a binary record stream: {}".format(location)
+                )
+            if "path" in data:
+                yield data
+
+
+def load_delta(input_file):
+    """
+    Return a mapping with the "headers", "records" and "attributes" of a delta
+    from an `input_file` text file-like object with delta JSON Lines.
+    """
+    delta = dict(headers=[], records=[], attributes={})
+    for line in input_file:
+        data = json.loads(line)
+        if "action" in data:
+            delta["records"].append(data)
+        elif "headers" in data:
+            delta["headers"] = data["headers"]
+        elif "attributes" in data:
+            delta["attributes"] = data["attributes"]
+    return delta
+
+
+class DeltaOutputPlugin(OutputPlugin):
+    """
+    Base class for output plugins that write the delta of scan results against
+    a previous scan as JSON Lines. Subclasses must provide CLI options to pass
+    an `output` file and a `previous_scan` file location of a JSON Lines output
+    or a binary record stream.
+    """
+
+    def process_codebase(self, codebase, output, previous_scan, **kwargs):
+        self.write_delta(codebase, output, load_previous_files(previous_scan), **kwargs)
+
+    @classmethod
+    def write_delta(cls, codebase, output_file, previous_files, **kwargs):
+        """
+        Write the delta of a `codebase` against the `previous_files` iterable
+        of serialized file mappings as JSON Lines to the `output_file` file-like
+        object. Return the number of delta records written.
+        """
+        output_file = get_binary_file(output_file)
+        encode = get_encoder(kwargs.get("json_encoder") or cls.json_encoder).encode
+
+        def write(data):
+            output_file.write(encode(data).encode("utf-8") + b"\n")
+
+        write(dict(headers=codebase.get_headers()))
+        count = 0
+        for record in get_delta(previous_files, cls.get_files(codebase, **kwargs)):
+            write(record)
+            count += 1
+        write(dict(attributes=attr.asdict(codebase.attributes)))
+        if TRACE:
+            logger_debug("write_delta: records:", count)
+        return count
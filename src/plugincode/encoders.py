@@ -0,0 +1,175 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/plugincode for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+
+"""
+Pluggable JSON encoder backends for output plugins.
+
+An encoder encodes a JSON-serializable object to a compact JSON string with
+UTF-8 characters not escaped (e.g. "ensure_ascii=False"). The fastest available
+backend is selected at runtime: orjson, then ujson and then the standard
+library json module.
+
+All the backends return the same string as the standard library encoder. The
+optional backends fall back to the standard library for objects they cannot
+encode (such as non-string keys or very large integers) and for floats in
+exponent notation that they format differently. NaN and infinite floats are
+not valid JSON and are not supported.
+"""
+
+import json
+import re
+
+from plugincode import PlugincodeError
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+
+# Tracing flags
+TRACE = False
+
+
+def logger_debug(*args):
+    pass
+
+
+if TRACE:
+    import logging
+    import sys
+
+    logger = logging.getLogger(__name__)
+    logging.basicConfig(stream=sys.stdout)
+    logger.setLevel(logging.DEBUG)
+
+    def logger_debug(*args):
+        return logger.debug(" ".join(isinstance(a, str) and a or repr(a) for a in args))
+
+
+# quickly detect compact JSON texts that may contain numbers in exponent
+# notation which are formatted differently by each backend. This may also match
+# some strings: has_exponent_float() then checks the actual float values.
+_may_have_exponent = re.compile(r"(?:^|[:,\[])-?[0-9]+(?:\.[0-9]+)?[eE]").search
+
+
+def has_exponent_float(obj):
+    """
+    Return True if a JSON-serializable `obj` contains a float formatted in
+    exponent notation.
+    For example:
+    >>> has_exponent_float({"a": [1, "1e5", 0.5, {"b": 12.0}]})
+    False
+    >>> has_exponent_float({"a": [1, "1e5", 0.5, {"b": 1e16}]})
+    True
+    """
+    stack = [obj]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, float):
+            if "e" in repr(value):
+                return True
+        elif isinstance(value, dict):
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            stack.extend(value)
+    return False
+
+
+def has_exponent(encoded, obj):
+    """
+    Return True if the `obj` encoded as an `encoded` JSON string contains a
+    float formatted in exponent notation.
+    """
+    return bool(_may_have_exponent(encoded)) and has_exponent_float(obj)
+
+
+class StdlibEncoder(object):
+    """
+    Encode JSON with the standard library json module.
+    """
+
+    name = "stdlib"
+
+    def __init__(self):
+        self._encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+    def encode(self, obj):
+        return self._encoder.encode(obj)
+
+
+class OrjsonEncoder(StdlibEncoder):
+    """
+    Encode JSON with orjson.
+    """
+
+    name = "orjson"
+
+    def encode(self, obj):
+        try:
+            encoded = orjson.dumps(obj).decode("utf-8")
+        except (TypeError, orjson.JSONEncodeError):
+            return self._encoder.encode(obj)
+        if has_exponent(encoded, obj):
+            return self._encoder.encode(obj)
+        return encoded
+
+
+class UjsonEncoder(StdlibEncoder):
+    """
+    Encode JSON with ujson.
+    """
+
+    name = "ujson"
+
+    def encode(self, obj):
+        try:
+            encoded = ujson.dumps(obj, ensure_ascii=False, escape_forward_slashes=False)
+        except (TypeError, OverflowError):
+            return self._encoder.encode(obj)
+        if has_exponent(encoded, obj):
+            return self._encoder.encode(obj)
+        return encoded
+
+
+# mapping of {name: (encoder class, backend module or None if always available)}
+ENCODERS = {
+    "orjson": (OrjsonEncoder, orjson),
+    "ujson": (UjsonEncoder, ujson),
+    "stdlib": (StdlibEncoder, json),
+}
+
+# encoder names in preference order
+PREFERRED_ENCODERS = ("orjson", "ujson", "stdlib")
+
+
+def get_available_encoders():
+    """
+    Return a list of the names of the available encoders in preference order.
+    """
+    return [name for name in PREFERRED_ENCODERS if ENCODERS[name][1] is not None]
+
+
+def get_encoder(name=None):
+    """
+    Return a new encoder object with an encode(obj) method. Use the encoder
+    `name` if provided or the fastest available encoder otherwise. Raise a
+    PlugincodeError if the `name` encoder is not available.
+    """
+    if not name:
+        name = get_available_encoders()[0]
+    encoder_class, backend = ENCODERS.get(name, (None, None))
+    if backend is None:
+        raise PlugincodeError("JSON encoder is not available: {!r}".format(name))
+    if TRACE:
+        logger_debug("get_encoder:", name)
+    return encoder_class()
@@ -0,0 +1,534 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/plugincode for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+
+"""
+Execution of the plugins of a stage.
+
+The plugins of a stage are arranged in a dependency graph (DAG) built from their
+`required_plugins`, the attributes they read (`required_resource_attributes`
+and `required_codebase_attributes`) and the attributes they write (their own
+declared `resource_attributes` and `codebase_attributes` and their
+`updated_resource_attributes` and `updated_codebase_attributes`).
+
+Plugins that do not depend on each other run their process_codebase()
+concurrently in threads. Each concurrent plugin sees its own writes but not the
+writes of the other concurrent plugins. These writes are merged back in the
+codebase in the plan order once all the plugins of a level have completed such
+that results are deterministic.
+
+Plugins that implement get_visitors() are run in a single traversal of the
+codebase for all the consecutive visitor plugins of a stage.
+
+Plugins that implement process_resource() are run one resource at a time: the
+resources are sharded in chunks across a pool of worker processes and the
+returned updates are applied in batch.
+"""
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
+import functools
+from itertools import islice
+import posixpath
+
+import attr
+from commoncode.resource import Codebase
+
+from plugincode import PlugincodeError
+from plugincode.tracing import tracer
+
+# Tracing flags
+TRACE = False
+
+
+def logger_debug(*args):
+    pass
+
+
+if TRACE:
+    import logging
+    import sys
+
+    logger = logging.getLogger(__name__)
+    logging.basicConfig(stream=sys.stdout)
+    logger.setLevel(logging.DEBUG)
+
+    def logger_debug(*args):
+        return logger.debug(" ".join(isinstance(a, str) and a or repr(a) for a in args))
+
+
+def get_written_attributes(plugin):
+    """
+    Return a tuple of (set of Resource attribute names, set of Codebase attribute
+    names) written by a `plugin`.
+    """
+    resource_attributes = set(plugin.resource_attributes or {})
+    resource_attributes.update(plugin.updated_resource_attributes or [])
+    codebase_attributes = set(plugin.codebase_attributes or {})
+    codebase_attributes.update(plugin.updated_codebase_attributes or [])
+    return resource_attributes, codebase_attributes
+
+
+def get_read_attributes(plugin):
+    """
+    Return a tuple of (set of Resource attribute names, set of Codebase attribute
+    names) read by a `plugin`.
+    """
+    return (
+        set(plugin.required_resource_attributes or []),
+        set(plugin.required_codebase_attributes or []),
+    )
+
+
+def _conflicts(first, second):
+    """
+    Return True if the `second` plugin must run after the `first` plugin.
+    """
+    if first.qname() in (second.required_plugins or []):
+        return True
+
+    first_res_writes, first_cb_writes = get_written_attributes(first)
+    second_res_writes, second_cb_writes = get_written_attributes(second)
+
+    # plugins that do not declare what they write could write anything
+    if not (first_res_writes or first_cb_writes) or not (second_res_writes or second_cb_writes):
+        return True
+
+    first_res_reads, first_cb_reads = get_read_attributes(first)
+    second_res_reads, second_cb_reads = get_read_attributes(second)
+
+    return bool(
+        first_res_writes & (second_res_reads | second_res_writes)
+        or first_cb_writes & (second_cb_reads | second_cb_writes)
+        or first_res_reads & second_res_writes
+        or first_cb_reads & second_cb_writes
+    )
+
+
+def build_plugins_graph(plugins):
+    """
+    Return a mapping of {plugin: list of plugins it depends on} for a list of
+    `plugins` of the same stage sorted in their plan (run) order. A plugin only
+    depends on plugins that come before it in the plan.
+    """
+    graph = {}
+    for index, plugin in enumerate(plugins):
+        graph[plugin] = [previous for previous in plugins[:index] if _conflicts(previous, plugin)]
+    return graph
+
+
+def get_execution_levels(plugins):
+    """
+    Return a list of levels where each level is a list of `plugins` that do not
+    depend on each other and only depend on plugins of previous levels.
+    `plugins` are sorted in their plan (run) order and this order is kept in
+    each level.
+    """
+    graph = build_plugins_graph(plugins)
+    level_by_plugin = {}
+    levels = []
+    for plugin in plugins:
+        level = max((level_by_plugin[dep] + 1 for dep in graph[plugin]), default=0)
+        level_by_plugin[plugin] = level
+        if level == len(levels):
+            levels.append([])
+        levels[level].append(plugin)
+    return levels
+
+
+class IsolatedCodebase(object):
+    """
+    A view on a shared `codebase` for a plugin running concurrently with other
+    plugins. Resources saved through this view are not saved in the shared
+    codebase: the values of the `resource_attributes` names are kept as pending
+    updates visible only through this view until they are merged in the shared
+    codebase with merge().
+    """
+
+    def __init__(self, codebase, resource_attributes):
+        self._codebase = codebase
+        self._resource_attributes = tuple(resource_attributes)
+        # mapping of {path: {attribute name: value}}
+        self.pending_updates = {}
+
+    def __getattr__(self, name):
+        return getattr(self._codebase, name)
+
+    def _overlay(self, resource):
+        if resource is not None:
+            updates = self.pending_updates.get(resource.path)
+            if updates:
+                resource = attr.evolve(resource, **updates)
+        return resource
+
+    @property
+    def root(self):
+        return self._overlay(self._codebase.root)
+
+    def get_resource(self, path):
+        return self._overlay(self._codebase.get_resource(path))
+
+    def save_resource(self, resource):
+        if not resource:
+            return
+        self.pending_updates[resource.path] = {
+            name: getattr(resource, name) for name in self._resource_attributes
+        }
+
+    def walk(self, topdown=True, skip_root=False, ignored=None):
+        kwargs = dict(topdown=topdown, skip_root=skip_root)
+        if ignored:
+            kwargs["ignored"] = ignored
+        return Codebase.walk(self, **kwargs)
+
+    def walk_filtered(self, topdown=True, skip_root=False):
+        return Codebase.walk_filtered(self, topdown=topdown, skip_root=skip_root)
+
+    def __iter__(self):
+        return self.walk()
+
+    def merge(self):
+        """
+        Save the pending Resource updates in the shared codebase.
+        """
+        codebase = self._codebase
+        for path, updates in self.pending_updates.items():
+            resource = codebase.get_resource(path)
+            if resource is None:
+                continue
+            for name, value in updates.items():
+                setattr(resource, name, value)
+            codebase.save_resource(resource)
+        self.pending_updates = {}
+
+
+# the essential Resource attributes always available in a ResourceView
+RESOURCE_VIEW_ATTRIBUTES = (
+    "path",
+    "name",
+    "base_name",
+    "extension",
+    "location",
+    "is_file",
+    "is_root",
+    "size",
+    "children_names",
+)
+
+
+class ResourceView(object):
+    """
+    A read-only, picklable view of a Resource with a subset of its attributes.
+    """
+
+    def __init__(self, **attributes):
+        self.__dict__.update(attributes)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ResourceView is read-only: cannot set {}".format(name))
+
+    @property
+    def is_dir(self):
+        return not self.is_file
+
+    def has_children(self):
+        return bool(self.children_names)
+
+    def __repr__(self):
+        return "ResourceView(path={!r})".format(self.path)
+
+
+def get_resource_view(resource, attributes=()):
+    """
+    Return a ResourceView for a `resource` with the essential Resource
+    attributes and the `attributes` list of attribute names.
+    """
+    names = RESOURCE_VIEW_ATTRIBUTES + tuple(attributes)
+    return ResourceView(**{name: getattr(resource, name) for name in names})
+
+
+def _process_resources(plugin, views, kwargs):
+    """
+    Return a list of (path, updates mapping) for a `plugin` process_resource()
+    called on a list of `views` ResourceView. This is a top-level function such
+    that it can be used with multiprocessing.
+    """
+    process_resource = plugin.process_resource
+    results = []
+    for view in views:
+        updates = process_resource(view, **kwargs)
+        if updates:
+            results.append((view.path, updates))
+    return results
+
+
+def chunked(iterable, chunk_size):
+    """
+    Yield lists of up to `chunk_size` items from an `iterable`.
+    For example:
+    >>> list(chunked(range(5), 2))
+    [[0, 1], [2, 3], [4]]
+    """
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def map_bounded(executor, func, chunks, max_pending):
+    """
+    Yield the results of `func` called with each of the `chunks` in order, using
+    an `executor` with at most `max_pending` chunks submitted at once to keep
+    memory bounded.
+    """
+    pending = deque()
+    try:
+        for chunk in chunks:
+            pending.append(executor.submit(func, chunk))
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def run_process_resource(plugin, codebase, processes=1, chunk_size=100, resources=None, **kwargs):
+    """
+    Run the process_resource() method of a `plugin` on the `resources` (all the
+    Resources by default) of a `codebase` using up to `processes` worker
+    processes with `chunk_size` resources sent to a worker at once. Apply the
+    returned updates to the codebase Resources in batch, in walk order.
+    Return the number of updated Resources.
+    """
+    read_attributes = sorted(get_read_attributes(plugin)[0])
+    written_attributes = get_written_attributes(plugin)[0]
+
+    if resources is None:
+        resources = codebase.walk()
+    views = (get_resource_view(r, read_attributes) for r in resources)
+    chunks = chunked(views, chunk_size)
+
+    if processes and processes > 1:
+        executor = ProcessPoolExecutor(max_workers=processes)
+        func = functools.partial(_process_resources, plugin, kwargs=kwargs)
+        results = map_bounded(executor, func, chunks, processes * 2)
+    else:
+        executor = None
+        results = (_process_resources(plugin, chunk, kwargs) for chunk in chunks)
+
+    updated = 0
+    try:
+        for batch in results:
+            for path, updates in batch:
+                unknown = set(updates).difference(written_attributes)
+                if unknown:
+                    raise PlugincodeError(
+                        "Invalid plugin: {}: process_resource() returned undeclared "
+                        "attributes: {}".format(plugin.qname(), ", ".join(sorted(unknown)))
+                    )
+                resource = codebase.get_resource(path)
+                for name, value in updates.items():
+                    setattr(resource, name, value)
+                codebase.save_resource(resource)
+                updated += 1
+    finally:
+        if executor:
+            executor.shutdown()
+    return updated
+
+
+def run_visitors(plugins, codebase, visited_paths=None, **kwargs):
+    """
+    Run the visitors of a list of `plugins` sorted in their plan (run) order in
+    a single traversal of a `codebase`. For each Resource, call all the
+    pre-order visitors in plan order, then visit its descendants, then call
+    all the post-order visitors in plan order. Save a Resource when a visitor
+    reports that it was modified.
+
+    If `visited_paths` is a set of Resource paths, only call the visitors on
+    these Resources and only traverse these Resources and their ancestors.
+    """
+    traversed_paths = None
+    if visited_paths is not None:
+        if not visited_paths:
+            return
+        traversed_paths = set(visited_paths)
+        for path in visited_paths:
+            parent = posixpath.dirname(path)
+            while parent and parent not in traversed_paths:
+                traversed_paths.add(parent)
+                parent = posixpath.dirname(parent)
+
+    pre_visitors = []
+    post_visitors = []
+    for plugin in plugins:
+        pre_visitor, post_visitor = plugin.get_visitors(**kwargs)
+        if pre_visitor:
+            pre_visitors.append(pre_visitor)
+        if post_visitor:
+            post_visitors.append(post_visitor)
+
+    save_resource = codebase.save_resource
+    root = codebase.get_resource(codebase.root.path)
+    # stack of (resource, descendants visited flag)
+    stack = [(root, False)]
+    while stack:
+        resource, descendants_visited = stack.pop()
+        is_visited = visited_paths is None or resource.path in visited_paths
+        if not descendants_visited:
+            modified = False
+            if is_visited:
+                for visitor in pre_visitors:
+                    if visitor(resource, codebase):
+                        modified = True
+            if modified:
+                save_resource(resource)
+            stack.append((resource, True))
+
+            if traversed_paths is None:
+                children = resource.children(codebase)
+            else:
+                names = [
+                    name
+                    for name in resource.children_names or []
+                    if posixpath.join(resource.path, name) in traversed_paths
+                ]
+                children = names and resource.children(codebase, names=names) or []
+            stack.extend((child, False) for child in reversed(children))
+
+        elif is_visited:
+            modified = False
+            for visitor in post_visitors:
+                if visitor(resource, codebase):
+                    modified = True
+            if modified:
+                save_resource(resource)
+
+
+def _process_codebase(plugin, codebase, **kwargs):
+    if plugin.has_visitors():
+        return tracer.call(
+            plugin.qname() + ":visitors",
+            run_visitors,
+            [plugin],
+            codebase,
+            **kwargs,
+        )
+    if plugin.has_process_resource():
+        return tracer.call(
+            plugin.qname() + ":process_resource",
+            run_process_resource,
+            plugin,
+            codebase,
+            **kwargs,
+        )
+    return tracer.call(
+        plugin.qname() + ":process_codebase",
+        plugin.process_codebase,
+        codebase,
+        **kwargs,
+    )
+
+
+def _run_group(group, codebase, **kwargs):
+    """
+    Run a `group` list of plugins that is either a list of plugins with
+    visitors run in a single traversal or a list of a single plugin. Return a
+    mapping of {plugin: returned value}.
+    """
+    if len(group) > 1:
+        tracer.call("visitors", run_visitors, group, codebase, **kwargs)
+        return {plugin: None for plugin in group}
+    plugin = group[0]
+    return {plugin: _process_codebase(plugin, codebase, **kwargs)}
+
+
+def group_visitors(plugins):
+    """
+    Return a list of groups (lists) of `plugins` where consecutive plugins with
+    visitors that do not depend on each other are grouped together and each
+    other plugin is alone in its group.
+    """
+    groups = []
+    for plugin in plugins:
+        if (
+            plugin.has_visitors()
+            and groups
+            and groups[-1][-1].has_visitors()
+            and not any(_conflicts(member, plugin) for member in groups[-1])
+        ):
+            groups[-1].append(plugin)
+        else:
+            groups.append([plugin])
+    return groups
+
+
+def run_process_codebase(plugins, codebase, max_workers=1, **kwargs):
+    """
+    Run a list of `plugins` of the same stage sorted in their plan (run) order
+    on a `codebase` and return a mapping of {plugin: returned value}.
+
+    Consecutive independent plugins with visitors are run in a single
+    traversal. Plugins
+    with a process_resource() are run on each resource. Other plugins run their
+    process_codebase().
+
+    When `max_workers` is more than one, independent plugins are run
+    concurrently using up to `max_workers` threads.
+    """
+    results = {}
+    if max_workers <= 1:
+        for group in group_visitors(plugins):
+            results.update(_run_group(group, codebase, **kwargs))
+        return results
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for level in get_execution_levels(plugins):
+            # independent plugins with visitors share a single traversal
+            visitors = [p for p in level if p.has_visitors()]
+            groups = [[p] for p in level if not p.has_visitors()]
+
+            if len(groups) + bool(visitors) == 1:
+                results.update(_run_group(visitors or groups[0], codebase, **kwargs))
+                continue
+
+            if TRACE:
+                logger_debug("run_process_codebase: concurrent level:", level)
+
+            # all plugins run on an isolated view of the codebase as saving a
+            # Resource in the shared codebase may rewrite its cache file while
+            # another plugin reads it. Views are merged in plan order.
+            runs = []
+            for plugin in level:
+                if not plugin.has_visitors():
+                    group = [plugin]
+                elif plugin is visitors[0]:
+                    group = visitors
+                else:
+                    continue
+                written = set()
+                for member in group:
+                    written.update(get_written_attributes(member)[0])
+                runs.append((group, IsolatedCodebase(codebase, written)))
+
+            futures = [executor.submit(_run_group, group, view, **kwargs) for group, view in runs]
+
+            # wait for all and raise the first error
+            for future in futures:
+                future.exception()
+            for future in futures:
+                results.update(future.result())
+
+            # merge in plan order for deterministic results
+            for _group, view in runs:
+                view.merge()
+
+    return {plugin: results[plugin] for plugin in plugins}
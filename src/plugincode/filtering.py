@@ -0,0 +1,278 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/plugincode for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+
+"""
+Compact bitmaps of filtered Resources.
+
+Setting the Resource.is_filtered flag requires to load and save each filtered
+Resource, and Codebase.walk_filtered() loads every Resource to check its flag.
+Instead, output filter plugins can add the ids of filtered Resources to a
+ResourceBitmap of a FilteredResources. Resource ids are assigned to the paths
+in the order they are first seen and are stable: Resources added to the codebase
+get new ids and the ids of removed Resources are never reused. Bitmaps support
+set operations to combine the filters of several plugins.
+
+FilteredResources.walk() computes the walk order of the codebase from its paths
+only, and never loads the filtered Resources. OutputPlugin.get_files() uses it
+when a "filtered_resources" FilteredResources is provided.
+"""
+
+import posixpath
+
+# Tracing flags
+TRACE = False
+
+
+def logger_debug(*args):
+    pass
+
+
+if TRACE:
+    import logging
+    import sys
+
+    logger = logging.getLogger(__name__)
+    logging.basicConfig(stream=sys.stdout)
+    logger.setLevel(logging.DEBUG)
+
+    def logger_debug(*args):
+        return logger.debug(" ".join(isinstance(a, str) and a or repr(a) for a in args))
+
+
+class ResourceBitmap(object):
+    """
+    A set of non-negative integer Resource ids stored as a bitmap of one bit
+    per id, with set operations.
+    For example:
+    >>> a = ResourceBitmap([1, 3, 5])
+    >>> b = ResourceBitmap([3, 4])
+    >>> sorted(a | b), sorted(a & b), sorted(a - b), sorted(a ^ b)
+    ([1, 3, 4, 5], [3], [1, 5], [1, 4, 5])
+    >>> sorted(b.complement(6))
+    [0, 1, 2, 5]
+    """
+
+    def __init__(self, ids=()):
+        self.bits = bytearray()
+        for rid in ids:
+            self.add(rid)
+
+    @classmethod
+    def from_bytes(cls, data):
+        bitmap = cls()
+        bitmap.bits = bytearray(data)
+        return bitmap
+
+    def to_bytes(self):
+        return bytes(self.bits)
+
+    @classmethod
+    def _from_int(cls, value):
+        return cls.from_bytes(value.to_bytes((value.bit_length() + 7) // 8, "little"))
+
+    def _to_int(self):
+        return int.from_bytes(self.bits, "little")
+
+    def add(self, rid):
+        byte_index = rid >> 3
+        if byte_index >= len(self.bits):
+            self.bits.extend(bytes(byte_index + 1 - len(self.bits)))
+        self.bits[byte_index] |= 1 << (rid & 7)
+
+    def discard(self, rid):
+        byte_index = rid >> 3
+        if byte_index < len(self.bits):
+            self.bits[byte_index] &= ~(1 << (rid & 7)) & 0xFF
+
+    def __contains__(self, rid):
+        byte_index = rid >> 3
+        return byte_index < len(self.bits) and bool(self.bits[byte_index] & (1 << (rid & 7)))
+
+    def __iter__(self):
+        for byte_index, byte in enumerate(self.bits):
+            if not byte:
+                continue
+            base = byte_index << 3
+            for bit in range(8):
+                if byte & (1 << bit):
+                    yield base + bit
+
+    def __len__(self):
+        return bin(self._to_int()).count("1")
+
+    def __bool__(self):
+        return any(self.bits)
+
+    def __eq__(self, other):
+        return isinstance(other, ResourceBitmap) and self._to_int() == other._to_int()
+
+    def __or__(self, other):
+        return self._from_int(self._to_int() | other._to_int())
+
+    def __and__(self, other):
+        return self._from_int(self._to_int() & other._to_int())
+
+    def __sub__(self, other):
+        return self._from_int(self._to_int() & ~other._to_int())
+
+    def __xor__(self, other):
+        return self._from_int(self._to_int() ^ other._to_int())
+
+    def complement(self, size):
+        """
+        Return a new bitmap with the ids from 0 to `size` excluded that are not
+        in this bitmap.
+        """
+        return self._from_int(~self._to_int() & ((1 << size) - 1))
+
+    def __repr__(self):
+        return "ResourceBitmap({!r})".format(list(self))
+
+
+class FilteredResources(object):
+    """
+    The filtered Resources of a `codebase` as a `bitmap` ResourceBitmap of
+    Resource ids.
+    """
+
+    def __init__(self, codebase, bitmap=None):
+        self.codebase = codebase
+        self.bitmap = bitmap if bitmap is not None else ResourceBitmap()
+        # list of paths indexed by Resource id and mapping of {path: Resource
+        # id}: these only grow such that ids are never reused
+        self._paths = []
+        self._ids = {}
+
+    def _add_id(self, path):
+        rid = self._ids[path] = len(self._paths)
+        self._paths.append(path)
+        return rid
+
+    def _get_ids(self):
+        """
+        Return a mapping of {Resource path: Resource id} with an id for each
+        Resource of the codebase.
+        """
+        ids = self._ids
+        # Resources may be added to a codebase after ids are assigned
+        for path in self.codebase.resources_by_path:
+            if path not in ids:
+                self._add_id(path)
+        return ids
+
+    @property
+    def paths(self):
+        """
+        Return the list of Resource paths indexed by Resource id, including the
+        paths of the Resources removed from the codebase.
+        """
+        self._get_ids()
+        return self._paths
+
+    def get_id(self, path):
+        """
+        Return the Resource id of a Resource `path`. Raise a KeyError if this
+        path was never in the codebase.
+        """
+        rid = self._ids.get(path)
+        if rid is None:
+            if path not in self.codebase.resources_by_path:
+                raise KeyError(path)
+            rid = self._add_id(path)
+        return rid
+
+    def filter(self, path):
+        """
+        Mark the Resource with `path` as filtered.
+        """
+        self.bitmap.add(self.get_id(path))
+
+    def is_filtered(self, path):
+        return self.get_id(path) in self.bitmap
+
+    def get_bitmap(self, paths):
+        """
+        Return a new ResourceBitmap for an iterable of Resource `paths`.
+        """
+        return ResourceBitmap(self.get_id(path) for path in paths)
+
+    def walk_paths(self, topdown=True, skip_root=False):
+        """
+        Yield tuples of (Resource id, path) for all the codebase Resources in
+        the same order as Codebase.walk() and with the same arguments, computed
+        from the codebase paths only without loading any Resource.
+        """
+        ids = self._get_ids()
+        children_by_parent = {}
+        for path in self.codebase.resources_by_path:
+            parent = posixpath.dirname(path)
+            if parent and parent != path:
+                children_by_parent.setdefault(parent, []).append(path)
+
+        def sort_key(path):
+            name = posixpath.basename(path)
+            return (path in children_by_parent, name.lower(), name)
+
+        root_path = self.codebase.root.path
+        has_children = root_path in children_by_parent
+        if self.codebase.has_single_resource or (skip_root and not has_children):
+            skip_root = False
+
+        if topdown and not skip_root:
+            yield ids[root_path], root_path
+
+        # a stack of (path, iterator of its sorted children paths) to walk the
+        # tree depth-first without recursion
+        stack = [(root_path, iter(sorted(children_by_parent.get(root_path, ()), key=sort_key)))]
+        while stack:
+            _parent, children = stack[-1]
+            child = next(children, None)
+            if child is None:
+                parent, _children = stack.pop()
+                if not topdown and stack:
+                    yield ids[parent], parent
+                continue
+            if topdown:
+                yield ids[child], child
+            grand_children = children_by_parent.get(child)
+            if grand_children:
+                stack.append((child, iter(sorted(grand_children, key=sort_key))))
+            elif not topdown:
+                yield ids[child], child
+
+        if not topdown and not skip_root:
+            yield ids[root_path], root_path
+
+    def walk(self, topdown=True, skip_root=False):
+        """
+        Yield the Resources that are not filtered as with
+        Codebase.walk_filtered() without loading the Resources whose id is in
+        the bitmap. Resources with the is_filtered flag set are also skipped.
+        """
+        bitmap = self.bitmap
+        get_resource = self.codebase.get_resource
+        for rid, path in self.walk_paths(topdown=topdown, skip_root=skip_root):
+            if rid in bitmap:
+                continue
+            resource = get_resource(path)
+            if not resource.is_filtered:
+                yield resource
+
+    def save_flags(self):
+        """
+        Set the is_filtered flag of the filtered Resources and save them, for
+        code that uses Codebase.walk_filtered().
+        """
+        codebase = self.codebase
+        paths = self.paths
+        for rid in self.bitmap:
+            resource = codebase.get_resource(paths[rid])
+            if resource is None:
+                # removed from the codebase
+                continue
+            resource.is_filtered = True
+            codebase.save_resource(resource)
@@ -0,0 +1,207 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/plugincode for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+
+"""
+Incremental re-execution of post-scan plugins.
+
+A plugin declares the Resource and Codebase attributes it reads (with
+`required_resource_attributes` and `required_codebase_attributes`) and writes
+(with `resource_attributes`, `codebase_attributes`,
+`updated_resource_attributes` and `updated_codebase_attributes`).
+
+An IncrementalState stores for each plugin and each Resource a digest of the
+attributes read and the values of the attributes written. On the next run, only
+the Resources whose inputs changed (and their ancestors for plugins that
+aggregate data up the tree) are recomputed and the stored outputs are reused for
+all the other Resources.
+
+Only plugins that implement process_resource() or get_visitors() can be
+re-executed on a subset of Resources. Other plugins are re-executed fully
+whenever any of their inputs changed.
+"""
+
+import hashlib
+import json
+import os
+import posixpath
+
+from plugincode.checkpoint import get_plugin_fingerprint
+from plugincode.execution import get_read_attributes
+from plugincode.execution import get_written_attributes
+from plugincode.execution import run_process_codebase
+from plugincode.execution import run_process_resource
+from plugincode.execution import run_visitors
+
+# Tracing flags
+TRACE = False
+
+
+def logger_debug(*args):
+    pass
+
+
+if TRACE:
+    import logging
+    import sys
+
+    logger = logging.getLogger(__name__)
+    logging.basicConfig(stream=sys.stdout)
+    logger.setLevel(logging.DEBUG)
+
+    def logger_debug(*args):
+        return logger.debug(" ".join(isinstance(a, str) and a or repr(a) for a in args))
+
+
+# essential Resource attributes that are always considered as read
+ESSENTIAL_INPUT_ATTRIBUTES = ("is_file", "size", "children_names")
+
+
+def get_digest(values):
+    """
+    Return a digest string for a mapping of JSON-serializable `values`.
+    """
+    data = json.dumps(values, sort_keys=True, separators=(",", ":"), default=repr)
+    return hashlib.sha1(data.encode("utf-8")).hexdigest()
+
+
+def get_input_digest(resource, attributes):
+    """
+    Return a digest of the essential and `attributes` values of a `resource`.
+    """
+    names = ESSENTIAL_INPUT_ATTRIBUTES + tuple(attributes)
+    return get_digest({name: getattr(resource, name, None) for name in names})
+
+
+def get_ancestor_paths(path):
+    """
+    Yield the paths of the ancestors of a Resource `path`.
+    For example:
+    >>> list(get_ancestor_paths("root/dir/file.c"))
+    ['root/dir', 'root']
+    """
+    parent = posixpath.dirname(path)
+    while parent:
+        yield parent
+        parent = posixpath.dirname(parent)
+
+
+class IncrementalState(object):
+    """
+    The stored inputs digests and outputs of plugins from a previous run.
+
+    This is a mapping of {plugin qname: plugin state} where a plugin state is a
+    mapping with these keys:
+    - "fingerprint": the plugin fingerprint.
+    - "codebase_inputs": a digest of the Codebase attributes read.
+    - "codebase_outputs": a mapping of the Codebase attributes written.
+    - "resources": a mapping of {path: [input digest, outputs mapping]}.
+    """
+
+    def __init__(self, location=None):
+        self.location = location
+        self.plugins = {}
+        if location and os.path.exists(location):
+            with open(location) as state:
+                self.plugins = json.load(state)
+
+    def save(self, location=None):
+        location = location or self.location
+        with open(location, "w") as state:
+            # outputs may not be JSON-serializable: use the same repr()
+            # fallback as the digests
+            json.dump(self.plugins, state, separators=(",", ":"), default=repr)
+
+
+def restore_outputs(codebase, resources_outputs, paths):
+    """
+    Restore the stored `resources_outputs` mapping of {path: [digest, outputs]}
+    for the Resources of a `codebase` with `paths`.
+    """
+    for path in paths:
+        resource = codebase.get_resource(path)
+        _digest, outputs = resources_outputs[path]
+        for name, value in outputs.items():
+            setattr(resource, name, value)
+        codebase.save_resource(resource)
+
+
+def run_incremental(plugin, codebase, state, **kwargs):
+    """
+    Run a `plugin` on a `codebase` recomputing only the Resources whose inputs
+    changed since the run recorded in the `state` IncrementalState and reusing
+    the stored outputs for the other Resources. Update the `state` with this
+    run. Return the set of recomputed Resource paths.
+    """
+    qname = plugin.qname()
+    resource_reads, codebase_reads = get_read_attributes(plugin)
+    resource_reads = sorted(resource_reads)
+    resource_writes, codebase_writes = get_written_attributes(plugin)
+    resource_writes = sorted(resource_writes)
+    codebase_writes = sorted(codebase_writes)
+
+    fingerprint = get_plugin_fingerprint(type(plugin))
+    codebase_inputs = get_digest(
+        {name: getattr(codebase.attributes, name, None) for name in sorted(codebase_reads)}
+    )
+
+    previous = state.plugins.get(qname) or {}
+    previous_resources = previous.get("resources") or {}
+    if (
+        previous.get("fingerprint") != fingerprint
+        or previous.get("codebase_inputs") != codebase_inputs
+    ):
+        previous_resources = {}
+
+    digests = {}
+    affected = set()
+    for resource in codebase.walk():
+        path = resource.path
+        digest = digests[path] = get_input_digest(resource, resource_reads)
+        stored = previous_resources.get(path)
+        if not stored or stored[0] != digest:
+            affected.add(path)
+
+    # removed Resources may change the aggregated data of their ancestors
+    removed = set(previous_resources).difference(digests)
+    if plugin.aggregates_descendants:
+        for path in list(affected) + list(removed):
+            for ancestor in get_ancestor_paths(path):
+                if ancestor in digests:
+                    affected.add(ancestor)
+
+    if TRACE:
+        logger_debug("run_incremental:", qname, "affected:", len(affected), "of", len(digests))
+
+    if not affected and not removed:
+        restore_outputs(codebase, previous_resources, digests)
+        for name, value in (previous.get("codebase_outputs") or {}).items():
+            setattr(codebase.attributes, name, value)
+
+    elif (plugin.has_process_resource() or plugin.has_visitors()) and not codebase_writes:
+        restore_outputs(codebase, previous_resources, set(digests).difference(affected))
+        if plugin.has_visitors():
+            run_visitors([plugin], codebase, visited_paths=affected, **kwargs)
+        else:
+            resources = (r for r in codebase.walk() if r.path in affected)
+            run_process_resource(plugin, codebase, resources=resources, **kwargs)
+
+    else:
+        affected = set(digests)
+        run_process_codebase([plugin], codebase, **kwargs)
+
+    resources_state = {}
+    for resource in codebase.walk():
+        outputs = {name: getattr(resource, name) for name in resource_writes}
+        resources_state[resource.path] = [digests[resource.path], outputs]
+
+    state.plugins[qname] = dict(
+        fingerprint=fingerprint,
+        codebase_inputs=codebase_inputs,
+        codebase_outputs={name: getattr(codebase.attributes, name) for name in codebase_writes},
+        resources=resources_state,
+    )
+    return affected
@@ -0,0 +1,243 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/plugincode for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+
+"""
+JSON Lines output with a sidecar byte-offset index for random access by path.
+
+The JSON Lines output has a first line with the scan headers as {"headers":
+[...]}, then one line for each serialized file mapping and a last line with the
+codebase attributes (such as summaries) as {"attributes": {...}}.
+
+The index is written during the codebase walk. It is a binary file with a
+header and an array of fixed-size entries sorted by path hash. Each entry has a
+64-bit hash of the path, and the byte offset and length of the file line. A
+reader looks up a path with a binary search in the index (optionally memory-
+mapped) and then reads and decodes only the line of this path.
+"""
+
+from array import array
+import hashlib
+import json
+import mmap
+import os
+import struct
+
+import attr
+
+from plugincode import PlugincodeError
+from plugincode.compression import get_binary_file
+from plugincode.encoders import get_encoder
+from plugincode.output import OutputPlugin
+
+# Tracing flags
+TRACE = False
+
+
+def logger_debug(*args):
+    pass
+
+
+if TRACE:
+    import logging
+    import sys
+
+    logger = logging.getLogger(__name__)
+    logging.basicConfig(stream=sys.stdout)
+    logger.setLevel(logging.DEBUG)
+
+    def logger_debug(*args):
+        return logger.debug(" ".join(isinstance(a, str) and a or repr(a) for a in args))
+
+
+INDEX_MAGIC = b"PLJI"
+INDEX_VERSION = 1
+INDEX_EXTENSION = ".idx"
+
+# magic, version and number of entries
+_index_header = struct.Struct(">4sBQ")
+# path hash, line offset and line length
+_index_entry = struct.Struct(">QQI")
+
+
+def get_path_hash(path):
+    """
+    Return a stable 64-bit integer hash of a `path` string.
+    """
+    return int.from_bytes(hashlib.blake2b(path.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class IndexBuilder(object):
+    """
+    Collect the path hash, line offset and line length of each file line and
+    write them as a sorted binary index.
+    """
+
+    def __init__(self):
+        self.hashes = array("Q")
+        self.offsets = array("Q")
+        self.lengths = array("L")
+
+    def add(self, path, offset, length):
+        self.hashes.append(get_path_hash(path))
+        self.offsets.append(offset)
+        self.lengths.append(length)
+
+    def write(self, index_file):
+        """
+        Write the index to the `index_file` binary file-like object.
+        """
+        hashes = self.hashes
+        offsets = self.offsets
+        lengths = self.lengths
+        order = sorted(range(len(hashes)), key=lambda i: (hashes[i], offsets[i]))
+        index_file.write(_index_header.pack(INDEX_MAGIC, INDEX_VERSION, len(order)))
+        pack = _index_entry.pack
+        for i in order:
+            index_file.write(pack(hashes[i], offsets[i], lengths[i]))
+
+
+class JsonLinesIndex(object):
+    """
+    A JSON Lines index read from an `index_location`. The index is memory-
+    mapped if `use_mmap` is True or read in memory otherwise.
+    """
+
+    def __init__(self, index_location, use_mmap=True):
+        with open(index_location, "rb") as index_file:
+            # an empty file cannot be memory-mapped
+            if use_mmap and os.fstat(index_file.fileno()).st_size:
+                self.data = mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                self.data = index_file.read()
+        if len(self.data) < _index_header.size:
+            raise PlugincodeError("Not a JSON Lines index: {}".format(index_location))
+        magic, version, self.entries_count = _index_header.unpack_from(self.data, 0)
+        if magic != INDEX_MAGIC or version != INDEX_VERSION:
+            raise PlugincodeError("Not a JSON Lines index: {}".format(index_location))
+
+    def _get_entry(self, position):
+        return _index_entry.unpack_from(
+            self.data, _index_header.size + position * _index_entry.size
+        )
+
+    def get_locations(self, path):
+        """
+        Return a list of (offset, length) tuples for the lines with the same
+        path hash as `path`: usually one or none.
+        """
+        path_hash = get_path_hash(path)
+        low = 0
+        high = self.entries_count
+        while low < high:
+            middle = (low + high) // 2
+            if self._get_entry(middle)[0] < path_hash:
+                low = middle + 1
+            else:
+                high = middle
+        locations = []
+        for position in range(low, self.entries_count):
+            entry_hash, offset, length = self._get_entry(position)
+            if entry_hash != path_hash:
+                break
+            locations.append((offset, length))
+        return locations
+
+    def __len__(self):
+        return self.entries_count
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+
+
+class JsonLinesReader(object):
+    """
+    Read the serialized file mapping of a path from the JSON Lines file at
+    `location` using its index at `index_location` (the `location` with an
+    ".idx" extension by default).
+    """
+
+    def __init__(self, location, index_location=None, use_mmap=True):
+        self.index = JsonLinesIndex(index_location or location + INDEX_EXTENSION, use_mmap)
+        self.input_file = open(location, "rb")
+
+    def get(self, path):
+        """
+        Return the serialized file mapping of `path` or None if not found.
+        """
+        for offset, length in self.index.get_locations(path):
+            self.input_file.seek(offset)
+            file_data = json.loads(self.input_file.read(length).decode("utf-8"))
+            # the hashes of two paths may collide
+            if file_data.get("path") == path:
+                return file_data
+
+    def close(self):
+        self.index.close()
+        self.input_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class JsonLinesOutputPlugin(OutputPlugin):
+    """
+    Base class for output plugins that write scan results as JSON Lines with
+    a sidecar index. Subclasses must provide a CLI option to pass an `output`
+    file: the index is written next to this file with an ".idx" extension. No
+    index is written for an output file without a location such as stdout.
+    """
+
+    def process_codebase(self, codebase, output, **kwargs):
+        name = getattr(output, "name", None)
+        # stdout and other streams are named "<stdout>" or have a file
+        # descriptor integer name
+        if not isinstance(name, str) or name.startswith("<"):
+            self.write_json_lines(codebase, output, None, **kwargs)
+            return
+        with open(name + INDEX_EXTENSION, "wb") as index_file:
+            self.write_json_lines(codebase, output, index_file, **kwargs)
+
+    @classmethod
+    def write_json_lines(cls, codebase, output_file, index_file, **kwargs):
+        """
+        Write a `codebase` as JSON Lines to the `output_file` file-like object
+        and its index to the `index_file` binary file-like object if provided.
+        Return the number of files written.
+        """
+        output_file = get_binary_file(output_file)
+        encode = get_encoder(kwargs.get("json_encoder") or cls.json_encoder).encode
+        index = IndexBuilder()
+        count = 0
+
+        try:
+            offset = output_file.tell()
+        except OSError:
+            # a stream such as a pipe starts at zero
+            offset = 0
+        line = encode(dict(headers=codebase.get_headers())).encode("utf-8") + b"\n"
+        output_file.write(line)
+        offset += len(line)
+
+        for file_data in cls.get_files(codebase, **kwargs):
+            line = encode(file_data).encode("utf-8")
+            output_file.write(line + b"\n")
+            if index_file is not None:
+                index.add(file_data["path"], offset, len(line))
+            offset += len(line) + 1
+            count += 1
+
+        attributes = dict(attributes=attr.asdict(codebase.attributes))
+        output_file.write(encode(attributes).encode("utf-8") + b"\n")
+        if index_file is not None:
+            index.write(index_file)
+        if TRACE:
+            logger_debug("write_json_lines: files:", count)
+        return count
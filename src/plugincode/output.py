@@ -5,14 +5,25 @@
 # See https://github.com/aboutcode-org/plugincode for support or download.
 # See https://aboutcode.org for more information about nexB OSS projects.
 
+from concurrent.futures import ProcessPoolExecutor
 import functools
+import json
+import queue
+import threading
 
 from commoncode.resource import Resource
 
 from plugincode import CodebasePlugin
+from plugincode import PlugincodeError
 from plugincode import PluginManager
 from plugincode import HookimplMarker
 from plugincode import HookspecMarker
+from plugincode.compression import CompressedWriter
+from plugincode.compression import get_binary_file
+from plugincode.encoders import get_encoder
+from plugincode.execution import chunked
+from plugincode.execution import map_bounded
+from plugincode.serializers import get_serializer
 
 # Tracing flags
 TRACE = False
@@ -35,6 +46,10 @@ if TRACE or TRACE_DEEP:
         return logger.debug(" ".join(isinstance(a, str) and a or repr(a) for a in args))
 
 
+# default approximate size in characters of the chunks written to an output
+# file when streaming JSON
+JSON_CHUNK_SIZE = 64 * 1024
+
 stage = "output"
 entrypoint = "scancode_output"
 
@@ -48,6 +63,30 @@ class OutputPlugin(CodebasePlugin):
     Base plugin class for scan output formatters all output plugins must extend.
     """
 
+    # Flag set to True if the serialized files of this output plugin can be
+    # encoded in parallel in worker processes and written in walk order, such
+    # as JSON. Plugins that need sequential state across files (for instance to
+    # compute a running checksum) must keep this to False.
+    # Subclasses should set this as needed.
+    parallel_serialization = False
+
+    # A list of the serialized file field names that this output plugin writes
+    # or None to write all the fields. The "path" field is always included.
+    # The serializer never reads the attributes of the other fields.
+    # Subclasses should set this as needed.
+    output_fields = None
+
+    # The name of the JSON encoder backend used to encode compact JSON (one of
+    # the plugincode.encoders names such as "orjson" or "stdlib") or None to
+    # use the fastest available encoder.
+    # Subclasses can set this as needed.
+    json_encoder = None
+
+    # The name of the compression of the output stream (one of the
+    # plugincode.compression names "gzip" or "zstd") or None to not compress.
+    # Subclasses can set this as needed.
+    compression = None
+
     def process_codebase(self, codebase, output, **kwargs):
         """
         Write `codebase` to the `output` file-like object (which could be a
@@ -58,13 +97,12 @@ class OutputPlugin(CodebasePlugin):
         raise NotImplementedError
 
     @classmethod
-    def get_files(cls, codebase, **kwargs):
+    def get_serialization_options(cls, codebase, **kwargs):
         """
-        Return an iterable of serialized files mapping from a codebase.
+        Return a mapping of Resource.to_dict() keyword arguments for a
+        `codebase` from the scancode call arguments `kwargs`.
         Include "info", "timing" and strip root as needed.
         """
-        # FIXME: serialization SHOULD NOT be needed: only some format need it
-        # (e.g. JSON) and only these should serialize
         with_timing = kwargs.get("timing", False)
         with_info = bool(kwargs.get("info") or getattr(
             codebase, "with_info", False))
@@ -76,17 +114,314 @@ class OutputPlugin(CodebasePlugin):
         else:
             strip_root = kwargs.get("strip_root", False)
 
-        serializer = functools.partial(
-            Resource.to_dict,
+        return dict(
             with_info=with_info,
             with_timing=with_timing,
             full_root=full_root,
             strip_root=strip_root,
         )
 
-        resources = codebase.walk_filtered(topdown=True, skip_root=strip_root)
+    @classmethod
+    def get_fields(cls, **kwargs):
+        """
+        Return a set of the serialized file field names to output or None for
+        all the fields. This is either the list of the user-requested "fields"
+        from the scancode call arguments `kwargs` or this plugin
+        `output_fields`. The "path" field is always included.
+        """
+        fields = kwargs.get("fields") or cls.output_fields
+        if not fields:
+            return None
+        fields = set(fields)
+        fields.add("path")
+        return fields
+
+    @classmethod
+    def get_files(cls, codebase, **kwargs):
+        """
+        Return an iterable of serialized files mapping from a codebase.
+        Include "info", "timing" and strip root as needed.
+
+        If a `shared_files` iterable is provided in `kwargs`, return it as-is:
+        this is the stream of files shared by all output plugins when run with
+        run_output_plugins(). The shared mappings must not be modified.
+
+        If a `filtered_resources` plugincode.filtering.FilteredResources is
+        provided in `kwargs`, its filtered Resources are skipped without being
+        loaded.
+        """
+        shared_files = kwargs.get("shared_files")
+        if shared_files is not None:
+            return shared_files
+
+        # FIXME: serialization SHOULD NOT be needed: only some format need it
+        # (e.g. JSON) and only these should serialize
+        options = cls.get_serialization_options(codebase, **kwargs)
+        fields = cls.get_fields(**kwargs)
+        resource_class = getattr(codebase, "resource_class", None)
+        if resource_class:
+            serializer = get_serializer(resource_class, fields=fields, **options)
+        else:
+            serializer = functools.partial(Resource.to_dict, **options)
+            if fields:
+                serializer = functools.partial(project_fields, serializer, fields)
+
+        filtered_resources = kwargs.get("filtered_resources")
+        if filtered_resources is not None:
+            resources = filtered_resources.walk(topdown=True, skip_root=options["strip_root"])
+        else:
+            resources = codebase.walk_filtered(topdown=True, skip_root=options["strip_root"])
         return map(serializer, resources)
 
+    @classmethod
+    def get_encoded_files(cls, codebase, indent=None, processes=1, files_per_chunk=100, **kwargs):
+        """
+        Yield tuples of (number of files, JSON text) for the serialized files of
+        a `codebase` in walk order, where the JSON text is the encoded files
+        separated by commas, without enclosing brackets. Use an `indent` for
+        pretty-printing if provided. Compact JSON is encoded with the
+        "json_encoder" backend from the scancode call arguments `kwargs` or
+        this plugin `json_encoder`.
+
+        If this plugin class has `parallel_serialization` set to True and
+        `processes` is more than one, the files are encoded in chunks of
+        `files_per_chunk` files by a pool of `processes` worker processes and
+        yielded in their original walk order. Otherwise, each file is encoded
+        sequentially.
+        """
+        encoder_name = kwargs.get("json_encoder") or cls.json_encoder
+        files = cls.get_files(codebase, **kwargs)
+        if not (cls.parallel_serialization and processes and processes > 1):
+            encoder = get_json_encoder(indent, encoder_name)
+            for file_data in files:
+                yield 1, encoder.encode(file_data)
+            return
+
+        encode = functools.partial(encode_json_files, indent=indent, encoder_name=encoder_name)
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            chunks = chunked(files, files_per_chunk)
+            for encoded in map_bounded(executor, encode, chunks, processes * 2):
+                yield encoded
+
+    @classmethod
+    def write_json_files(
+        cls, codebase, output_file, indent=None, chunk_size=JSON_CHUNK_SIZE, **kwargs
+    ):
+        """
+        Stream the serialized files of a `codebase` as a JSON array to the
+        `output_file` text file-like object and return the number of files
+        written. Use an `indent` for pretty-printing if provided.
+
+        Files are serialized and encoded as with get_encoded_files() and
+        written in chunks of about `chunk_size` characters such that the memory
+        used stays the same regardless of the number of files.
+
+        The output is compressed with the "compression" from the scancode call
+        arguments `kwargs` or this plugin `compression` if any, using
+        "compression_threads" threads.
+        """
+        compression = kwargs.pop("compression", None) or cls.compression
+        compression_threads = kwargs.pop("compression_threads", None)
+        encoded_files = cls.get_encoded_files(codebase, indent=indent, **kwargs)
+        if not compression:
+            return write_json_array(encoded_files, output_file, indent, chunk_size)
+
+        compressed = CompressedWriter(
+            get_binary_file(output_file),
+            compression=compression,
+            threads=compression_threads,
+        )
+        with compressed:
+            return write_json_array(encoded_files, compressed, indent, chunk_size)
+
+
+def write_json_array(encoded_files, output_file, indent=None, chunk_size=JSON_CHUNK_SIZE):
+    """
+    Write the `encoded_files` iterable of (number of files, JSON text) tuples
+    from OutputPlugin.get_encoded_files() as a JSON array to the `output_file`
+    file-like object in chunks of about `chunk_size` characters. Return the
+    number of files written.
+    """
+    separator = get_json_separator(indent)
+    buffer = ["["]
+    buffered = 1
+    count = 0
+    for files_count, encoded in encoded_files:
+        if count:
+            buffer.append(separator)
+            buffered += len(separator)
+        count += files_count
+        buffer.append(encoded)
+        buffered += len(encoded)
+        if buffered >= chunk_size:
+            output_file.write("".join(buffer))
+            buffer = []
+            buffered = 0
+    buffer.append("]")
+    output_file.write("".join(buffer))
+    if TRACE:
+        logger_debug("write_json_array: files:", count)
+    return count
+
+
+def project_fields(serializer, fields, resource):
+    """
+    Return a serialized `resource` mapping using a `serializer` callable with
+    only the `fields` set of field names.
+    """
+    return {k: v for k, v in serializer(resource).items() if k in fields}
+
+
+def get_json_encoder(indent=None, encoder_name=None):
+    """
+    Return an encoder object with an encode(obj) method for compact output
+    using the `encoder_name` backend (or the fastest available) or
+    pretty-printed with `indent` using the standard library.
+    """
+    if indent is None:
+        return get_encoder(encoder_name)
+    return json.JSONEncoder(indent=indent, separators=(",", ": "), ensure_ascii=False)
+
+
+def get_json_separator(indent=None):
+    """
+    Return the separator string between encoded files of a JSON array.
+    """
+    return "," if indent is None else ",\n"
+
+
+def encode_json_files(files, indent=None, encoder_name=None):
+    """
+    Return a tuple of (number of files, JSON text) for a list of serialized
+    `files` mappings encoded and separated by commas. This is a top-level
+    function such that it can be used with multiprocessing.
+    """
+    encode = get_json_encoder(indent, encoder_name).encode
+    return len(files), get_json_separator(indent).join(encode(f) for f in files)
+
+
+# marker for the end of a shared files stream
+END_OF_FILES = object()
+
+
+class SharedFiles(object):
+    """
+    An iterable of serialized files received from a bounded queue, used as the
+    `shared_files` of one output plugin. This can be iterated only once.
+    """
+
+    def __init__(self, max_chunks=8):
+        self.queue = queue.Queue(maxsize=max_chunks)
+        # set to True once iterated
+        self.started = False
+        # set to True once the end of files marker has been received
+        self.exhausted = False
+
+    def __iter__(self):
+        if self.started:
+            raise PlugincodeError("Shared files can be iterated only once.")
+        self.started = True
+        return self._iter_files()
+
+    def _iter_files(self):
+        while not self.exhausted:
+            chunk = self.queue.get()
+            if chunk is END_OF_FILES:
+                self.exhausted = True
+                return
+            for file_data in chunk:
+                yield file_data
+
+    def drain(self):
+        """
+        Consume and discard all the remaining files, if any.
+        """
+        while not self.exhausted:
+            if self.queue.get() is END_OF_FILES:
+                self.exhausted = True
+
+
+def uses_shared_files(plugin):
+    """
+    Return True if an output `plugin` can consume the shared files stream, e.g.
+    it does not override how files are serialized or which fields.
+    """
+    plugin_class = type(plugin)
+    return (
+        not plugin_class.output_fields
+        and plugin_class.get_files.__func__ is OutputPlugin.get_files.__func__
+        and plugin_class.get_serialization_options.__func__
+        is OutputPlugin.get_serialization_options.__func__
+    )
+
+
+def _run_output_plugin(plugin, codebase, shared_files, errors, kwargs):
+    try:
+        plugin.process_codebase(codebase, shared_files=shared_files, **kwargs)
+    except Exception as e:
+        errors.append((plugin, e))
+    finally:
+        # never block the producer if the plugin did not consume all the files
+        shared_files.drain()
+
+
+def run_output_plugins(plugins, codebase, chunk_size=100, max_chunks=8, **kwargs):
+    """
+    Run the process_codebase() method of a list of output `plugins` on a
+    `codebase`, walking and serializing the codebase files only once.
+
+    Each plugin runs in its own writer thread and receives the same stream of
+    serialized files (through OutputPlugin.get_files()) from a bounded queue of
+    up to `max_chunks` chunks of `chunk_size` files such that memory stays
+    bounded and the slowest writer sets the pace.
+
+    The shared stream can be iterated only once and its mappings must not be
+    modified: a plugin that calls get_files() a second time fails. Plugins that
+    override get_files() or get_serialization_options() or that have
+    `output_fields` do not use the shared stream and run afterwards, one at a
+    time.
+
+    Return a list of (plugin, exception) for the plugins that failed.
+    """
+    errors = []
+    consumers = []
+    for plugin in plugins:
+        if not uses_shared_files(plugin):
+            continue
+        shared_files = SharedFiles(max_chunks=max_chunks)
+        thread = threading.Thread(
+            target=_run_output_plugin,
+            args=(plugin, codebase, shared_files, errors, kwargs),
+            name="output-{}".format(plugin.qname()),
+            daemon=True,
+        )
+        thread.start()
+        consumers.append((shared_files, thread))
+
+    if consumers:
+        try:
+            files = OutputPlugin.get_files(codebase, **kwargs)
+            for chunk in chunked(files, chunk_size):
+                for shared_files, _thread in consumers:
+                    shared_files.queue.put(chunk)
+        finally:
+            for shared_files, thread in consumers:
+                shared_files.queue.put(END_OF_FILES)
+            for shared_files, thread in consumers:
+                thread.join()
+
+    for plugin in plugins:
+        if uses_shared_files(plugin):
+            continue
+        try:
+            plugin.process_codebase(codebase, **kwargs)
+        except Exception as e:
+            errors.append((plugin, e))
+
+    if TRACE:
+        logger_debug("run_output_plugins: errors:", errors)
+    return errors
+
 
 output_plugins = PluginManager(
     stage=stage, module_qname=__name__, entrypoint=entrypoint, plugin_base_class=OutputPlugin
@@ -24,10 +24,12 @@ class OutputFilterPlugin(CodebasePlugin):
     plugins must extend.
 
     Filter plugins MUST NOT modify the codebase beyond setting the
-    Resource.is_filtered flag on resources.
+    Resource.is_filtered flag on resources, or adding the filtered resources to
+    a plugincode.filtering.FilteredResources "filtered_resources" keyword
+    argument when provided, which does not load nor save any Resource.
     """
 
-    pass
+    updated_resource_attributes = ["is_filtered"]
 
 
 output_filter_plugins = PluginManager(
@@ -0,0 +1,227 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/plugincode for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+
+"""
+Priority-ordered scanning to get early partial results.
+
+A resource priority function accepts a Resource and returns a sortable priority
+value where lower values are scanned first. Priority functions can be built
+from path patterns, path depth and file extensions, provided by plugins
+through ScanPlugin.get_resource_priority() and combined together.
+
+Resources are then consumed in priority order through a ResourcePriorityQueue
+instead of the codebase walk order.
+"""
+
+from fnmatch import fnmatchcase
+import heapq
+from itertools import count
+
+# base name patterns for package manifests and lockfiles
+MANIFEST_PATTERNS = (
+    "package.json",
+    "package-lock.json",
+    "yarn.lock",
+    "setup.py",
+    "setup.cfg",
+    "pyproject.toml",
+    "requirements*.txt",
+    "pipfile",
+    "pipfile.lock",
+    "pom.xml",
+    "build.gradle",
+    "*.gemspec",
+    "gemfile",
+    "gemfile.lock",
+    "cargo.toml",
+    "cargo.lock",
+    "go.mod",
+    "go.sum",
+    "composer.json",
+    "*.nuspec",
+    "*.podspec",
+    "pubspec.yaml",
+    "debian/control",
+    "*.spec",
+)
+
+# base name patterns for license and legal notice files
+LICENSE_PATTERNS = (
+    "license*",
+    "licence*",
+    "copying*",
+    "notice*",
+    "copyright*",
+    "*.license",
+    "*.licence",
+    "unlicense",
+    "legal*",
+    "authors*",
+)
+
+# default groups of patterns: manifests first, then license files
+DEFAULT_PRIORITY_PATTERNS = (MANIFEST_PATTERNS, LICENSE_PATTERNS)
+
+
+def get_depth(resource):
+    """
+    Return the depth of a `resource` below its codebase root.
+    """
+    return resource.path.strip("/").count("/")
+
+
+def build_pattern_priority(pattern_groups=DEFAULT_PRIORITY_PATTERNS):
+    """
+    Return a priority function that returns the index of the first group of
+    glob patterns in a `pattern_groups` list matching a Resource or the number
+    of groups if no pattern matches. Patterns are matched case-insensitively
+    against the Resource base name or against the path end if the pattern
+    contains a "/".
+    """
+    name_patterns = []
+    path_patterns = []
+    for rank, patterns in enumerate(pattern_groups):
+        if isinstance(patterns, str):
+            patterns = (patterns,)
+        for pattern in patterns:
+            pattern = pattern.lower()
+            if "/" in pattern:
+                path_patterns.append((rank, "*/" + pattern.strip("/")))
+            else:
+                name_patterns.append((rank, pattern))
+
+    default_rank = len(pattern_groups)
+
+    def pattern_priority(resource):
+        name = resource.name.lower()
+        path = None
+        rank = default_rank
+        for prank, pattern in name_patterns:
+            if prank >= rank:
+                break
+            if fnmatchcase(name, pattern):
+                rank = prank
+                break
+        for prank, pattern in path_patterns:
+            if prank >= rank:
+                continue
+            if path is None:
+                path = "/" + resource.path.lower()
+            if fnmatchcase(path, pattern):
+                rank = prank
+        return rank
+
+    return pattern_priority
+
+
+def build_depth_priority(max_depth=None):
+    """
+    Return a priority function that returns the depth of a Resource, capped at
+    `max_depth` if provided, such that top-level files come first.
+    """
+
+    def depth_priority(resource):
+        depth = get_depth(resource)
+        if max_depth is not None and depth > max_depth:
+            return max_depth
+        return depth
+
+    return depth_priority
+
+
+def build_extension_priority(extensions):
+    """
+    Return a priority function that returns the index of a Resource extension
+    in an `extensions` list of extensions (such as ".json" or ".c") or the
+    number of extensions if the Resource extension is not listed.
+    """
+    ranks = {ext.lower(): rank for rank, ext in reversed(list(enumerate(extensions)))}
+    default_rank = len(extensions)
+
+    def extension_priority(resource):
+        return ranks.get(resource.extension.lower(), default_rank)
+
+    return extension_priority
+
+
+def combine_priorities(*priority_functions):
+    """
+    Return a priority function that returns a tuple of the priorities of all
+    the `priority_functions` such that the first function has precedence.
+    Return None if no priority function is provided.
+    """
+    priority_functions = [pf for pf in priority_functions if pf]
+    if not priority_functions:
+        return
+    if len(priority_functions) == 1:
+        return priority_functions[0]
+
+    def combined_priority(resource):
+        return tuple(pf(resource) for pf in priority_functions)
+
+    return combined_priority
+
+
+def get_default_priority():
+    """
+    Return the default priority function: package manifests first, then
+    license files, each ordered by depth.
+    """
+    return combine_priorities(build_pattern_priority(), build_depth_priority())
+
+
+def get_plugins_priority(plugins, **kwargs):
+    """
+    Return a combined priority function from the priority functions provided
+    by a list of `plugins` ScanPlugin in their order, or None.
+    """
+    return combine_priorities(*[p.get_resource_priority(**kwargs) for p in plugins])
+
+
+class ResourcePriorityQueue(object):
+    """
+    A priority queue of Resources ordered by a `priority` function. Resources
+    with the same priority are returned in their insertion order (such as the
+    walk order).
+    """
+
+    def __init__(self, priority, resources=()):
+        self.priority = priority
+        self._heap = []
+        self._counter = count()
+        for resource in resources:
+            self.push(resource)
+
+    def __len__(self):
+        return len(self._heap)
+
+    def push(self, resource):
+        heapq.heappush(self._heap, (self.priority(resource), next(self._counter), resource))
+
+    def pop(self):
+        """
+        Return the Resource with the lowest priority. Raise IndexError if empty.
+        """
+        return heapq.heappop(self._heap)[-1]
+
+    def __iter__(self):
+        """
+        Yield and consume the Resources of this queue in priority order.
+        """
+        while self._heap:
+            yield self.pop()
+
+
+def iter_by_priority(resources, priority=None):
+    """
+    Yield `resources` in `priority` order or in their original order if
+    `priority` is None.
+    """
+    if not priority:
+        yield from resources
+    else:
+        yield from ResourcePriorityQueue(priority, resources)
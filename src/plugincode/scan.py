@@ -72,6 +72,35 @@ class ScanPlugin(CodebasePlugin):
         """
         raise NotImplementedError
 
+    def get_resource_priority(self, **kwargs):
+        """
+        Return a resource priority callable or None, receiving all the scancode
+        call arguments as kwargs.
+
+        The returned callable accepts a Resource and returns a sortable priority
+        value: Resources with lower values are scanned first (such as package
+        manifests or license files) to get early partial results. See the
+        plugincode.priority module for helpers to build priority callables.
+
+        Subclasses can override optionally.
+        """
+        return None
+
+    def get_accumulators(self, **kwargs):
+        """
+        Return a mapping of {codebase attribute name: Accumulator} or None,
+        receiving all the scancode call arguments as kwargs.
+
+        Each accumulator folds the scan results of every Resource as they are
+        scanned (in each worker) and the partial accumulators are merged such
+        that codebase-level summaries are available when the scan ends without
+        another pass over the Resources. Each name must be declared in
+        "codebase_attributes". See the plugincode.accumulators module.
+
+        Subclasses can override optionally.
+        """
+        return None
+
     def process_codebase(self, codebase, **kwargs):
         """
         Process a `codebase` Codebase object updating its Resource as needed.
@@ -0,0 +1,167 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/plugincode for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+
+"""
+Code-generated Resource serializers specialized per Resource class and flags.
+
+Resource.to_dict() walks and filters all the attr attributes of a Resource with
+attr.asdict() for each Resource. get_serializer() instead generates once, for a
+Resource class and a combination of flags, a function with the list of fields
+and the path attribute baked in. Its returned mappings are the same as
+Resource.to_dict() with the same flags.
+"""
+
+import functools
+
+import attr
+from commoncode.resource import Resource
+
+# Tracing flags
+TRACE = False
+
+
+def logger_debug(*args):
+    pass
+
+
+if TRACE:
+    import logging
+    import sys
+
+    logger = logging.getLogger(__name__)
+    logging.basicConfig(stream=sys.stdout)
+    logger.setLevel(logging.DEBUG)
+
+    def logger_debug(*args):
+        return logger.debug(" ".join(isinstance(a, str) and a or repr(a) for a in args))
+
+
+# types of values used as-is without a copy
+SCALAR_TYPES = frozenset([str, int, float, bool, type(None)])
+
+# names of the standard Resource fields that are not serialized as-is
+RESOURCE_FIELDS = frozenset(a.name for a in attr.fields(Resource))
+
+
+def as_dict_value(value):
+    """
+    Return a copy of `value` the same way as attr.asdict() with its defaults:
+    attr instances become dicts and collections become lists or dicts.
+    """
+    if attr.has(value.__class__):
+        return attr.asdict(value, dict_factory=dict)
+    if isinstance(value, (tuple, list, set, frozenset)):
+        return [as_dict_value(v) for v in value]
+    if isinstance(value, dict):
+        return {as_dict_value(k): as_dict_value(v) for k, v in value.items()}
+    return value
+
+
+def get_serializer_source(
+    resource_class,
+    with_info=False,
+    with_timing=False,
+    full_root=False,
+    strip_root=False,
+    fields=None,
+):
+    """
+    Return the Python source code string of a "serialize(resource)" function
+    specialized for a `resource_class` and flags. If `fields` is a set of field
+    names, only serialize these fields (and always the "path").
+    """
+    if full_root:
+        path_attribute = "full_root_path"
+    elif strip_root:
+        path_attribute = "strip_root_path"
+    else:
+        path_attribute = "path"
+
+    def is_wanted(name):
+        return fields is None or name in fields
+
+    lines = [
+        "def serialize(resource):",
+        "    res = {{'path': resource.{}}}".format(path_attribute),
+    ]
+    if is_wanted("type"):
+        if resource_class.type is Resource.type:
+            lines.append("    res['type'] = 'file' if resource.is_file else 'directory'")
+        else:
+            lines.append("    res['type'] = resource.type")
+
+    if with_info:
+        for name in ("name", "base_name", "extension", "size"):
+            if is_wanted(name):
+                lines.append("    res[{0!r}] = resource.{0}".format(name))
+
+    for field in attr.fields(resource_class):
+        name = field.name
+        if name in RESOURCE_FIELDS or not is_wanted(name):
+            continue
+        lines.extend(
+            [
+                "    value = resource.{}".format(name),
+                "    if value.__class__ not in SCALAR_TYPES:",
+                "        value = as_dict_value(value)",
+                "    res[{!r}] = value".format(name),
+            ]
+        )
+
+    if with_timing:
+        if is_wanted("scan_time"):
+            lines.append("    res['scan_time'] = resource.scan_time or 0")
+        if is_wanted("scan_timings"):
+            lines.append("    res['scan_timings'] = resource.scan_timings or dict()")
+    if with_info:
+        for name in ("files_count", "dirs_count", "size_count"):
+            if is_wanted(name):
+                lines.append("    res[{0!r}] = resource.{0}".format(name))
+
+    if is_wanted("scan_errors"):
+        lines.append("    res['scan_errors'] = resource.scan_errors")
+    lines.append("    return res")
+    return "\n".join(lines) + "\n"
+
+
+def get_serializer(
+    resource_class,
+    with_info=False,
+    with_timing=False,
+    full_root=False,
+    strip_root=False,
+    fields=None,
+):
+    """
+    Return a serializer function that accepts a Resource of `resource_class`
+    and returns the same mapping as Resource.to_dict() called with the same
+    flags. Serializers are generated once and cached per class and flags.
+
+    If `fields` is an iterable of field names, the serializer only serializes
+    these fields (and always the "path") and never reads the other attributes.
+    """
+    if fields is not None:
+        fields = frozenset(fields)
+    return _get_serializer(resource_class, with_info, with_timing, full_root, strip_root, fields)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_serializer(resource_class, with_info, with_timing, full_root, strip_root, fields):
+    source = get_serializer_source(
+        resource_class,
+        with_info=with_info,
+        with_timing=with_timing,
+        full_root=full_root,
+        strip_root=strip_root,
+        fields=fields,
+    )
+    if TRACE:
+        logger_debug("get_serializer:", resource_class, "\n" + source)
+    namespace = dict(SCALAR_TYPES=SCALAR_TYPES, as_dict_value=as_dict_value)
+    code = compile(source, "<serializer {}>".format(resource_class.__name__), "exec")
+    exec(code, namespace)
+    return namespace["serialize"]
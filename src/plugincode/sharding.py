@@ -0,0 +1,268 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/plugincode for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+
+"""
+Sharded output: split the serialized files of a codebase in several output
+files that downstream jobs can process in parallel.
+
+Files are assigned to a shard with one of these strategies:
+
+- "directory": one shard for each top-level directory of the codebase, and one
+  shard for the root and the top-level files. This needs the "type" field.
+- "hash": one of `shards_count` shards based on a stable hash of the path.
+- "count": a new shard every `shard_size` files.
+
+Each shard is a complete output written by an output plugin process_codebase()
+with the headers and summaries of the codebase and the files of this shard only
+through the shared files stream of OutputPlugin.get_files(). The codebase is
+walked and serialized once. A small JSON manifest lists the shards.
+"""
+
+import json
+import os
+import threading
+import zlib
+
+from plugincode import PlugincodeError
+from plugincode.output import END_OF_FILES
+from plugincode.output import OutputPlugin
+from plugincode.output import SharedFiles
+from plugincode.output import _run_output_plugin
+from plugincode.output import uses_shared_files
+
+# Tracing flags
+TRACE = False
+
+
+def logger_debug(*args):
+    pass
+
+
+if TRACE:
+    import logging
+    import sys
+
+    logger = logging.getLogger(__name__)
+    logging.basicConfig(stream=sys.stdout)
+    logger.setLevel(logging.DEBUG)
+
+    def logger_debug(*args):
+        return logger.debug(" ".join(isinstance(a, str) and a or repr(a) for a in args))
+
+
+STRATEGIES = ("directory", "hash", "count")
+
+# strategies where the files of a shard are contiguous in the walk order such
+# that only one shard is written at a time
+SEQUENTIAL_STRATEGIES = ("directory", "count")
+
+
+def get_shard_key_function(
+    strategy, codebase, shards_count=8, shard_size=10000, strip_root=False, full_root=False
+):
+    """
+    Return a function that accepts the walk index and a serialized file
+    mapping and returns the key of its shard, for a sharding `strategy` on a
+    `codebase` with serialized paths options `strip_root` and `full_root`.
+    """
+    if strategy == "count":
+        return lambda index, file_data: index // shard_size
+
+    if strategy == "hash":
+        # crc32 is stable across runs unlike hash()
+        return lambda index, file_data: zlib.crc32(file_data["path"].encode("utf-8")) % shards_count
+
+    if strategy == "directory":
+        if strip_root:
+            root_segments = 0
+        elif full_root:
+            root_segments = len(codebase.root.full_root_path.strip("/").split("/"))
+        else:
+            root_segments = 1
+
+        def get_top_directory(index, file_data):
+            segments = file_data["path"].strip("/").split("/")[root_segments:]
+            if len(segments) > 1 or (segments and file_data.get("type") == "directory"):
+                return segments[0]
+            # the root and the top-level files have no top-level directory
+            return ""
+
+        return get_top_directory
+
+    raise PlugincodeError("Unknown sharding strategy: {!r}".format(strategy))
+
+
+def get_shard_location(output_location, index):
+    """
+    Return the location of the shard with `index` for an `output_location`.
+    For example:
+    >>> get_shard_location("/tmp/scan.json", 3)
+    '/tmp/scan-00003.json'
+    """
+    base, extension = os.path.splitext(output_location)
+    return "{}-{:05d}{}".format(base, index, extension)
+
+
+def get_manifest_location(output_location):
+    """
+    Return the location of the shards manifest for an `output_location`.
+    For example:
+    >>> get_manifest_location("/tmp/scan.json")
+    '/tmp/scan.manifest.json'
+    """
+    base, _extension = os.path.splitext(output_location)
+    return base + ".manifest.json"
+
+
+class Shard(object):
+    """
+    One output shard with the `index` and `key` written to `location` by an
+    output plugin in its own writer thread.
+    """
+
+    def __init__(self, index, key, location, chunk_size=100, max_chunks=8):
+        self.index = index
+        self.key = key
+        self.location = location
+        self.chunk_size = chunk_size
+        self.shared_files = SharedFiles(max_chunks=max_chunks)
+        self.files = []
+        self.files_count = 0
+        self.output_file = None
+        self.thread = None
+
+    def start(self, plugin, codebase, output_option, mode, errors, kwargs):
+        self.output_file = open(self.location, mode)
+        kwargs = dict(kwargs)
+        kwargs[output_option] = self.output_file
+        self.thread = threading.Thread(
+            target=_run_output_plugin,
+            args=(plugin, codebase, self.shared_files, errors, kwargs),
+            name="output-shard-{}".format(self.index),
+            daemon=True,
+        )
+        self.thread.start()
+
+    def add(self, file_data):
+        self.files.append(file_data)
+        self.files_count += 1
+        if len(self.files) >= self.chunk_size:
+            self.shared_files.queue.put(self.files)
+            self.files = []
+
+    def finish(self):
+        try:
+            if self.files:
+                self.shared_files.queue.put(self.files)
+                self.files = []
+            self.shared_files.queue.put(END_OF_FILES)
+            self.thread.join()
+        finally:
+            self.output_file.close()
+
+    def to_dict(self):
+        return dict(
+            location=os.path.basename(self.location),
+            key=self.key,
+            files_count=self.files_count,
+        )
+
+
+def write_shards(
+    plugin,
+    codebase,
+    output_location,
+    strategy="count",
+    shards_count=8,
+    shard_size=10000,
+    output_option="output",
+    mode="w",
+    chunk_size=100,
+    max_chunks=8,
+    **kwargs,
+):
+    """
+    Write the files of a `codebase` in shards using an output `plugin` and a
+    sharding `strategy` and return a manifest mapping that is also saved as
+    JSON next to the `output_location`. Shards are saved next to the
+    `output_location` with a shard index suffix.
+
+    The `plugin` process_codebase() is called once for each shard with a
+    shard file opened with `mode` as its `output_option` keyword argument, the
+    files of this shard as the `shared_files` and a `shard` mapping with the
+    "index" and "key" of the shard. The `plugin` must use the shared files
+    stream (see plugincode.output.run_output_plugins()).
+
+    Raise a PlugincodeError if a shard could not be written.
+    """
+    if not uses_shared_files(plugin):
+        raise PlugincodeError("Output plugin cannot write shards: {}".format(plugin.qname()))
+    options = OutputPlugin.get_serialization_options(codebase, **kwargs)
+    get_key = get_shard_key_function(
+        strategy,
+        codebase,
+        shards_count=shards_count,
+        shard_size=shard_size,
+        strip_root=options["strip_root"],
+        full_root=options["full_root"],
+    )
+    sequential = strategy in SEQUENTIAL_STRATEGIES
+
+    errors = []
+    # mapping of {key: Shard} for the shards being written
+    shards_by_key = {}
+    shards = []
+    current = None
+    try:
+        files = OutputPlugin.get_files(codebase, **kwargs)
+        for index, file_data in enumerate(files):
+            key = get_key(index, file_data)
+            if current is not None and current.key == key:
+                current.add(file_data)
+                continue
+
+            shard = shards_by_key.get(key)
+            if shard is None:
+                if sequential and any(s.key == key for s in shards):
+                    raise PlugincodeError(
+                        "Files of shard {!r} are not contiguous in the walk.".format(key)
+                    )
+                if sequential and current is not None:
+                    del shards_by_key[current.key]
+                    current.finish()
+                shard_index = len(shards)
+                shard = Shard(
+                    index=shard_index,
+                    key=key,
+                    location=get_shard_location(output_location, shard_index),
+                    chunk_size=chunk_size,
+                    max_chunks=max_chunks,
+                )
+                shard_kwargs = dict(kwargs, shard=dict(index=shard_index, key=key))
+                shard.start(plugin, codebase, output_option, mode, errors, shard_kwargs)
+                shards_by_key[key] = shard
+                shards.append(shard)
+            current = shard
+            current.add(file_data)
+    finally:
+        for shard in shards_by_key.values():
+            shard.finish()
+
+    if errors:
+        _plugin, error = errors[0]
+        raise PlugincodeError("Failed to write output shard: {!r}".format(error)) from error
+
+    manifest = dict(
+        strategy=strategy,
+        files_count=sum(s.files_count for s in shards),
+        shards=[s.to_dict() for s in shards],
+    )
+    with open(get_manifest_location(output_location), "w") as manifest_file:
+        json.dump(manifest, manifest_file, indent=2)
+    if TRACE:
+        logger_debug("write_shards: shards:", len(shards))
+    return manifest
@@ -0,0 +1,258 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/plugincode for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+
+"""
+Per-plugin, per-Resource scan timings aggregated in log-bucket histograms.
+
+Scan execution records the wall and CPU time of each (plugin, resource) scanner
+call in a TimingCollector. The collector aggregates these in histograms per
+plugin, tracks the top-N slowest Resources for each plugin and reports
+p50/p95/p99/max either as codebase-level attributes or as a standalone JSON
+report.
+"""
+
+import heapq
+import json
+import math
+import time
+
+import attr
+
+# Codebase attributes to add to a Codebase to store a timings report.
+timing_codebase_attributes = dict(
+    plugin_timings=attr.ib(default=attr.Factory(dict), repr=False),
+)
+
+
+def time_call(func, *args, **kwargs):
+    """
+    Call `func` with `args` and `kwargs`. Return a tuple of:
+    (returned value, wall time in seconds, CPU time in seconds)
+    """
+    start_wall = time.perf_counter()
+    start_cpu = time.thread_time()
+    value = func(*args, **kwargs)
+    cpu = time.thread_time() - start_cpu
+    wall = time.perf_counter() - start_wall
+    return value, wall, cpu
+
+
+class LogHistogram(object):
+    """
+    A histogram of positive values (such as durations in seconds) counted in
+    logarithmic buckets. Each bucket upper bound is `growth` times the previous
+    bucket upper bound, starting at `min_value`. Values at or below `min_value`
+    are counted in the first bucket. Percentiles are approximated by their
+    bucket upper bound, within a relative error of `growth`.
+
+    For example:
+    >>> h = LogHistogram()
+    >>> for v in (0.001, 0.002, 0.003, 1.0):
+    ...     h.add(v)
+    >>> h.count, h.max
+    (4, 1.0)
+    >>> 0.002 <= h.percentile(50) <= 0.002 * h.growth
+    True
+    """
+
+    __slots__ = ("min_value", "growth", "_log_growth", "buckets", "count", "total", "max")
+
+    def __init__(self, min_value=1e-6, growth=2**0.125):
+        self.min_value = min_value
+        self.growth = growth
+        self._log_growth = math.log(growth)
+        # mapping of {bucket index: count}
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def _bucket_index(self, value):
+        if value <= self.min_value:
+            return 0
+        return int(math.ceil(math.log(value / self.min_value) / self._log_growth))
+
+    def _upper_bound(self, index):
+        return self.min_value * self.growth**index
+
+    def add(self, value, count=1):
+        """
+        Add a `value` to this histogram, `count` times.
+        """
+        index = self._bucket_index(value)
+        buckets = self.buckets
+        buckets[index] = buckets.get(index, 0) + count
+        self.count += count
+        self.total += value * count
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        """
+        Merge an `other` LogHistogram with the same buckets layout in this
+        histogram.
+        """
+        if (other.min_value, other.growth) != (self.min_value, self.growth):
+            raise ValueError("Cannot merge histograms with different buckets.")
+        buckets = self.buckets
+        for index, count in other.buckets.items():
+            buckets[index] = buckets.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, pct):
+        """
+        Return the approximate value at the `pct` percentile (0 to 100) or 0 if
+        this histogram is empty.
+        """
+        if not self.count:
+            return 0
+        rank = max(1, int(math.ceil(self.count * pct / 100.0)))
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return min(self._upper_bound(index), self.max)
+        return self.max
+
+    def to_dict(self):
+        return dict(
+            count=self.count,
+            total=self.total,
+            p50=self.percentile(50),
+            p95=self.percentile(95),
+            p99=self.percentile(99),
+            max=self.max,
+            buckets=[
+                [self._upper_bound(index), self.buckets[index]] for index in sorted(self.buckets)
+            ],
+        )
+
+
+class PluginTimings(object):
+    """
+    Wall and CPU time histograms and the top-N slowest Resources of a plugin.
+    """
+
+    def __init__(self, top_n=10):
+        self.top_n = top_n
+        self.wall = LogHistogram()
+        self.cpu = LogHistogram()
+        # min-heap of (wall time, path) of the slowest resources
+        self.slowest = []
+
+    def add(self, path, wall, cpu=None):
+        self.wall.add(wall)
+        if cpu is not None:
+            self.cpu.add(cpu)
+
+        item = (wall, path)
+        if len(self.slowest) < self.top_n:
+            heapq.heappush(self.slowest, item)
+        elif item > self.slowest[0]:
+            heapq.heapreplace(self.slowest, item)
+
+    def merge(self, other):
+        self.wall.merge(other.wall)
+        self.cpu.merge(other.cpu)
+        for item in other.slowest:
+            if len(self.slowest) < self.top_n:
+                heapq.heappush(self.slowest, item)
+            elif item > self.slowest[0]:
+                heapq.heapreplace(self.slowest, item)
+
+    def to_dict(self):
+        return dict(
+            wall=self.wall.to_dict(),
+            cpu=self.cpu.to_dict(),
+            slowest=[
+                dict(path=path, wall=wall) for wall, path in sorted(self.slowest, reverse=True)
+            ],
+        )
+
+
+class TimingCollector(object):
+    """
+    Collect and aggregate per-plugin, per-Resource timings.
+
+    A collector can be used in each scan worker process and then merged in the
+    parent process.
+    """
+
+    def __init__(self, top_n=10):
+        self.top_n = top_n
+        # mapping of {plugin qname or scanner key: PluginTimings}
+        self.timings_by_plugin = {}
+
+    def _get_timings(self, plugin):
+        timings = self.timings_by_plugin.get(plugin)
+        if timings is None:
+            timings = self.timings_by_plugin[plugin] = PluginTimings(top_n=self.top_n)
+        return timings
+
+    def record(self, plugin, path, wall, cpu=None):
+        """
+        Record the `wall` and `cpu` times in seconds spent by a `plugin` (a
+        plugin qname or scanner key string) on the Resource with `path`.
+        """
+        self._get_timings(plugin).add(path, wall, cpu)
+
+    def call(self, plugin, path, func, *args, **kwargs):
+        """
+        Call `func` with `args` and `kwargs` for a `plugin` and a Resource
+        `path`, record its timings and return its returned value.
+        """
+        value, wall, cpu = time_call(func, *args, **kwargs)
+        self.record(plugin, path, wall, cpu)
+        return value
+
+    def record_resource(self, resource):
+        """
+        Record the wall times stored in a `resource` Resource.scan_timings
+        mapping of {scanner key: duration}.
+        """
+        for plugin, wall in (resource.scan_timings or {}).items():
+            self.record(plugin, resource.path, wall)
+
+    def merge(self, other):
+        """
+        Merge an `other` TimingCollector in this collector.
+        """
+        for plugin, timings in other.timings_by_plugin.items():
+            self._get_timings(plugin).merge(timings)
+
+    def to_dict(self):
+        return {
+            plugin: timings.to_dict() for plugin, timings in sorted(self.timings_by_plugin.items())
+        }
+
+    def set_codebase_attributes(self, codebase):
+        """
+        Store the timings report in the `codebase` "plugin_timings" Codebase
+        attribute if the codebase was created with the
+        `timing_codebase_attributes`.
+        """
+        if hasattr(codebase.attributes, "plugin_timings"):
+            codebase.attributes.plugin_timings = self.to_dict()
+
+    def write_report(self, output_file):
+        """
+        Write the timings report as JSON to the `output_file` file-like object.
+        """
+        json.dump(self.to_dict(), output_file, indent=2)
+
+
+def collect_codebase_timings(codebase, top_n=10):
+    """
+    Return a TimingCollector populated from the scan timings stored in each
+    Resource of a `codebase`.
+    """
+    collector = TimingCollector(top_n=top_n)
+    for resource in codebase.walk():
+        collector.record_resource(resource)
+    return collector
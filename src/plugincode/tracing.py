@@ -0,0 +1,285 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/plugincode for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+
+"""
+Opt-in, low-overhead tracing of plugin calls exported in the Chrome trace event
+format (that can be loaded in chrome://tracing or https://ui.perfetto.dev).
+
+Spans are recorded with their process and thread ids in a per-process ring
+buffer. Each process dumps its buffer to a trace directory and these per-process
+files are merged in a single trace file at the end of a run.
+
+Tracing is disabled by default: a disabled Tracer only checks a flag and returns
+a shared no-op span.
+"""
+
+from collections import deque
+import glob
+import json
+import os
+import random
+import threading
+import time
+import weakref
+
+
+class _NoopSpan(object):
+    """
+    A do-nothing context manager used when tracing is disabled or a span is not
+    sampled.
+    """
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class _Span(object):
+    __slots__ = ("tracer", "name", "cat", "args", "start")
+
+    def __init__(self, tracer, name, cat, args):
+        self.tracer = tracer
+        self.name = name
+        self.cat = cat
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *args):
+        end = time.perf_counter_ns()
+        self.tracer.add_span(self.name, self.cat, self.start, end - self.start, self.args)
+        return False
+
+
+class Tracer(object):
+    """
+    Record spans of plugin calls in a per-process ring buffer of at most
+    `buffer_size` events. Only a `sample_rate` fraction of the spans (from 0.0
+    to 1.0) are recorded.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.trace_dir = None
+        self.sample_rate = 1.0
+        self.buffer_size = 100000
+        self.events = deque(maxlen=self.buffer_size)
+        self.pid = os.getpid()
+        # set of registered pluggy PluginManager whose hook calls are traced
+        # when this tracer is enabled. Weak references are used such that
+        # registering a manager does not keep it alive.
+        self.pluggy_managers = weakref.WeakSet()
+        # mapping of {id(pluggy manager): callable to undo hook calls tracing}
+        # only while this tracer is enabled
+        self.undo_hook_tracing = {}
+
+    def enable(self, trace_dir, sample_rate=1.0, buffer_size=100000):
+        """
+        Enable tracing, dumping traces to the `trace_dir` directory.
+        """
+        os.makedirs(trace_dir, exist_ok=True)
+        self.trace_dir = trace_dir
+        self.sample_rate = sample_rate
+        self.buffer_size = buffer_size
+        self.events = deque(maxlen=buffer_size)
+        self.pid = os.getpid()
+        self.enabled = True
+        for pluggy_manager in self.pluggy_managers:
+            self._install_hook_tracing(pluggy_manager)
+
+    def disable(self):
+        self.enabled = False
+        for undo in self.undo_hook_tracing.values():
+            undo()
+        self.undo_hook_tracing.clear()
+
+    def register_manager(self, pluggy_manager):
+        """
+        Register a `pluggy_manager` pluggy PluginManager such that its hook
+        calls are traced whenever this tracer is enabled. This is cheap when
+        tracing is disabled: no hook call monitoring is installed.
+        """
+        self.pluggy_managers.add(pluggy_manager)
+        if self.enabled:
+            self._install_hook_tracing(pluggy_manager)
+
+    def unregister_manager(self, pluggy_manager):
+        """
+        Unregister a `pluggy_manager` pluggy PluginManager and undo the tracing
+        of its hook calls.
+        """
+        self.pluggy_managers.discard(pluggy_manager)
+        undo = self.undo_hook_tracing.pop(id(pluggy_manager), None)
+        if undo:
+            undo()
+
+    def _install_hook_tracing(self, pluggy_manager):
+        key = id(pluggy_manager)
+        if key not in self.undo_hook_tracing:
+            self.undo_hook_tracing[key] = self.trace_hook_calls(pluggy_manager)
+
+    def get_config(self):
+        """
+        Return a mapping of this tracer configuration that can be passed to
+        enable() in another process.
+        """
+        return dict(
+            trace_dir=self.trace_dir,
+            sample_rate=self.sample_rate,
+            buffer_size=self.buffer_size,
+        )
+
+    def _check_process(self):
+        """
+        Reset the ring buffer in a forked child process and register a dump of
+        this buffer at the child process exit.
+        """
+        pid = os.getpid()
+        if pid != self.pid:
+            self.pid = pid
+            self.events = deque(maxlen=self.buffer_size)
+            self.register_exit_dump()
+
+    def register_exit_dump(self):
+        """
+        Register a dump of this tracer events when a multiprocessing worker
+        process exits.
+        """
+        from multiprocessing import util
+
+        util.Finalize(self, self.dump, exitpriority=10)
+
+    def span(self, name, cat="plugincode", **args):
+        """
+        Return a context manager recording a span named `name` in the `cat`
+        category with optional `args`.
+        """
+        if not self.enabled or not self.is_sampled():
+            return NOOP_SPAN
+        return _Span(self, name, cat, args)
+
+    def is_sampled(self):
+        """
+        Return True if a new span should be recorded based on the sample rate.
+        """
+        return self.sample_rate >= 1.0 or random.random() < self.sample_rate
+
+    def call(self, name, func, *args, **kwargs):
+        """
+        Call `func` with `args` and `kwargs` in a span named `name` and return
+        its returned value.
+        """
+        if not self.enabled:
+            return func(*args, **kwargs)
+        with self.span(name):
+            return func(*args, **kwargs)
+
+    def add_span(self, name, cat, start_ns, duration_ns, args=None):
+        """
+        Add a complete span event. `start_ns` and `duration_ns` are in
+        nanoseconds.
+        """
+        self._check_process()
+        event = dict(
+            name=name,
+            cat=cat,
+            ph="X",
+            ts=start_ns / 1000.0,
+            dur=duration_ns / 1000.0,
+            pid=self.pid,
+            tid=threading.get_ident(),
+        )
+        if args:
+            event["args"] = {k: str(v) for k, v in args.items()}
+        self.events.append(event)
+
+    def trace_hook_calls(self, pluggy_manager):
+        """
+        Trace all the hook calls of a `pluggy_manager` pluggy PluginManager.
+        Return a callable to undo this tracing.
+        """
+        starts = threading.local()
+
+        def before(hook_name, hook_impls, kwargs):
+            stack = getattr(starts, "stack", None)
+            if stack is None:
+                stack = starts.stack = []
+            # None for a hook call that is not sampled
+            stack.append(time.perf_counter_ns() if self.is_sampled() else None)
+
+        def after(outcome, hook_name, hook_impls, kwargs):
+            start = starts.stack.pop()
+            if start is not None and self.enabled:
+                duration = time.perf_counter_ns() - start
+                self.add_span(hook_name, "hook", start, duration)
+
+        return pluggy_manager.add_hookcall_monitoring(before, after)
+
+    def dump(self):
+        """
+        Write the events of this process to a trace file in the trace directory
+        and clear them. Return the trace file location or None.
+        """
+        if not self.trace_dir or not self.events:
+            return
+        location = os.path.join(
+            self.trace_dir, "trace-{}-{}.json".format(self.pid, time.perf_counter_ns())
+        )
+        with open(location, "w") as trace_file:
+            json.dump(list(self.events), trace_file)
+        self.events.clear()
+        return location
+
+
+class TracedCallable(object):
+    """
+    A picklable wrapper for a `func` callable (such as a scanner function) that
+    traces its calls in a span named `name` in worker processes configured with
+    a `tracer_config` mapping from Tracer.get_config().
+    """
+
+    def __init__(self, func, name, tracer_config):
+        self.func = func
+        self.name = name
+        self.tracer_config = tracer_config
+
+    def __call__(self, *args, **kwargs):
+        if not tracer.enabled:
+            tracer.enable(**self.tracer_config)
+            tracer.register_exit_dump()
+        with tracer.span(self.name, cat="scanner"):
+            return self.func(*args, **kwargs)
+
+
+def merge_traces(trace_dir, output_location):
+    """
+    Merge all the per-process trace files of `trace_dir` in a single Chrome
+    trace event format JSON file at `output_location`. Return the number of
+    merged events.
+    """
+    events = []
+    for location in sorted(glob.glob(os.path.join(trace_dir, "trace-*.json"))):
+        with open(location) as trace_file:
+            events.extend(json.load(trace_file))
+
+    events.sort(key=lambda e: e["ts"])
+    with open(output_location, "w") as output:
+        json.dump(dict(traceEvents=events, displayTimeUnit="ms"), output)
+    return len(events)
+
+
+# the global tracer used for all plugincode tracing
+tracer = Tracer()
@@ -0,0 +1,567 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/plugincode for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+
+"""
+Benchmarks for the plugin management and dispatch hot paths.
+
+These use synthetic plugins exposed through real entry points of a generated
+distribution and synthetic codebases of 1k to 1M Resources. Run with::
+
+    python tests/benchmarks/benchmark_plugincode.py
+
+Use ``--check`` to fail on regressions beyond a threshold compared to the
+committed baselines and ``--save-baselines`` to update these baselines.
+"""
+
+import argparse
+import functools
+import gc
+import hashlib
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import attr
+from commoncode.resource import Resource
+
+import plugincode
+from plugincode.binary import RecordWriter
+from plugincode.binary import get_codec
+from plugincode.binary import iter_records
+from plugincode.compression import CompressedWriter
+from plugincode.compression import get_compressor
+from plugincode.encoders import get_available_encoders
+from plugincode.encoders import get_encoder
+from plugincode.output import OutputPlugin
+from plugincode.serializers import get_serializer
+
+BASELINES_LOCATION = os.path.join(os.path.dirname(__file__), "baselines.json")
+
+# default regression threshold as a fraction of the baseline
+THRESHOLD = 0.25
+
+# relative regression threshold for small timings or memory peaks below these
+# baselines which are noisy, such that the small sizes can still regress
+SMALL_THRESHOLD = 1.0
+SMALL_SECONDS = 0.05
+SMALL_MEMORY = 64 * 1024
+
+# prefixes of the names of benchmarks of optional dependencies that may not
+# have baselines
+OPTIONAL_BENCHMARKS = (
+    "encode_orjson_",
+    "encode_ujson_",
+    "binary_msgpack_",
+    "binary_cbor_",
+    "compress_zstd_",
+)
+
+# default number of calls of a timed benchmark
+REPEAT = 5
+
+STAGES = ("pre_scan", "scan", "post_scan", "output_filter", "output")
+
+RESOURCES_COUNTS = (1000, 10000, 100000, 1000000)
+
+PLUGIN_MODULE_TEMPLATE = """
+import attr
+from commoncode.cliutils import PluggableCommandLineOption
+
+from plugincode.{stage} import {base_class}
+
+"""
+
+PLUGIN_CLASS_TEMPLATE = """
+class Plugin{index}({base_class}):
+    options = [
+        PluggableCommandLineOption(("--{stage}-{index}-opt{{}}".format(i),), is_flag=True)
+        for i in range({options_count})
+    ]
+    resource_attributes = {{
+        "{stage}_{index}_attr{{}}".format(i): attr.ib(default=None)
+        for i in range({attributes_count})
+    }}
+    run_order = {index}
+
+    def is_enabled(self, **kwargs):
+        return kwargs.get("{stage}_{index}_opt0", False)
+"""
+
+BASE_CLASSES = dict(
+    pre_scan="PreScanPlugin",
+    scan="ScanPlugin",
+    post_scan="PostScanPlugin",
+    output_filter="OutputFilterPlugin",
+    output="OutputPlugin",
+)
+
+
+def create_synthetic_distribution(base_dir, plugins_count, options_count, attributes_count):
+    """
+    Create a synthetic distribution in `base_dir` with `plugins_count` plugins
+    per stage, each with `options_count` options and `attributes_count`
+    resource attributes, exposed through entry points.
+    """
+    entry_points = []
+    for stage in STAGES:
+        base_class = BASE_CLASSES[stage]
+        module_name = "plugincode_benchmark_{}".format(stage)
+        code = [PLUGIN_MODULE_TEMPLATE.format(stage=stage, base_class=base_class)]
+        entry_points.append("[scancode_{}]".format(stage))
+        for index in range(plugins_count):
+            code.append(
+                PLUGIN_CLASS_TEMPLATE.format(
+                    stage=stage,
+                    index=index,
+                    base_class=base_class,
+                    options_count=options_count,
+                    attributes_count=attributes_count,
+                )
+            )
+            entry_points.append("{stage}_{index} = {module_name}:Plugin{index}".format(**locals()))
+        with open(os.path.join(base_dir, module_name + ".py"), "w") as module:
+            module.write("\n".join(code))
+
+    dist_info = os.path.join(base_dir, "plugincode_benchmark-1.0.dist-info")
+    os.makedirs(dist_info)
+    with open(os.path.join(dist_info, "METADATA"), "w") as metadata:
+        metadata.write("Metadata-Version: 2.1\nName: plugincode-benchmark\nVersion: 1.0\n")
+    with open(os.path.join(dist_info, "entry_points.txt"), "w") as eps:
+        eps.write("\n".join(entry_points) + "\n")
+
+
+def get_managers():
+    """
+    Return a list of new PluginManager, one for each stage.
+    """
+    from plugincode import output, output_filter, post_scan, pre_scan, scan
+
+    managers = []
+    for module in (pre_scan, scan, post_scan, output_filter, output):
+        plugin_base_class = getattr(module, BASE_CLASSES[module.stage])
+        managers.append(
+            plugincode.PluginManager(
+                stage=module.stage,
+                module_qname=module.__name__,
+                entrypoint=module.entrypoint,
+                plugin_base_class=plugin_base_class,
+            )
+        )
+    return managers
+
+
+class SyntheticCodebase(object):
+    """
+    A minimal in-memory codebase of `resources_count` file Resources with scan
+    attributes that is enough to run OutputPlugin.get_files().
+    """
+
+    has_single_resource = False
+    with_info = False
+
+    resource_attributes = dict(
+        sha1=attr.ib(default=None),
+        size_score=attr.ib(default=0),
+        is_source=attr.ib(default=False),
+        license_expressions=attr.ib(default=attr.Factory(list)),
+        copyrights=attr.ib(default=attr.Factory(list)),
+    )
+
+    def __init__(self, resources_count):
+        self.resources_count = resources_count
+        self.resource_class = attr.make_class(
+            name="ScannedResource",
+            attrs=self.resource_attributes,
+            slots=True,
+            bases=(Resource,),
+        )
+
+    def walk_filtered(self, topdown=True, skip_root=False):
+        resource_class = self.resource_class
+        for i in range(self.resources_count):
+            path = "root/dir{}/file{}.c".format(i // 100, i)
+            yield resource_class(
+                name="file{}.c".format(i),
+                location="/tmp/" + path,
+                path=path,
+                is_file=True,
+                size=i,
+                sha1=hashlib.sha1(path.encode("utf-8")).hexdigest(),
+                size_score=i % 7,
+                is_source=bool(i % 2),
+                license_expressions=["mit", "apache-2.0"],
+                copyrights=[dict(copyright="Copyright (c) Example", start_line=1, end_line=1)],
+            )
+
+
+def measure(func, repeat=REPEAT):
+    """
+    Return the median wall time in seconds of `repeat` calls to `func`.
+    """
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def measure_peak_memory(func):
+    """
+    Return the peak memory in bytes allocated while calling `func`.
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        _current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def bench_plugin_management(plugins_count=50, options_count=20, attributes_count=20):
+    """
+    Return a mapping of {benchmark name: seconds} for plugin discovery,
+    validation, plan building and qname with synthetic entry points.
+    """
+    results = {}
+    saved_managers = dict(plugincode.PluginManager.managers)
+    with tempfile.TemporaryDirectory() as base_dir:
+        create_synthetic_distribution(base_dir, plugins_count, options_count, attributes_count)
+        sys.path.insert(0, base_dir)
+        try:
+
+            def setup_all():
+                plugincode.PluginManager.managers.clear()
+                for manager in get_managers():
+                    manager.setup()
+
+            results["discovery_and_validation"] = measure(setup_all)
+
+            def load_plugins():
+                plugincode.PluginManager.managers.clear()
+                get_managers()
+                return plugincode.PluginManager.load_plugins()
+
+            results["load_plugins"] = measure(load_plugins)
+
+            plugin_classes, plugin_options = load_plugins()
+            kwargs = {o.name: True for o in plugin_options[::2]}
+
+            def build_plan():
+                plugins = [pc() for pc in plugin_classes]
+                enabled = [p for p in plugins if p.is_enabled(**kwargs)]
+                by_stage = {}
+                for plugin in enabled:
+                    by_stage.setdefault(plugin.stage, []).append(plugin)
+                return {
+                    stage: sorted(plugins, key=lambda p: (p.run_order, p.qname()))
+                    for stage, plugins in by_stage.items()
+                }
+
+            results["plan_building"] = measure(build_plan)
+
+            def qnames():
+                for _ in range(100):
+                    for pc in plugin_classes:
+                        pc.qname()
+
+            results["qname"] = measure(qnames)
+        finally:
+            sys.path.remove(base_dir)
+            for module_name in list(sys.modules):
+                if module_name.startswith("plugincode_benchmark_"):
+                    del sys.modules[module_name]
+            plugincode.PluginManager.managers.clear()
+            plugincode.PluginManager.managers.update(saved_managers)
+    return results
+
+
+def bench_get_files(resources_count, with_memory=True):
+    """
+    Return a mapping of {benchmark name: value} for OutputPlugin.get_files()
+    on a synthetic codebase of `resources_count` Resources.
+    """
+    codebase = SyntheticCodebase(resources_count)
+
+    def get_files():
+        for _ in OutputPlugin.get_files(codebase, info=True, strip_root=True):
+            pass
+
+    seconds = measure(get_files, repeat=1 if resources_count >= 100000 else REPEAT)
+    results = {
+        "get_files_{}".format(resources_count): seconds,
+        "get_files_{}_per_second".format(resources_count): resources_count / seconds,
+    }
+    if with_memory:
+        peak = measure_peak_memory(get_files)
+        results["get_files_{}_peak_memory".format(resources_count)] = peak
+    return results
+
+
+def bench_serializers(resources_count):
+    """
+    Return a mapping of {benchmark name: value} comparing the throughput of
+    Resource.to_dict() and of a generated serializer on a synthetic codebase of
+    `resources_count` Resources.
+    """
+    codebase = SyntheticCodebase(resources_count)
+    resources = list(codebase.walk_filtered())
+    options = dict(with_info=True, with_timing=False, full_root=False, strip_root=True)
+    to_dict = functools.partial(Resource.to_dict, **options)
+    serializer = get_serializer(codebase.resource_class, **options)
+
+    def run_to_dict():
+        for resource in resources:
+            to_dict(resource)
+
+    def run_serializer():
+        for resource in resources:
+            serializer(resource)
+
+    to_dict_seconds = measure(run_to_dict)
+    serializer_seconds = measure(run_serializer)
+    return {
+        "to_dict_{}".format(resources_count): to_dict_seconds,
+        "to_dict_{}_per_second".format(resources_count): resources_count / to_dict_seconds,
+        "serializer_{}".format(resources_count): serializer_seconds,
+        "serializer_{}_per_second".format(resources_count): resources_count / serializer_seconds,
+    }
+
+
+def bench_encoders(resources_count):
+    """
+    Return a mapping of {benchmark name: value} for each available JSON encoder
+    backend encoding the serialized files of a synthetic codebase of
+    `resources_count` Resources.
+    """
+    codebase = SyntheticCodebase(resources_count)
+    files = list(OutputPlugin.get_files(codebase, info=True, strip_root=True))
+    results = {}
+    for name in get_available_encoders():
+        encode = get_encoder(name).encode
+
+        def run_encoder():
+            for file_data in files:
+                encode(file_data)
+
+        seconds = measure(run_encoder)
+        results["encode_{}_{}".format(name, resources_count)] = seconds
+        results["encode_{}_{}_per_second".format(name, resources_count)] = resources_count / seconds
+    return results
+
+
+def bench_binary(resources_count):
+    """
+    Return a mapping of {benchmark name: value} for encoding and decoding the
+    serialized files of a synthetic codebase of `resources_count` Resources as
+    a binary record stream with each available codec, compared to JSON Lines
+    with the standard library encoder. Sizes are in bytes.
+    """
+    codebase = SyntheticCodebase(resources_count)
+    files = list(OutputPlugin.get_files(codebase, info=True, strip_root=True))
+    results = {}
+
+    encode_json = get_encoder("stdlib").encode
+
+    def write_json():
+        return "\n".join(encode_json(f) for f in files).encode("utf-8")
+
+    encoded = write_json()
+
+    def read_json():
+        for line in encoded.splitlines():
+            json.loads(line)
+
+    results["binary_json_encode_{}".format(resources_count)] = measure(write_json)
+    results["binary_json_decode_{}".format(resources_count)] = measure(read_json)
+    results["binary_json_{}_bytes".format(resources_count)] = len(encoded)
+
+    for codec in ("msgpack", "cbor"):
+        try:
+            get_codec(codec)
+        except plugincode.PlugincodeError:
+            continue
+
+        def write_records():
+            output = io.BytesIO()
+            RecordWriter(output, codec=codec).write_files(files)
+            return output.getvalue()
+
+        encoded = write_records()
+
+        def read_records():
+            for _ in iter_records(io.BytesIO(encoded)):
+                pass
+
+        results["binary_{}_encode_{}".format(codec, resources_count)] = measure(write_records)
+        results["binary_{}_decode_{}".format(codec, resources_count)] = measure(read_records)
+        results["binary_{}_{}_bytes".format(codec, resources_count)] = len(encoded)
+    return results
+
+
+def bench_compression(resources_count):
+    """
+    Return a mapping of {benchmark name: seconds} for compressing the JSON of
+    the serialized files of a synthetic codebase of `resources_count`
+    Resources with a CompressedWriter using one thread or one thread per CPU.
+    """
+    codebase = SyntheticCodebase(resources_count)
+    encode = get_encoder("stdlib").encode
+    lines = [encode(f) + "\n" for f in OutputPlugin.get_files(codebase, info=True)]
+    results = {}
+    for compression in ("gzip", "zstd"):
+        try:
+            get_compressor(compression)
+        except plugincode.PlugincodeError:
+            continue
+
+        for threads in (1, None):
+
+            def compress():
+                with CompressedWriter(NullOutput(), compression, threads=threads) as writer:
+                    for line in lines:
+                        writer.write(line)
+
+            suffix = "_1_thread" if threads == 1 else ""
+            name = "compress_{}{}_{}".format(compression, suffix, resources_count)
+            results[name] = measure(compress)
+    return results
+
+
+class NullOutput(object):
+    """
+    A file-like object that discards what is written and counts the number
+    of characters or bytes written.
+    """
+
+    def __init__(self):
+        self.written = 0
+
+    def write(self, data):
+        self.written += len(data)
+
+    def flush(self):
+        pass
+
+
+def bench_write_json(resources_count, with_memory=True):
+    """
+    Return a mapping of {benchmark name: value} for streaming JSON with
+    OutputPlugin.write_json_files() on a synthetic codebase of
+    `resources_count` Resources.
+    """
+    codebase = SyntheticCodebase(resources_count)
+
+    def write_json():
+        OutputPlugin.write_json_files(codebase, NullOutput(), info=True, strip_root=True)
+
+    seconds = measure(write_json, repeat=1 if resources_count >= 100000 else REPEAT)
+    results = {
+        "write_json_{}".format(resources_count): seconds,
+        "write_json_{}_per_second".format(resources_count): resources_count / seconds,
+    }
+    if with_memory:
+        peak = measure_peak_memory(write_json)
+        results["write_json_{}_peak_memory".format(resources_count)] = peak
+    return results
+
+
+def run_benchmarks(max_resources=100000, plugins_count=50):
+    """
+    Run all benchmarks and return a mapping of {benchmark name: value}.
+    """
+    results = bench_plugin_management(plugins_count=plugins_count)
+    for resources_count in RESOURCES_COUNTS:
+        if resources_count > max_resources:
+            break
+        # tracemalloc is too slow for the largest codebases
+        with_memory = resources_count <= 100000
+        results.update(bench_get_files(resources_count, with_memory=with_memory))
+        results.update(bench_write_json(resources_count, with_memory=with_memory))
+        if resources_count <= 100000:
+            results.update(bench_serializers(resources_count))
+            results.update(bench_encoders(resources_count))
+            results.update(bench_binary(resources_count))
+            results.update(bench_compression(resources_count))
+    return results
+
+
+def check_regressions(results, baselines, threshold=THRESHOLD, small_threshold=SMALL_THRESHOLD):
+    """
+    Return a list of regression messages for `results` that are worse than
+    their `baselines` by more than a `threshold` fraction. Small timings and
+    memory peaks are checked with the larger `small_threshold` fraction instead.
+    Throughputs use the threshold of their corresponding timings.
+    """
+    regressions = []
+    for name, value in sorted(results.items()):
+        baseline = baselines.get(name)
+        if not baseline:
+            continue
+        # throughputs are better when higher, everything else when lower
+        if name.endswith("_per_second"):
+            seconds_baseline = baselines.get(name[: -len("_per_second")])
+            is_small = seconds_baseline is not None and seconds_baseline < SMALL_SECONDS
+            limit = 1 + (small_threshold if is_small else threshold)
+            regressed = value * limit < baseline
+        else:
+            if name.endswith("_peak_memory"):
+                is_small = baseline < SMALL_MEMORY
+            else:
+                is_small = baseline < SMALL_SECONDS
+            limit = 1 + (small_threshold if is_small else threshold)
+            regressed = value > baseline * limit
+        if regressed:
+            regressions.append("{}: {:.6g} vs. baseline {:.6g}".format(name, value, baseline))
+    return regressions
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--max-resources", type=int, default=100000)
+    parser.add_argument("--plugins", type=int, default=50, help="plugins per stage")
+    parser.add_argument("--check", action="store_true", help="fail on regressions")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    parser.add_argument("--save-baselines", action="store_true")
+    opts = parser.parse_args(args)
+
+    results = run_benchmarks(max_resources=opts.max_resources, plugins_count=opts.plugins)
+    for name, value in sorted(results.items()):
+        print("{:45} {:.6g}".format(name, value))
+
+    if opts.save_baselines:
+        baselines = {}
+        if os.path.exists(BASELINES_LOCATION):
+            with open(BASELINES_LOCATION) as bl:
+                baselines = json.load(bl)
+        baselines.update(results)
+        with open(BASELINES_LOCATION, "w") as bl:
+            json.dump(baselines, bl, indent=2, sort_keys=True)
+            bl.write("\n")
+
+    if opts.check:
+        with open(BASELINES_LOCATION) as bl:
+            baselines = json.load(bl)
+        regressions = check_regressions(results, baselines, opts.threshold)
+        if regressions:
+            print("Performance regressions:")
+            for regression in regressions:
+                print("  " + regression)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
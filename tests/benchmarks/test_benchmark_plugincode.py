@@ -0,0 +1,61 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/plugincode for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+
+import json
+
+import benchmark_plugincode
+import pytest
+
+
+@pytest.fixture(scope="module")
+def results():
+    return benchmark_plugincode.run_benchmarks(max_resources=1000)
+
+
+@pytest.fixture(scope="module")
+def baselines():
+    with open(benchmark_plugincode.BASELINES_LOCATION) as bl:
+        return json.load(bl)
+
+
+def test_benchmarks_can_run_on_small_inputs(results):
+    assert "discovery_and_validation" in results
+    assert "plan_building" in results
+    assert results["get_files_1000_per_second"] > 0
+    assert results["write_json_1000_per_second"] > 0
+    assert results["serializer_1000_per_second"] > 0
+
+
+def test_check_regressions():
+    baselines = dict(get_files_1000=1.0, get_files_1000_per_second=1000)
+    results = dict(get_files_1000=1.1, get_files_1000_per_second=500, qname=1.0)
+    regressions = benchmark_plugincode.check_regressions(results, baselines, threshold=0.25)
+    assert len(regressions) == 1
+    assert regressions[0].startswith("get_files_1000_per_second")
+
+
+def test_check_regressions_uses_a_relative_threshold_on_small_values():
+    baselines = dict(qname=0.01, get_files_1000=0.03, get_files_1000_per_second=33000)
+    baselines["get_files_1000_peak_memory"] = 27000
+    results = dict(qname=0.018, get_files_1000=0.054, get_files_1000_per_second=18000)
+    results["get_files_1000_peak_memory"] = 48000
+    assert benchmark_plugincode.check_regressions(results, baselines, threshold=0.25) == []
+
+    results = dict(qname=0.03, get_files_1000=0.09, get_files_1000_per_second=11000)
+    results["get_files_1000_peak_memory"] = 81000
+    regressions = benchmark_plugincode.check_regressions(results, baselines, threshold=0.25)
+    assert len(regressions) == 4
+
+
+def test_all_benchmarks_have_baselines(results, baselines):
+    missing = set(results).difference(baselines)
+    missing = [n for n in missing if not n.startswith(benchmark_plugincode.OPTIONAL_BENCHMARKS)]
+    assert missing == []
+
+
+def test_no_regressions_on_small_inputs(results, baselines):
+    assert benchmark_plugincode.check_regressions(results, baselines) == []
@@ -0,0 +1,60 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/plugincode for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+
+"""
+Shared helpers to build scanned codebases for the output tests.
+"""
+
+import attr
+from commoncode.resource import Codebase
+
+from plugincode import PlugincodeError
+from plugincode.binary import get_codec
+
+
+def get_default_holders(resource):
+    return ["Holder é {}".format(resource.name)] * 10
+
+
+def build_codebase(base_dir, files_count=20, names=None, get_holders=get_default_holders, **values):
+    """
+    Return a new Codebase in `base_dir` with `files_count` files or the files
+    of a `names` list of relative paths if provided. Each Resource has a
+    "holders" attribute set to `get_holders(resource)` and an attribute for each
+    of the `values` keyword arguments set to this value.
+    """
+    if names is None:
+        names = ["file{}.txt".format(i) for i in range(files_count)]
+    base_dir.mkdir(parents=True)
+    for name in names:
+        location = base_dir.joinpath(name)
+        location.parent.mkdir(parents=True, exist_ok=True)
+        location.write_text("content")
+
+    attributes = dict(holders=attr.ib(default=attr.Factory(list)))
+    attributes.update({name: attr.ib(default=None) for name in values})
+    codebase = Codebase(str(base_dir), resource_attributes=attributes)
+    for resource in codebase.walk():
+        resource.holders = get_holders(resource)
+        for name, value in values.items():
+            setattr(resource, name, value)
+        codebase.save_resource(resource)
+    return codebase
+
+
+def get_available_codecs():
+    """
+    Return a list of the names of the available binary record codecs.
+    """
+    codecs = []
+    for codec in ("msgpack", "cbor"):
+        try:
+            get_codec(codec)
+            codecs.append(codec)
+        except PlugincodeError:
+            pass
+    return codecs
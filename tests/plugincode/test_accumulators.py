@@ -0,0 +1,90 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/plugincode for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+
+import pickle
+
+import attr
+from commoncode.resource import Codebase
+import pytest
+
+from plugincode import PlugincodeError
+from plugincode.accumulators import CounterAccumulator
+from plugincode.accumulators import HistogramAccumulator
+from plugincode.accumulators import SetAccumulator
+from plugincode.accumulators import TopKAccumulator
+from plugincode.accumulators import get_accumulators
+from plugincode.scan import ScanPlugin
+
+
+def get_language(value):
+    return value["language"]
+
+
+class LanguageScanner(ScanPlugin):
+    stage = "scan"
+    name = "languages"
+    codebase_attributes = dict(
+        languages=attr.ib(default=attr.Factory(list)),
+        extensions=attr.ib(default=attr.Factory(list)),
+        largest=attr.ib(default=attr.Factory(list)),
+        sizes=attr.ib(default=attr.Factory(dict)),
+    )
+
+    def get_accumulators(self, **kwargs):
+        return dict(
+            languages=CounterAccumulator("programming_languages", key=get_language),
+            extensions=SetAccumulator("extension"),
+            largest=TopKAccumulator("size", k=2),
+            sizes=HistogramAccumulator("size"),
+        )
+
+
+class InvalidScanner(ScanPlugin):
+    stage = "scan"
+    name = "invalid"
+
+    def get_accumulators(self, **kwargs):
+        return dict(undeclared=SetAccumulator("extension"))
+
+
+SCAN_RESULTS = [
+    dict(extension=".c", size=10, programming_languages=[dict(language="C")]),
+    dict(extension=".h", size=200, programming_languages=[dict(language="C")]),
+    dict(extension=".py", size=30, programming_languages=[dict(language="Python")]),
+    dict(extension=".txt", size=4000, programming_languages=[]),
+]
+
+
+def test_accumulators_fold_in_workers_and_merge(tmp_path):
+    accumulators = get_accumulators([LanguageScanner()])
+    # each worker folds in its own empty copy sent back pickled to the parent
+    for worker_results in (SCAN_RESULTS[:1], SCAN_RESULTS[1:]):
+        partial = accumulators.empty()
+        for scan_result in worker_results:
+            partial.fold(scan_result)
+        accumulators.merge(pickle.loads(pickle.dumps(partial)))
+
+    summaries = accumulators.to_dict()
+    assert summaries["languages"] == [
+        dict(value="C", count=2),
+        dict(value="Python", count=1),
+    ]
+    assert summaries["extensions"] == [".c", ".h", ".py", ".txt"]
+    assert summaries["largest"] == [4000, 200]
+    assert summaries["sizes"]["count"] == 4
+    assert summaries["sizes"]["max"] == 4000
+
+    codebase = Codebase(str(tmp_path), codebase_attributes=LanguageScanner.codebase_attributes)
+    accumulators.set_codebase_attributes(codebase)
+    assert codebase.attributes.largest == [4000, 200]
+
+
+def test_get_accumulators_requires_declared_codebase_attributes():
+    with pytest.raises(PlugincodeError):
+        get_accumulators([InvalidScanner()])
+    with pytest.raises(PlugincodeError):
+        get_accumulators([LanguageScanner(), LanguageScanner()])
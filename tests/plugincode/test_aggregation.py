@@ -0,0 +1,63 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/plugincode for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+
+import attr
+from commoncode.resource import Codebase
+
+from plugincode.aggregation import TreeIndex
+from plugincode.aggregation import aggregate_tree
+from plugincode.aggregation import save_aggregates
+
+
+def build_codebase(base_dir):
+    for path in ("a/a1.c", "a/a2.txt", "a/sub/s.c", "b.c"):
+        location = base_dir.joinpath(path)
+        location.parent.mkdir(parents=True, exist_ok=True)
+        location.write_text(path)
+    attributes = dict(names=attr.ib(default=attr.Factory(list)))
+    return Codebase(str(base_dir), resource_attributes=attributes)
+
+
+def test_tree_index_parents(tmp_path):
+    codebase = build_codebase(tmp_path / "codebase")
+    tree_index = TreeIndex.from_codebase(codebase)
+    assert tree_index.paths == [
+        "codebase",
+        "codebase/b.c",
+        "codebase/a",
+        "codebase/a/a1.c",
+        "codebase/a/a2.txt",
+        "codebase/a/sub",
+        "codebase/a/sub/s.c",
+    ]
+    assert list(tree_index.parents) == [-1, 0, 0, 2, 2, 2, 5]
+
+
+def files_names(resource):
+    if resource.is_file:
+        return [resource.name]
+
+
+def concat(first, second):
+    return first + second
+
+
+def test_aggregate_tree_keeps_walk_order(tmp_path):
+    codebase = build_codebase(tmp_path / "codebase")
+    for max_workers in (0, 4):
+        tree_index, aggregates = aggregate_tree(
+            codebase, files_names, concat, max_workers=max_workers
+        )
+        results = dict(zip(tree_index.paths, aggregates))
+        assert results["codebase"] == ["b.c", "a1.c", "a2.txt", "s.c"]
+        assert results["codebase/a"] == ["a1.c", "a2.txt", "s.c"]
+        assert results["codebase/a/sub"] == ["s.c"]
+        assert results["codebase/b.c"] == ["b.c"]
+
+    save_aggregates(codebase, tree_index, aggregates, "names", skip_files=True)
+    assert codebase.get_resource("codebase/a").names == ["a1.c", "a2.txt", "s.c"]
+    assert codebase.get_resource("codebase/b.c").names == []
@@ -0,0 +1,137 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/plugincode for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+
+import pytest
+
+from plugincode import PlugincodeError
+from plugincode import arrow
+from plugincode.arrow import ColumnarOutputPlugin
+from plugincode.arrow import ColumnarWriter
+from plugincode.arrow import get_column_names
+from plugincode.arrow import to_columns
+from plugincode.output import OutputPlugin
+from scanned_codebase import build_codebase
+
+
+def get_arrow_holders(resource):
+    return [dict(holder="Holder {}".format(resource.name), start_line=1)]
+
+
+def test_to_columns_with_missing_values():
+    files = [dict(path="a", size=1), dict(path="b", holders=[dict(holder="h")])]
+    names = get_column_names(files)
+    assert names == ["path", "size", "holders"]
+    expected = {
+        "path": ["a", "b"],
+        "size": [1, None],
+        "holders": [None, [dict(holder="h")]],
+    }
+    assert to_columns(files, names) == expected
+
+
+@pytest.mark.skipif(arrow.pyarrow is not None, reason="pyarrow is installed")
+def test_write_columnar_files_requires_pyarrow(tmp_path):
+    codebase = build_codebase(
+        tmp_path / "codebase", files_count=25, get_holders=get_arrow_holders, score=12.5
+    )
+    with pytest.raises(PlugincodeError):
+        ColumnarOutputPlugin.write_columnar_files(codebase, str(tmp_path / "out.parquet"))
+
+
+@pytest.mark.parametrize("columnar_format", ["parquet", "arrow"])
+def test_write_columnar_files_in_row_groups(tmp_path, columnar_format):
+    pyarrow = pytest.importorskip("pyarrow")
+    import pyarrow.ipc
+    import pyarrow.parquet
+
+    codebase = build_codebase(
+        tmp_path / "codebase", files_count=25, get_holders=get_arrow_holders, score=12.5
+    )
+    output_file = str(tmp_path / "out")
+    count = ColumnarOutputPlugin.write_columnar_files(
+        codebase,
+        output_file,
+        columnar_format=columnar_format,
+        row_group_size=10,
+        info=True,
+    )
+    expected = list(OutputPlugin.get_files(codebase, info=True))
+    assert count == len(expected)
+
+    if columnar_format == "parquet":
+        parquet_file = pyarrow.parquet.ParquetFile(output_file)
+        assert parquet_file.num_row_groups == 3
+        table = parquet_file.read()
+    else:
+        with pyarrow.OSFile(output_file, "rb") as source:
+            table = pyarrow.ipc.open_file(source).read_all()
+    assert table.num_rows == count
+    assert table.schema.field("holders").type == pyarrow.list_(
+        pyarrow.struct([("holder", pyarrow.string()), ("start_line", pyarrow.int64())])
+    )
+    rows = table.to_pylist()
+    assert [r["path"] for r in rows] == [f["path"] for f in expected]
+    assert rows[-1]["holders"] == expected[-1]["holders"]
+
+
+def test_write_columnar_files_widens_untyped_columns(tmp_path):
+    pyarrow = pytest.importorskip("pyarrow")
+    import pyarrow.parquet
+
+    codebase = build_codebase(
+        tmp_path / "codebase", files_count=25, get_holders=get_arrow_holders, score=12.5
+    )
+    root = codebase.root
+    root.holders = []
+    codebase.save_resource(root)
+    last = list(codebase.walk())[-1]
+    last.scan_errors = ["Failed to scan"]
+    codebase.save_resource(last)
+    output_file = str(tmp_path / "out.parquet")
+    # the root directory is the first row group alone and has no holders and
+    # no file has scan errors until the last one
+    count = ColumnarOutputPlugin.write_columnar_files(codebase, output_file, row_group_size=1)
+    assert count == 26
+
+    table = pyarrow.parquet.read_table(output_file)
+    holder = pyarrow.struct([("holder", pyarrow.string()), ("start_line", pyarrow.int64())])
+    assert table.schema.field("holders").type == pyarrow.list_(holder)
+    assert table.schema.field("scan_errors").type == pyarrow.list_(pyarrow.string())
+    assert table.to_pylist()[-1]["scan_errors"] == ["Failed to scan"]
+
+
+def test_columnar_writer_raises_on_unknown_keys_after_the_first_row_group(tmp_path):
+    pytest.importorskip("pyarrow")
+    writer = ColumnarWriter(str(tmp_path / "out.parquet"))
+    writer.write_row_group([dict(path="a", holders=[dict(holder="h")])])
+    with pytest.raises(PlugincodeError):
+        writer.write_row_group([dict(path="b", holders=[dict(holder="h", start_line=1)])])
+    with pytest.raises(PlugincodeError):
+        writer.write_row_group([dict(path="c", copyrights=[])])
+    writer.close()
+
+
+def test_write_columnar_files_with_explicit_schema(tmp_path):
+    pyarrow = pytest.importorskip("pyarrow")
+
+    codebase = build_codebase(
+        tmp_path / "codebase", files_count=25, get_holders=get_arrow_holders, score=12.5
+    )
+    output_file = str(tmp_path / "out.parquet")
+    holder = pyarrow.struct([("holder", pyarrow.string()), ("start_line", pyarrow.int64())])
+    schema = pyarrow.schema([("path", pyarrow.string()), ("holders", pyarrow.list_(holder))])
+    # the files have more columns than the schema
+    with pytest.raises(PlugincodeError):
+        ColumnarOutputPlugin.write_columnar_files(codebase, output_file, schema=schema)
+
+    schema = schema.append(pyarrow.field("type", pyarrow.string()))
+    schema = schema.append(pyarrow.field("score", pyarrow.float64()))
+    schema = schema.append(pyarrow.field("scan_errors", pyarrow.list_(pyarrow.string())))
+    count = ColumnarOutputPlugin.write_columnar_files(
+        codebase, output_file, row_group_size=1, schema=schema
+    )
+    assert count == 26
@@ -0,0 +1,117 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/plugincode for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+
+import io
+import os
+import threading
+
+import attr
+from commoncode.resource import Codebase
+import pytest
+
+from plugincode import PlugincodeError
+from plugincode.binary import FILE
+from plugincode.binary import HEADERS
+from plugincode.binary import SUMMARY
+from plugincode.binary import BinaryOutputPlugin
+from plugincode.binary import RecordWriter
+from plugincode.binary import get_codec
+from plugincode.binary import iter_records
+from plugincode.binary import load_files
+from plugincode.binary import load_resources_attributes
+from plugincode.output import OutputPlugin
+from scanned_codebase import build_codebase
+from scanned_codebase import get_available_codecs
+
+
+def get_binary_holders(resource):
+    return [dict(holder="Holder é {}".format(resource.name), start_line=1)]
+
+
+@pytest.mark.parametrize("codec", get_available_codecs())
+def test_write_records_and_iter_records_roundtrip(tmp_path, codec):
+    codebase = build_codebase(
+        tmp_path / "codebase", files_count=5, get_holders=get_binary_holders, score=12.5
+    )
+    output = io.BytesIO()
+    count = BinaryOutputPlugin.write_records(codebase, output, codec=codec, info=True)
+    expected_files = list(OutputPlugin.get_files(codebase, info=True))
+    assert count == len(expected_files)
+
+    records = list(iter_records(io.BytesIO(output.getvalue())))
+    kinds = [kind for kind, _data in records]
+    assert kinds == [HEADERS] + [FILE] * count + [SUMMARY]
+    assert records[0][1] == codebase.get_headers()
+    assert [data for _kind, data in records[1:-1]] == expected_files
+    assert records[-1][1] == attr.asdict(codebase.attributes)
+
+    files = list(iter_records(io.BytesIO(output.getvalue()), kinds={FILE}))
+    assert [data for _kind, data in files] == expected_files
+
+
+@pytest.mark.parametrize("codec", get_available_codecs())
+def test_load_resources_attributes_from_binary_scan(tmp_path, codec):
+    scanned = build_codebase(
+        tmp_path / "codebase", files_count=5, get_holders=get_binary_holders, score=12.5
+    )
+    output = io.BytesIO()
+    BinaryOutputPlugin.write_records(scanned, output, codec=codec)
+
+    loaded = list(load_files(io.BytesIO(output.getvalue()), attributes=["score"]))
+    assert all(sorted(f) == ["path", "score"] for f in loaded)
+
+    attributes = dict(
+        holders=attr.ib(default=attr.Factory(list)),
+        score=attr.ib(default=0.0),
+    )
+    codebase = Codebase(str(tmp_path / "codebase"), resource_attributes=attributes)
+    updated = load_resources_attributes(codebase, io.BytesIO(output.getvalue()), ["holders"])
+    assert updated == len(loaded)
+    for resource in codebase.walk():
+        assert resource.holders == [dict(holder="Holder é {}".format(resource.name), start_line=1)]
+        assert resource.score == 0.0
+
+
+@pytest.mark.parametrize("codec", get_available_codecs())
+def test_iter_records_skips_records_from_a_pipe(tmp_path, codec):
+    codebase = build_codebase(
+        tmp_path / "codebase", files_count=5, get_holders=get_binary_holders, score=12.5
+    )
+    output = io.BytesIO()
+    BinaryOutputPlugin.write_records(codebase, output, codec=codec)
+    expected_files = list(OutputPlugin.get_files(codebase))
+
+    read_fd, write_fd = os.pipe()
+
+    def write():
+        with os.fdopen(write_fd, "wb") as pipe:
+            pipe.write(output.getvalue())
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    with os.fdopen(read_fd, "rb") as pipe:
+        assert not pipe.seekable()
+        files = [data for _kind, data in iter_records(pipe, kinds={FILE})]
+    writer.join()
+    assert files == expected_files
+
+
+def test_iter_records_errors():
+    with pytest.raises(PlugincodeError):
+        list(iter_records(io.BytesIO(b"not a stream")))
+    codecs = get_available_codecs()
+    if not codecs:
+        return
+    output = io.BytesIO()
+    RecordWriter(output, codec=codecs[0]).write_file(dict(path="a"))
+    with pytest.raises(PlugincodeError):
+        list(iter_records(io.BytesIO(output.getvalue()[:-1])))
+
+
+def test_get_codec_raises_on_unknown_codec():
+    with pytest.raises(PlugincodeError):
+        get_codec("unknown")
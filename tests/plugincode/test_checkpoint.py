@@ -0,0 +1,81 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/plugincode for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+
+import attr
+from commoncode.resource import Codebase
+
+from plugincode import checkpoint
+from plugincode.checkpoint import ScanJournal
+from plugincode.checkpoint import get_journal_key
+from plugincode.checkpoint import resume_resources
+from plugincode.scan import ScanPlugin
+
+
+class SizeScanner(ScanPlugin):
+    stage = "scan"
+    name = "sizes"
+    resource_attributes = dict(lines=attr.ib(default=0))
+
+
+class OtherScanner(ScanPlugin):
+    stage = "scan"
+    name = "other"
+
+
+def build_codebase(base_dir):
+    base_dir.joinpath("a.txt").write_text("a\n")
+    base_dir.joinpath("b.txt").write_text("b\nb\n")
+    return Codebase(str(base_dir), resource_attributes=SizeScanner.resource_attributes)
+
+
+def test_get_journal_key_changes_with_plugins_and_options():
+    key = get_journal_key("/tmp/foo", [SizeScanner], license=True)
+    assert key == get_journal_key("/tmp/foo", [SizeScanner], license=True, processes=4)
+    assert key != get_journal_key("/tmp/foo", [SizeScanner], license=False)
+    assert key != get_journal_key("/tmp/foo", [SizeScanner, OtherScanner], license=True)
+
+
+def test_get_journal_key_changes_with_the_plugin_distribution_version(monkeypatch):
+    key = get_journal_key("/tmp/foo", [SizeScanner])
+    monkeypatch.setattr(checkpoint, "get_distribution_version", lambda name: "scanner==2.0")
+    assert key != get_journal_key("/tmp/foo", [SizeScanner])
+
+
+def test_scan_journal_resume_skips_completed_resources(tmp_path):
+    codebase_dir = tmp_path / "codebase"
+    codebase_dir.mkdir()
+    codebase = build_codebase(codebase_dir)
+    journal_location = str(tmp_path / "journal.jsonl")
+
+    with ScanJournal(journal_location, journal_key="key1") as journal:
+        journal.record("codebase/a.txt", scan_results=dict(lines=1))
+
+    codebase = build_codebase(codebase_dir)
+    with ScanJournal(journal_location, journal_key="key1") as journal:
+        pending = [r.path for r in resume_resources(codebase, journal)]
+    assert pending == ["codebase/b.txt"]
+    assert codebase.get_resource("codebase/a.txt").lines == 1
+
+    with ScanJournal(journal_location, journal_key="key2") as journal:
+        pending = [r.path for r in resume_resources(codebase, journal)]
+    assert pending == ["codebase/a.txt", "codebase/b.txt"]
+
+
+def test_scan_journal_ignores_truncated_trailing_record(tmp_path):
+    journal_location = tmp_path / "journal.jsonl"
+    with ScanJournal(str(journal_location), journal_key="key") as journal:
+        journal.record("codebase/a.txt", scan_results=dict(lines=1))
+
+    with open(journal_location, "a") as jl:
+        jl.write('{"path": "codebase/b.t')
+
+    with ScanJournal(str(journal_location), journal_key="key") as journal:
+        assert journal.completed_paths == {"codebase/a.txt"}
+        journal.record("codebase/b.txt", scan_results=dict(lines=2))
+
+    records = list(ScanJournal(str(journal_location), journal_key="key").iter_records())
+    assert [r["path"] for r in records] == ["codebase/a.txt", "codebase/b.txt"]
@@ -0,0 +1,77 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/plugincode for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+
+import attr
+from commoncode.resource import Codebase
+import pytest
+
+from plugincode import PlugincodeError
+from plugincode.columnar import ColumnStore
+from plugincode.columnar import get_columnar_attributes
+from plugincode.scan import ScanPlugin
+
+
+class LinesScanner(ScanPlugin):
+    stage = "scan"
+    name = "lines"
+    resource_attributes = dict(
+        lines=attr.ib(default=0),
+        score=attr.ib(default=0.0, type=float),
+        is_text=attr.ib(default=False),
+        authors=attr.ib(default=attr.Factory(list)),
+    )
+    columnar_resource_attributes = ["lines", "score", "is_text"]
+
+
+class InvalidScanner(ScanPlugin):
+    stage = "scan"
+    name = "invalid"
+    resource_attributes = LinesScanner.resource_attributes
+    columnar_resource_attributes = ["authors"]
+
+
+def test_get_columnar_attributes():
+    assert get_columnar_attributes([LinesScanner]) == dict(lines="q", score="d", is_text="b")
+    with pytest.raises(PlugincodeError):
+        get_columnar_attributes([InvalidScanner])
+
+
+def test_column_store_roundtrip_with_codebase(tmp_path):
+    for name in ("a.txt", "b.txt", "c.bin"):
+        tmp_path.joinpath(name).write_text(name)
+    codebase = Codebase(str(tmp_path), resource_attributes=LinesScanner.resource_attributes)
+    for resource in codebase.walk():
+        if resource.is_file:
+            resource.lines = len(resource.name)
+            resource.is_text = resource.extension == ".txt"
+            codebase.save_resource(resource)
+
+    store = ColumnStore.from_codebase(codebase, get_columnar_attributes([LinesScanner]))
+    assert len(store) == 4
+    assert sum(store.column("lines")) == 15
+    assert sum(store.column("is_text")) == 2
+
+    for path in store.paths:
+        store.set(path, "score", store.get(path, "lines"))
+    store.set(tmp_path.name + "/a.txt", "is_text", False)
+    store.to_codebase(codebase, ["score", "is_text"])
+
+    resource = codebase.get_resource(tmp_path.name + "/a.txt")
+    assert resource.score == 5.0
+    assert resource.is_text is False
+
+
+def test_column_store_numpy_columns_share_memory():
+    numpy = pytest.importorskip("numpy")
+    store = ColumnStore(["root", "root/a", "root/b"])
+    store.add_column("lines", "q")
+    store.add_column("score", "d")
+    store.set("root/a", "lines", 3)
+    lines = store.column("lines")
+    assert isinstance(lines, numpy.ndarray)
+    store.column("score")[:] = lines * 2
+    assert store.get("root/a", "score") == 6.0
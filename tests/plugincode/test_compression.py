@@ -0,0 +1,72 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/plugincode for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+
+import gzip
+import io
+
+import pytest
+
+from plugincode import PlugincodeError
+from plugincode import compression
+from plugincode.compression import CompressedWriter
+from plugincode.compression import get_compressor
+from plugincode.output import OutputPlugin
+from scanned_codebase import build_codebase
+
+
+def test_compressed_writer_writes_concatenated_gzip_members():
+    output = io.BytesIO()
+    data = ["line {} é\n".format(i) for i in range(5000)]
+    with CompressedWriter(output, compression="gzip", threads=3, block_size=1000) as writer:
+        for line in data:
+            writer.write(line)
+        writer.write(b"bytes too")
+    assert writer.blocks_count > 10
+    assert gzip.decompress(output.getvalue()) == ("".join(data) + "bytes too").encode("utf-8")
+
+
+def test_compressed_writer_writes_a_valid_empty_stream():
+    output = io.BytesIO()
+    CompressedWriter(output, compression="gzip").close()
+    assert gzip.decompress(output.getvalue()) == b""
+
+
+def test_compressed_writer_with_zstd():
+    zstandard = pytest.importorskip("zstandard")
+    output = io.BytesIO()
+    with CompressedWriter(output, compression="zstd", threads=2, block_size=100) as writer:
+        for i in range(1000):
+            writer.write("line {}\n".format(i))
+    expected = "".join("line {}\n".format(i) for i in range(1000)).encode("utf-8")
+    reader = zstandard.ZstdDecompressor().stream_reader(
+        io.BytesIO(output.getvalue()), read_across_frames=True
+    )
+    assert reader.read() == expected
+
+
+def test_get_compressor_raises_on_unavailable_compression():
+    with pytest.raises(PlugincodeError):
+        get_compressor("unknown")
+    if compression.zstandard is None:
+        with pytest.raises(PlugincodeError):
+            get_compressor("zstd")
+
+
+def test_write_json_files_with_compression(tmp_path):
+    codebase = build_codebase(tmp_path / "codebase", files_count=50)
+    expected = io.StringIO()
+    OutputPlugin.write_json_files(codebase, expected, info=True)
+
+    output_file = tmp_path / "out.json.gz"
+    # a text output file is written through its binary buffer
+    with open(output_file, "w") as output:
+        count = OutputPlugin.write_json_files(
+            codebase, output, info=True, compression="gzip", compression_threads=2
+        )
+    assert count == 51
+    with gzip.open(output_file, "rt", encoding="utf-8") as compressed:
+        assert compressed.read() == expected.getvalue()
@@ -0,0 +1,115 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/plugincode for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+
+import json
+
+import attr
+import pytest
+
+from plugincode import PlugincodeError
+from plugincode.binary import BinaryOutputPlugin
+from plugincode.delta import ADDED
+from plugincode.delta import CHANGED
+from plugincode.delta import REMOVED
+from plugincode.delta import DeltaOutputPlugin
+from plugincode.delta import get_delta
+from plugincode.delta import load_delta
+from plugincode.delta import load_previous_files
+from plugincode.delta import merge_delta
+from plugincode.jsonlines import JsonLinesOutputPlugin
+from plugincode.output import OutputPlugin
+from scanned_codebase import build_codebase
+from scanned_codebase import get_default_holders
+from scanned_codebase import get_available_codecs
+
+
+def get_other_z_holders(resource):
+    if resource.name == "z.c":
+        return ["Other holder"]
+    return get_default_holders(resource)
+
+
+def test_get_delta_and_merge_delta_reconstruct_the_new_scan(tmp_path):
+    previous_codebase = build_codebase(
+        tmp_path / "previous" / "codebase", names=["a.c", "b.c", "dir/c.c", "dir/d.c", "z.c"]
+    )
+    codebase = build_codebase(
+        tmp_path / "new" / "codebase",
+        names=["a.c", "a2.c", "a3.c", "dir/c.c", "dir/e.c", "z.c"],
+        get_holders=get_other_z_holders,
+    )
+    previous_files = list(OutputPlugin.get_files(previous_codebase))
+    files = list(OutputPlugin.get_files(codebase))
+
+    delta = list(get_delta(previous_files, files))
+    added = [r["file"]["path"] for r in delta if r["action"] == ADDED]
+    assert added == ["codebase/a2.c", "codebase/a3.c", "codebase/dir/e.c"]
+    assert [r["after"] for r in delta if r["action"] == ADDED][1] == "codebase/a2.c"
+    removed = [r["path"] for r in delta if r["action"] == REMOVED]
+    assert removed == ["codebase/b.c", "codebase/dir/d.c"]
+    changed = [r for r in delta if r["action"] == CHANGED]
+    assert [r["path"] for r in changed] == ["codebase/z.c"]
+    assert changed[0]["changed"] == dict(holders=["Other holder"])
+
+    assert list(merge_delta(previous_files, delta)) == files
+
+
+def test_merge_delta_with_new_and_removed_attributes(tmp_path):
+    previous_codebase = build_codebase(tmp_path / "previous" / "codebase", names=["a.c"], score=1)
+    codebase = build_codebase(tmp_path / "new" / "codebase", names=["a.c", "b.c"], sha1="abc")
+    previous_files = list(OutputPlugin.get_files(previous_codebase))
+    files = list(OutputPlugin.get_files(codebase))
+
+    delta = list(get_delta(previous_files, files))
+    changed = [r for r in delta if r["action"] == CHANGED]
+    assert changed[0]["changed"] == dict(sha1="abc")
+    assert changed[0]["fields"] == list(files[0])
+    assert list(merge_delta(previous_files, delta)) == files
+
+
+def test_get_delta_is_empty_for_the_same_scan(tmp_path):
+    codebase = build_codebase(tmp_path / "codebase", names=["a.c", "dir/b.c"])
+    files = list(OutputPlugin.get_files(codebase))
+    assert list(get_delta(files, OutputPlugin.get_files(codebase))) == []
+
+
+def write_previous_scan(codebase, location, previous_format):
+    if previous_format == "jsonl":
+        with open(location, "w") as output, open(str(location) + ".idx", "wb") as index:
+            JsonLinesOutputPlugin.write_json_lines(codebase, output, index)
+    else:
+        with open(location, "wb") as output:
+            BinaryOutputPlugin.write_records(codebase, output, codec=previous_format)
+
+
+@pytest.mark.parametrize("previous_format", ["jsonl"] + get_available_codecs())
+def test_write_delta_and_load_delta(tmp_path, previous_format):
+    previous_codebase = build_codebase(tmp_path / "previous" / "codebase", names=["a.c", "b.c"])
+    codebase = build_codebase(tmp_path / "new" / "codebase", names=["a.c", "c.c"])
+    previous_scan = tmp_path / "previous.scan"
+    write_previous_scan(previous_codebase, previous_scan, previous_format)
+    previous_files = list(OutputPlugin.get_files(previous_codebase))
+    assert list(load_previous_files(str(previous_scan))) == previous_files
+
+    output_location = tmp_path / "delta.jsonl"
+    with open(output_location, "w") as output:
+        DeltaOutputPlugin().process_codebase(codebase, output, previous_scan=str(previous_scan))
+
+    with open(output_location) as delta_file:
+        delta = load_delta(delta_file)
+    assert delta["headers"] == codebase.get_headers()
+    assert delta["attributes"] == attr.asdict(codebase.attributes)
+    assert [r["action"] for r in delta["records"]] == [ADDED, REMOVED]
+    merged = list(merge_delta(previous_files, delta["records"]))
+    assert merged == list(OutputPlugin.get_files(codebase))
+
+
+def test_load_previous_files_raises_on_a_json_scan(tmp_path):
+    previous_scan = tmp_path / "previous.json"
+    previous_scan.write_text(json.dumps(dict(files=[dict(path="a")]), indent=2))
+    with pytest.raises(PlugincodeError):
+        list(load_previous_files(str(previous_scan)))
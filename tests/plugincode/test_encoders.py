@@ -0,0 +1,86 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/plugincode for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+
+import io
+
+from commoncode.resource import Codebase
+import pytest
+
+from plugincode import PlugincodeError
+from plugincode.encoders import PREFERRED_ENCODERS
+from plugincode.encoders import get_available_encoders
+from plugincode.encoders import get_encoder
+from plugincode.encoders import has_exponent
+from plugincode.output import OutputPlugin
+
+SAMPLES = [
+    None,
+    True,
+    0,
+    -12,
+    2**63 - 1,
+    2**70,
+    0.1,
+    99.0,
+    -12.5,
+    1e16,
+    1.5e-7,
+    "",
+    "path/to/file.c",
+    "Copyright (c) é ü 漢字 \U0001f600",
+    'control \x00 \x1f \x7f tab\t quote" backslash\\ </script>',
+    "1e5 in a string",
+    "da39a3ee5e6b4b0d3255bfef95601890afd80709",
+    [1, "a", None, [], {}],
+    (1, 2),
+    {"path": "a/b", "licenses": [{"key": "mit", "score": 100.0, "start_line": 1}]},
+    {1: "non-string key", "b": False},
+    {"sha1": "0e5f", "scores": [1.0, {"nested": 2.5e-10}]},
+]
+
+
+@pytest.mark.parametrize("name", get_available_encoders())
+def test_encoders_are_byte_identical_to_stdlib(name):
+    stdlib = get_encoder("stdlib")
+    encoder = get_encoder(name)
+    assert encoder.name == name
+    for sample in SAMPLES:
+        assert encoder.encode(sample) == stdlib.encode(sample)
+
+
+def test_has_exponent_checks_float_values_not_strings():
+    sha1 = "0000000000000000000000000000000000000e50"
+    data = {"path": "a", "sha1": sha1, "score": 100.0}
+    encoded = get_encoder("stdlib").encode(data)
+    assert not has_exponent(encoded, data)
+    data["score"] = 1e-07
+    encoded = get_encoder("stdlib").encode(data)
+    assert has_exponent(encoded, data)
+
+
+def test_get_encoder():
+    assert get_encoder().name == get_available_encoders()[0]
+    assert get_available_encoders()[-1] == "stdlib"
+    for name in PREFERRED_ENCODERS:
+        if name not in get_available_encoders():
+            with pytest.raises(PlugincodeError):
+                get_encoder(name)
+    with pytest.raises(PlugincodeError):
+        get_encoder("unknown")
+
+
+def test_write_json_files_is_the_same_with_all_encoders(tmp_path):
+    base_dir = tmp_path / "codebase"
+    base_dir.mkdir()
+    base_dir.joinpath("é.txt").write_text("a")
+    codebase = Codebase(str(base_dir))
+    outputs = set()
+    for name in get_available_encoders():
+        output = io.StringIO()
+        OutputPlugin.write_json_files(codebase, output, info=True, json_encoder=name)
+        outputs.add(output.getvalue())
+    assert len(outputs) == 1
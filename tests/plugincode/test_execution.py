@@ -0,0 +1,278 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/plugincode for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+
+import threading
+
+import attr
+from commoncode.resource import Codebase
+import pytest
+
+from plugincode import PlugincodeError
+from plugincode.execution import get_execution_levels
+from plugincode.execution import group_visitors
+from plugincode.execution import run_process_codebase
+from plugincode.execution import run_process_resource
+from plugincode.post_scan import PostScanPlugin
+
+
+class NameLength(PostScanPlugin):
+    stage = "post_scan"
+    name = "name_length"
+    resource_attributes = dict(name_length=attr.ib(default=0))
+
+    def process_codebase(self, codebase, **kwargs):
+        for resource in codebase.walk():
+            resource.name_length = len(resource.name)
+            codebase.save_resource(resource)
+
+
+class Upper(PostScanPlugin):
+    stage = "post_scan"
+    name = "upper"
+    resource_attributes = dict(upper_name=attr.ib(default=None))
+
+    def process_codebase(self, codebase, **kwargs):
+        for resource in codebase.walk():
+            resource.upper_name = resource.name.upper()
+            codebase.save_resource(resource)
+
+
+class TotalNameLength(PostScanPlugin):
+    """
+    Compute the total of the name lengths of a resource and its descendants
+    bottom-up, reading its own writes.
+    """
+
+    stage = "post_scan"
+    name = "total_name_length"
+    resource_attributes = dict(total_name_length=attr.ib(default=0))
+    required_resource_attributes = ["name_length"]
+
+    def process_codebase(self, codebase, **kwargs):
+        for resource in codebase.walk(topdown=False):
+            children = resource.children(codebase)
+            resource.total_name_length = resource.name_length + sum(
+                c.total_name_length for c in children
+            )
+            codebase.save_resource(resource)
+
+
+class Undeclared(PostScanPlugin):
+    stage = "post_scan"
+    name = "undeclared"
+
+
+def get_attributes(*plugins):
+    attributes = {}
+    for plugin in plugins:
+        attributes.update(plugin.resource_attributes)
+    return attributes
+
+
+def test_get_execution_levels():
+    name_length, upper, total = NameLength(), Upper(), TotalNameLength()
+    undeclared = Undeclared()
+    levels = get_execution_levels([name_length, upper, total])
+    assert levels == [[name_length, upper], [total]]
+
+    levels = get_execution_levels([name_length, undeclared, upper])
+    assert levels == [[name_length], [undeclared], [upper]]
+
+
+def test_run_process_codebase_merges_concurrent_writes(tmp_path):
+    base_dir = tmp_path / "codebase"
+    base_dir.joinpath("dir").mkdir(parents=True)
+    base_dir.joinpath("dir", "file.c").write_text("a")
+    base_dir.joinpath("x.txt").write_text("a")
+
+    plugins = [NameLength(), Upper(), TotalNameLength()]
+    codebase = Codebase(str(base_dir), resource_attributes=get_attributes(*plugins))
+    run_process_codebase(plugins, codebase, max_workers=4)
+
+    results = {r.path: (r.name_length, r.upper_name, r.total_name_length) for r in codebase.walk()}
+    assert results == {
+        "codebase": (8, "CODEBASE", 22),
+        "codebase/x.txt": (5, "X.TXT", 5),
+        "codebase/dir": (3, "DIR", 9),
+        "codebase/dir/file.c": (6, "FILE.C", 6),
+    }
+
+
+class Extension(PostScanPlugin):
+    stage = "post_scan"
+    name = "extension"
+    resource_attributes = dict(
+        is_text=attr.ib(default=False),
+        upper_name_length=attr.ib(default=0),
+    )
+    required_resource_attributes = ["upper_name"]
+
+    def process_resource(self, resource, **kwargs):
+        if resource.is_file:
+            return dict(
+                is_text=resource.extension == ".txt",
+                upper_name_length=len(resource.upper_name),
+            )
+
+
+class Invalid(PostScanPlugin):
+    stage = "post_scan"
+    name = "invalid"
+
+    def process_resource(self, resource, **kwargs):
+        return dict(foo=1)
+
+
+def test_run_process_resource_in_processes(tmp_path):
+    base_dir = tmp_path / "codebase"
+    base_dir.joinpath("dir").mkdir(parents=True)
+    base_dir.joinpath("dir", "file.c").write_text("a")
+    base_dir.joinpath("x.txt").write_text("a")
+
+    plugins = [Upper(), Extension()]
+    codebase = Codebase(str(base_dir), resource_attributes=get_attributes(*plugins))
+    assert not Upper.has_process_resource()
+    assert Extension.has_process_resource()
+    run_process_codebase(plugins, codebase, processes=2, chunk_size=1)
+
+    results = {r.path: (r.is_text, r.upper_name_length) for r in codebase.walk()}
+    assert results == {
+        "codebase": (False, 0),
+        "codebase/x.txt": (True, 5),
+        "codebase/dir": (False, 0),
+        "codebase/dir/file.c": (False, 6),
+    }
+
+
+def test_run_process_resource_fails_on_undeclared_attributes(tmp_path):
+    tmp_path.joinpath("x.txt").write_text("a")
+    codebase = Codebase(str(tmp_path))
+    with pytest.raises(PlugincodeError):
+        run_process_resource(Invalid(), codebase)
+
+
+class DepthVisitor(PostScanPlugin):
+    stage = "post_scan"
+    name = "depth"
+    resource_attributes = dict(depth=attr.ib(default=0))
+
+    def get_visitors(self, **kwargs):
+        def pre_visitor(resource, codebase):
+            resource.depth = resource.path.count("/")
+            return True
+
+        return pre_visitor, None
+
+
+class FilesCountVisitor(PostScanPlugin):
+    stage = "post_scan"
+    name = "files_count"
+    resource_attributes = dict(files=attr.ib(default=0))
+
+    def get_visitors(self, **kwargs):
+        def post_visitor(resource, codebase):
+            if resource.is_file:
+                resource.files = 1
+            else:
+                resource.files = sum(c.files for c in resource.children(codebase))
+            return True
+
+        return None, post_visitor
+
+
+def test_run_process_codebase_groups_visitors_in_one_traversal(tmp_path):
+    base_dir = tmp_path / "codebase"
+    base_dir.joinpath("dir").mkdir(parents=True)
+    base_dir.joinpath("dir", "file.c").write_text("a")
+    base_dir.joinpath("dir", "file2.c").write_text("a")
+    base_dir.joinpath("x.txt").write_text("a")
+
+    depth, files, upper = DepthVisitor(), FilesCountVisitor(), Upper()
+    plugins = [depth, files, upper]
+    codebase = Codebase(str(base_dir), resource_attributes=get_attributes(*plugins))
+    assert group_visitors(plugins) == [[depth, files], [upper]]
+
+    for max_workers in (1, 4):
+        run_process_codebase(plugins, codebase, max_workers=max_workers)
+        results = {r.path: (r.depth, r.files, r.upper_name) for r in codebase.walk()}
+        assert results == {
+            "codebase": (0, 3, "CODEBASE"),
+            "codebase/x.txt": (1, 1, "X.TXT"),
+            "codebase/dir": (1, 2, "DIR"),
+            "codebase/dir/file.c": (2, 1, "FILE.C"),
+            "codebase/dir/file2.c": (2, 1, "FILE2.C"),
+        }
+
+
+class NestedFilesVisitor(PostScanPlugin):
+    """
+    Read the files count of the FilesCountVisitor in pre-order.
+    """
+
+    stage = "post_scan"
+    name = "nested_files"
+    resource_attributes = dict(nested_files=attr.ib(default=0))
+    required_plugins = ["post_scan:files_count"]
+    required_resource_attributes = ["files"]
+
+    def get_visitors(self, **kwargs):
+        def pre_visitor(resource, codebase):
+            resource.nested_files = resource.files
+            return True
+
+        return pre_visitor, None
+
+
+def test_run_process_codebase_never_groups_dependent_visitors(tmp_path):
+    base_dir = tmp_path / "codebase"
+    base_dir.joinpath("dir").mkdir(parents=True)
+    base_dir.joinpath("dir", "file.c").write_text("a")
+    base_dir.joinpath("x.txt").write_text("a")
+
+    files, nested = FilesCountVisitor(), NestedFilesVisitor()
+    plugins = [files, nested]
+    assert group_visitors(plugins) == [[files], [nested]]
+
+    for max_workers in (1, 4):
+        codebase = Codebase(str(base_dir), resource_attributes=get_attributes(*plugins))
+        run_process_codebase(plugins, codebase, max_workers=max_workers)
+        results = {r.path: r.nested_files for r in codebase.walk()}
+        assert results == {
+            "codebase": 2,
+            "codebase/x.txt": 1,
+            "codebase/dir": 1,
+            "codebase/dir/file.c": 1,
+        }
+
+
+def test_run_process_codebase_concurrent_level_never_saves_from_worker_threads(
+    tmp_path, monkeypatch
+):
+    base_dir = tmp_path / "codebase"
+    base_dir.joinpath("dir").mkdir(parents=True)
+    base_dir.joinpath("dir", "file.c").write_text("a")
+    base_dir.joinpath("x.txt").write_text("a")
+
+    plugins = [DepthVisitor(), FilesCountVisitor(), Upper()]
+    codebase = Codebase(
+        str(base_dir), resource_attributes=get_attributes(*plugins), max_in_memory=-1
+    )
+
+    saving_threads = set()
+    save_resource = Codebase.save_resource
+
+    def recording_save_resource(self, resource):
+        saving_threads.add(threading.get_ident())
+        return save_resource(self, resource)
+
+    monkeypatch.setattr(Codebase, "save_resource", recording_save_resource)
+    run_process_codebase(plugins, codebase, max_workers=4)
+    assert saving_threads == {threading.get_ident()}
+
+    results = {r.path: (r.depth, r.files, r.upper_name) for r in codebase.walk()}
+    assert results["codebase"] == (0, 2, "CODEBASE")
+    assert results["codebase/dir/file.c"] == (2, 1, "FILE.C")
@@ -0,0 +1,95 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/plugincode for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+
+from commoncode.resource import Codebase
+import pytest
+
+from plugincode.filtering import FilteredResources
+from plugincode.filtering import ResourceBitmap
+from plugincode.output import OutputPlugin
+
+
+def build_codebase(base_dir, max_in_memory=10000):
+    for directory in ("a", "B/c", "b", "d/e/f", "empty"):
+        base_dir.joinpath(directory).mkdir(parents=True)
+    for path in ("z.txt", "A.txt", "a/1.txt", "a/2.txt", "B/c/3.txt", "b/4", "d/e/f/5"):
+        base_dir.joinpath(path).write_text("content")
+    return Codebase(str(base_dir), max_in_memory=max_in_memory)
+
+
+def test_resource_bitmap_operations():
+    bitmap = ResourceBitmap([0, 9, 100])
+    assert 9 in bitmap
+    assert 8 not in bitmap
+    assert 1000 not in bitmap
+    assert len(bitmap) == 3
+    bitmap.discard(9)
+    bitmap.discard(1000)
+    assert list(bitmap) == [0, 100]
+    assert ResourceBitmap.from_bytes(bitmap.to_bytes()) == bitmap
+    assert ResourceBitmap([1]) | ResourceBitmap([200]) == ResourceBitmap([1, 200])
+    assert ResourceBitmap([1, 200]) - ResourceBitmap([200]) == ResourceBitmap([1])
+    assert not ResourceBitmap([1]) & ResourceBitmap([2])
+
+
+@pytest.mark.parametrize("topdown", [True, False])
+@pytest.mark.parametrize("skip_root", [True, False])
+def test_walk_paths_is_in_the_same_order_as_codebase_walk(tmp_path, topdown, skip_root):
+    codebase = build_codebase(tmp_path / "codebase")
+    expected = [r.path for r in codebase.walk(topdown=topdown, skip_root=skip_root)]
+    filtered = FilteredResources(codebase)
+    walked = list(filtered.walk_paths(topdown=topdown, skip_root=skip_root))
+    assert [path for _rid, path in walked] == expected
+    assert all(filtered.paths[rid] == path for rid, path in walked)
+
+
+def test_resource_ids_are_stable_when_resources_are_removed(tmp_path):
+    codebase = build_codebase(tmp_path / "codebase")
+    filtered = FilteredResources(codebase)
+    filtered.filter("codebase/z.txt")
+    z_id = filtered.get_id("codebase/z.txt")
+    paths_count = len(filtered.paths)
+
+    codebase.remove_resource(codebase.get_resource("codebase/a"))
+    assert filtered.get_id("codebase/z.txt") == z_id
+    assert filtered.is_filtered("codebase/z.txt")
+    assert len(filtered.paths) == paths_count
+
+    walked = [r.path for r in filtered.walk()]
+    expected = [r.path for r in codebase.walk() if r.path != "codebase/z.txt"]
+    assert walked == expected
+    assert "codebase/a/1.txt" not in walked
+    filtered.save_flags()
+
+
+def test_get_files_never_loads_filtered_resources(tmp_path, monkeypatch):
+    codebase = build_codebase(tmp_path / "codebase", max_in_memory=-1)
+    filtered = FilteredResources(codebase)
+    txt_files = filtered.get_bitmap(p for p in filtered.paths if p.endswith(".txt"))
+    directories = filtered.get_bitmap(["codebase/d", "codebase/d/e"])
+    filtered.bitmap = txt_files | directories
+
+    loaded = []
+    load_resource = Codebase._load_resource
+
+    def recording_load_resource(self, path):
+        loaded.append(path)
+        return load_resource(self, path)
+
+    monkeypatch.setattr(Codebase, "_load_resource", recording_load_resource)
+    files = list(OutputPlugin.get_files(codebase, filtered_resources=filtered))
+    monkeypatch.undo()
+
+    paths = [f["path"] for f in files]
+    assert not any(path.endswith(".txt") for path in paths)
+    assert "codebase/d" not in paths
+    assert "codebase/d/e/f/5" in paths
+    assert "codebase/d/e/f/5" in loaded
+    assert not any(path.endswith(".txt") for path in loaded)
+
+    filtered.save_flags()
+    assert [f["path"] for f in OutputPlugin.get_files(codebase)] == paths
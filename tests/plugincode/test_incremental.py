@@ -0,0 +1,95 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/plugincode for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+
+import attr
+from commoncode.resource import Codebase
+
+from plugincode.incremental import IncrementalState
+from plugincode.incremental import run_incremental
+from plugincode.post_scan import PostScanPlugin
+
+
+class TotalLines(PostScanPlugin):
+    stage = "post_scan"
+    name = "total_lines"
+    resource_attributes = dict(total_lines=attr.ib(default=0))
+    required_resource_attributes = ["lines"]
+    aggregates_descendants = True
+
+    def __init__(self):
+        self.visited = []
+
+    def get_visitors(self, **kwargs):
+        def post_visitor(resource, codebase):
+            self.visited.append(resource.path)
+            resource.total_lines = resource.lines + sum(
+                c.total_lines for c in resource.children(codebase)
+            )
+            return True
+
+        return None, post_visitor
+
+
+def build_codebase(base_dir, lines):
+    attributes = dict(lines=attr.ib(default=0))
+    attributes.update(TotalLines.resource_attributes)
+    codebase = Codebase(str(base_dir), resource_attributes=attributes)
+    for path, count in lines.items():
+        resource = codebase.get_resource(path)
+        resource.lines = count
+        codebase.save_resource(resource)
+    return codebase
+
+
+def test_run_incremental_recomputes_changed_resources_and_ancestors(tmp_path):
+    base_dir = tmp_path / "codebase"
+    for path in ("a/a1.c", "a/a2.c", "b/b1.c"):
+        base_dir.joinpath(path).parent.mkdir(parents=True, exist_ok=True)
+        base_dir.joinpath(path).write_text(path)
+    lines = {"codebase/a/a1.c": 1, "codebase/a/a2.c": 2, "codebase/b/b1.c": 3}
+    state_location = str(tmp_path / "state.json")
+
+    codebase = build_codebase(base_dir, lines)
+    state = IncrementalState(state_location)
+    plugin = TotalLines()
+    assert len(run_incremental(plugin, codebase, state)) == 6
+    state.save()
+    assert codebase.get_resource("codebase").total_lines == 6
+
+    lines["codebase/b/b1.c"] = 10
+    codebase = build_codebase(base_dir, lines)
+    state = IncrementalState(state_location)
+    plugin = TotalLines()
+    affected = run_incremental(plugin, codebase, state)
+    assert affected == {"codebase", "codebase/b", "codebase/b/b1.c"}
+    assert plugin.visited == ["codebase/b/b1.c", "codebase/b", "codebase"]
+
+    results = {r.path: r.total_lines for r in codebase.walk()}
+    assert results == {
+        "codebase": 13,
+        "codebase/a": 3,
+        "codebase/a/a1.c": 1,
+        "codebase/a/a2.c": 2,
+        "codebase/b": 10,
+        "codebase/b/b1.c": 10,
+    }
+
+    plugin = TotalLines()
+    assert not run_incremental(plugin, codebase, state)
+    assert not plugin.visited
+
+
+def test_incremental_state_saves_non_json_outputs(tmp_path):
+    location = str(tmp_path / "state.json")
+    state = IncrementalState(location)
+    outputs = dict(extensions={".c"})
+    state.plugins["post_scan:total_lines"] = dict(resources={"root": ["digest", outputs]})
+    state.save()
+    loaded = IncrementalState(location)
+    assert loaded.plugins["post_scan:total_lines"]["resources"]["root"][1] == dict(
+        extensions=repr({".c"})
+    )
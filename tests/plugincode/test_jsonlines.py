@@ -0,0 +1,105 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/plugincode for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+
+import io
+import json
+
+import attr
+import pytest
+
+from plugincode import PlugincodeError
+from plugincode.jsonlines import IndexBuilder
+from plugincode.jsonlines import JsonLinesIndex
+from plugincode.jsonlines import JsonLinesOutputPlugin
+from plugincode.jsonlines import JsonLinesReader
+from plugincode.output import OutputPlugin
+from scanned_codebase import build_codebase
+
+
+def get_jsonlines_holders(resource):
+    return ["Holder é\n{}".format(resource.name)]
+
+
+class JsonLinesOutput(JsonLinesOutputPlugin):
+    pass
+
+
+@pytest.mark.parametrize("use_mmap", [True, False])
+def test_write_json_lines_and_read_by_path(tmp_path, use_mmap):
+    codebase = build_codebase(
+        tmp_path / "codebase", files_count=30, get_holders=get_jsonlines_holders
+    )
+    location = str(tmp_path / "scan.jsonl")
+    with open(location, "w") as output:
+        JsonLinesOutput().process_codebase(codebase, output, info=True)
+
+    expected = list(OutputPlugin.get_files(codebase, info=True))
+    with open(location) as lines:
+        lines = [json.loads(line) for line in lines]
+    assert lines[0] == dict(headers=codebase.get_headers())
+    assert lines[1:-1] == expected
+    assert lines[-1] == dict(attributes=attr.asdict(codebase.attributes))
+
+    with JsonLinesReader(location, use_mmap=use_mmap) as reader:
+        assert len(reader.index) == len(expected)
+        for file_data in reversed(expected):
+            assert reader.get(file_data["path"]) == file_data
+        assert reader.get("does/not/exist") is None
+
+
+class StdoutBuffer(io.BytesIO):
+    name = "<stdout>"
+
+
+def test_process_codebase_writes_no_index_for_stdout(tmp_path, monkeypatch):
+    codebase = build_codebase(
+        tmp_path / "codebase", files_count=2, get_holders=get_jsonlines_holders
+    )
+    monkeypatch.chdir(tmp_path)
+    buffer = StdoutBuffer()
+    output = io.TextIOWrapper(buffer, encoding="utf-8")
+    JsonLinesOutput().process_codebase(codebase, output)
+    output.flush()
+    lines = buffer.getvalue().decode("utf-8").splitlines()
+    assert len(lines) == 5
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["codebase"]
+
+
+def test_index_with_colliding_hashes(tmp_path, monkeypatch):
+    monkeypatch.setattr("plugincode.jsonlines.get_path_hash", lambda path: 42)
+    index = IndexBuilder()
+    index.add("a", 10, 5)
+    index.add("b", 0, 3)
+    index_location = str(tmp_path / "index")
+    with open(index_location, "wb") as index_file:
+        index.write(index_file)
+    assert JsonLinesIndex(index_location).get_locations("c") == [(0, 3), (10, 5)]
+
+
+def test_json_lines_index_rejects_invalid_files(tmp_path):
+    index_location = tmp_path / "index"
+    index_location.write_bytes(b"")
+    with pytest.raises(PlugincodeError):
+        JsonLinesIndex(str(index_location))
+    index_location.write_bytes(b"not an index at all")
+    with pytest.raises(PlugincodeError):
+        JsonLinesIndex(str(index_location))
+
+
+def test_write_json_lines_after_existing_content(tmp_path):
+    codebase = build_codebase(
+        tmp_path / "codebase", files_count=2, get_holders=get_jsonlines_holders
+    )
+    location = str(tmp_path / "scan.jsonl")
+    with open(location, "w") as output:
+        output.write("prefix é\n")
+        with open(location + ".idx", "wb") as index_file:
+            count = JsonLinesOutputPlugin.write_json_lines(codebase, output, index_file)
+    assert count == 3
+    with JsonLinesReader(location) as reader:
+        for file_data in OutputPlugin.get_files(codebase):
+            assert reader.get(file_data["path"]) == file_data
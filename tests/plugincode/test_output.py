@@ -0,0 +1,174 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/plugincode for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+
+import io
+import json
+
+from commoncode.resource import Codebase
+
+from plugincode import PlugincodeError
+from plugincode.output import OutputPlugin
+from plugincode.output import run_output_plugins
+from scanned_codebase import build_codebase
+
+
+class RecordingOutput(io.StringIO):
+    def __init__(self):
+        super(RecordingOutput, self).__init__()
+        self.writes = []
+
+    def write(self, data):
+        self.writes.append(len(data))
+        return super(RecordingOutput, self).write(data)
+
+
+def test_write_json_files_is_the_same_as_get_files(tmp_path):
+    codebase = build_codebase(tmp_path / "codebase")
+    expected = list(OutputPlugin.get_files(codebase, info=True, strip_root=True))
+    for indent in (None, 2):
+        output = io.StringIO()
+        count = OutputPlugin.write_json_files(
+            codebase, output, indent=indent, info=True, strip_root=True
+        )
+        assert count == len(expected) == 20
+        assert json.loads(output.getvalue()) == expected
+
+
+def test_write_json_files_writes_in_bounded_chunks(tmp_path):
+    codebase = build_codebase(tmp_path / "codebase", files_count=50)
+    output = RecordingOutput()
+    OutputPlugin.write_json_files(codebase, output, chunk_size=1024)
+    assert len(output.writes) > 10
+    largest_file = max(len(json.dumps(f)) for f in OutputPlugin.get_files(codebase))
+    assert max(output.writes) < 1024 + largest_file
+    assert len(json.loads(output.getvalue())) == 51
+
+
+class ParallelOutput(OutputPlugin):
+    parallel_serialization = True
+
+
+def test_write_json_files_in_parallel_keeps_walk_order(tmp_path):
+    codebase = build_codebase(tmp_path / "codebase", files_count=50)
+    expected = io.StringIO()
+    OutputPlugin.write_json_files(codebase, expected, indent=2, processes=2)
+    output = io.StringIO()
+    count = ParallelOutput.write_json_files(
+        codebase, output, indent=2, processes=2, files_per_chunk=7
+    )
+    assert count == 51
+    assert output.getvalue() == expected.getvalue()
+
+
+class JsonOutput(OutputPlugin):
+    def process_codebase(self, codebase, output, **kwargs):
+        self.write_json_files(codebase, output, **kwargs)
+
+
+class PathsOutput(OutputPlugin):
+    def process_codebase(self, codebase, paths, **kwargs):
+        for file_data in self.get_files(codebase, **kwargs):
+            paths.append(file_data["path"])
+
+
+class FailingOutput(OutputPlugin):
+    def process_codebase(self, codebase, **kwargs):
+        for i, _file_data in enumerate(self.get_files(codebase, **kwargs)):
+            if i == 3:
+                raise Exception("failed")
+
+
+def test_run_output_plugins_walks_the_codebase_once(tmp_path, monkeypatch):
+    codebase = build_codebase(tmp_path / "codebase", files_count=250)
+    expected = io.StringIO()
+    OutputPlugin.write_json_files(codebase, expected, strip_root=True)
+
+    walks = []
+    walk_filtered = Codebase.walk_filtered
+
+    def counting_walk_filtered(self, *args, **kwargs):
+        walks.append(1)
+        return walk_filtered(self, *args, **kwargs)
+
+    monkeypatch.setattr(Codebase, "walk_filtered", counting_walk_filtered)
+
+    output = io.StringIO()
+    paths = []
+    failing = FailingOutput()
+    errors = run_output_plugins(
+        [JsonOutput(), PathsOutput(), failing],
+        codebase,
+        chunk_size=10,
+        max_chunks=2,
+        output=output,
+        paths=paths,
+        strip_root=True,
+    )
+    assert len(walks) == 1
+    assert output.getvalue() == expected.getvalue()
+    assert len(paths) == 250
+    assert [plugin for plugin, _error in errors] == [failing]
+
+
+class PartialOutput(OutputPlugin):
+    def process_codebase(self, codebase, partial_paths, **kwargs):
+        for file_data in self.get_files(codebase, **kwargs):
+            partial_paths.append(file_data["path"])
+            if len(partial_paths) == 5:
+                return
+
+
+class TwiceOutput(OutputPlugin):
+    def process_codebase(self, codebase, **kwargs):
+        list(self.get_files(codebase, **kwargs))
+        list(self.get_files(codebase, **kwargs))
+
+
+class NamesOutput(OutputPlugin):
+    @classmethod
+    def get_files(cls, codebase, **kwargs):
+        assert "shared_files" not in kwargs
+        return (dict(name=r.name) for r in codebase.walk_filtered(skip_root=True))
+
+    def process_codebase(self, codebase, names, **kwargs):
+        names.extend(f["name"] for f in self.get_files(codebase, **kwargs))
+
+
+def test_run_output_plugins_with_partial_repeated_and_own_reads(tmp_path):
+    codebase = build_codebase(tmp_path / "codebase", files_count=250)
+    paths = []
+    partial_paths = []
+    names = []
+    twice = TwiceOutput()
+    errors = run_output_plugins(
+        [PartialOutput(), PathsOutput(), twice, NamesOutput()],
+        codebase,
+        chunk_size=10,
+        max_chunks=2,
+        paths=paths,
+        partial_paths=partial_paths,
+        names=names,
+        strip_root=True,
+    )
+    assert len(partial_paths) == 5
+    assert len(paths) == 250
+    assert len(names) == 250
+    assert [plugin for plugin, _error in errors] == [twice]
+    assert isinstance(errors[0][1], PlugincodeError)
+
+
+class Sha1Output(OutputPlugin):
+    output_fields = ["sha1"]
+
+
+def test_get_files_with_fields_projection(tmp_path):
+    codebase = build_codebase(tmp_path / "codebase", files_count=2)
+    files = list(Sha1Output.get_files(codebase, strip_root=True))
+    assert files == [dict(path="file0.txt"), dict(path="file1.txt")]
+
+    files = list(OutputPlugin.get_files(codebase, strip_root=True, fields=["type"]))
+    assert files == [dict(path="file0.txt", type="file"), dict(path="file1.txt", type="file")]
@@ -8,9 +8,27 @@
 
 def test_plugincode_can_be_imported():
     import plugincode  # NOQA
+    from plugincode import accumulators  # NOQA
+    from plugincode import aggregation  # NOQA
+    from plugincode import arrow  # NOQA
+    from plugincode import binary  # NOQA
+    from plugincode import checkpoint  # NOQA
+    from plugincode import columnar  # NOQA
+    from plugincode import compression  # NOQA
+    from plugincode import delta  # NOQA
+    from plugincode import encoders  # NOQA
+    from plugincode import execution  # NOQA
+    from plugincode import filtering  # NOQA
+    from plugincode import incremental  # NOQA
+    from plugincode import jsonlines  # NOQA
     from plugincode import location_provider  # NOQA
     from plugincode import output_filter  # NOQA
     from plugincode import output  # NOQA
     from plugincode import post_scan  # NOQA
     from plugincode import pre_scan  # NOQA
+    from plugincode import priority  # NOQA
     from plugincode import scan  # NOQA
+    from plugincode import serializers  # NOQA
+    from plugincode import sharding  # NOQA
+    from plugincode import timing  # NOQA
+    from plugincode import tracing  # NOQA
@@ -0,0 +1,64 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/plugincode for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+
+from commoncode.resource import Codebase
+
+from plugincode.priority import build_extension_priority
+from plugincode.priority import get_default_priority
+from plugincode.priority import get_plugins_priority
+from plugincode.priority import iter_by_priority
+from plugincode.scan import ScanPlugin
+
+
+def build_codebase(base_dir):
+    for path in (
+        "src/deep/main.c",
+        "src/deep/LICENSE.txt",
+        "src/util.c",
+        "src/package.json",
+        "README",
+        "COPYING",
+    ):
+        location = base_dir.joinpath(path)
+        location.parent.mkdir(parents=True, exist_ok=True)
+        location.write_text(path)
+    return Codebase(str(base_dir))
+
+
+def test_iter_by_priority_with_default_priority(tmp_path):
+    codebase = build_codebase(tmp_path / "codebase")
+    files = [r for r in codebase.walk() if r.is_file]
+    results = [r.path for r in iter_by_priority(files, get_default_priority())]
+    assert results == [
+        "codebase/src/package.json",
+        "codebase/COPYING",
+        "codebase/src/deep/LICENSE.txt",
+        "codebase/README",
+        "codebase/src/util.c",
+        "codebase/src/deep/main.c",
+    ]
+
+
+def test_iter_by_priority_without_priority_keeps_order(tmp_path):
+    codebase = build_codebase(tmp_path / "codebase")
+    files = [r for r in codebase.walk() if r.is_file]
+    assert list(iter_by_priority(files)) == files
+
+
+class SourcesFirst(ScanPlugin):
+    def get_resource_priority(self, **kwargs):
+        return build_extension_priority([".c"])
+
+
+def test_get_plugins_priority(tmp_path):
+    codebase = build_codebase(tmp_path / "codebase")
+    files = [r for r in codebase.walk() if r.is_file]
+    assert get_plugins_priority([ScanPlugin()]) is None
+
+    priority = get_plugins_priority([ScanPlugin(), SourcesFirst()])
+    results = [r.name for r in iter_by_priority(files, priority)][:2]
+    assert results == ["util.c", "main.c"]
@@ -0,0 +1,78 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/plugincode for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+
+import itertools
+
+import attr
+from commoncode.resource import Codebase
+
+from plugincode.serializers import get_serializer
+
+
+@attr.s
+class Holder(object):
+    name = attr.ib()
+    years = attr.ib(default=attr.Factory(tuple))
+
+
+def test_serializers_are_the_same_as_to_dict(tmp_path):
+    base_dir = tmp_path / "codebase"
+    base_dir.joinpath("dir").mkdir(parents=True)
+    base_dir.joinpath("dir", "a.c").write_text("a")
+    base_dir.joinpath("b.txt").write_text("b")
+    attributes = dict(
+        sha1=attr.ib(default=None),
+        holders=attr.ib(default=attr.Factory(list)),
+        extra=attr.ib(default=attr.Factory(dict)),
+    )
+    codebase = Codebase(str(base_dir), resource_attributes=attributes)
+    for resource in codebase.walk():
+        resource.sha1 = "abc"
+        resource.holders = [Holder("h", (2020, 2021)), dict(name={"x"})]
+        resource.extra = {"k": [1, (2, 3)]}
+        resource.scan_errors = ["error"]
+        codebase.save_resource(resource)
+
+    resource_class = codebase.resource_class
+    for flags in itertools.product([False, True], repeat=4):
+        with_info, with_timing, full_root, strip_root = flags
+        options = dict(
+            with_info=with_info, with_timing=with_timing, full_root=full_root, strip_root=strip_root
+        )
+        serializer = get_serializer(resource_class, **options)
+        assert get_serializer(resource_class, **options) is serializer
+        for resource in codebase.walk():
+            expected = resource.to_dict(**options)
+            result = serializer(resource)
+            assert result == expected
+            assert list(result) == list(expected)
+
+
+class ExplodingList(list):
+    def __iter__(self):
+        raise Exception("unrequested field should not be serialized")
+
+
+def test_serializer_with_fields_projection(tmp_path):
+    base_dir = tmp_path / "codebase"
+    base_dir.mkdir()
+    base_dir.joinpath("a.c").write_text("a")
+    attributes = dict(
+        sha1=attr.ib(default=None),
+        holders=attr.ib(default=attr.Factory(list)),
+    )
+    codebase = Codebase(str(base_dir), resource_attributes=attributes)
+    serializer = get_serializer(
+        codebase.resource_class, with_info=True, fields=["sha1", "size", "path"]
+    )
+    for resource in codebase.walk():
+        resource.sha1 = "abc"
+        expected = resource.to_dict(with_info=True)
+        expected = {k: v for k, v in expected.items() if k in ("path", "sha1", "size")}
+        resource.holders = ExplodingList([1])
+        assert serializer(resource) == expected
+        assert list(serializer(resource)) == ["path", "size", "sha1"]
@@ -0,0 +1,104 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/plugincode for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+
+import json
+
+from commoncode.resource import Codebase
+import pytest
+
+from plugincode import PlugincodeError
+from plugincode.output import OutputPlugin
+from plugincode.sharding import get_manifest_location
+from plugincode.sharding import write_shards
+
+
+class JsonOutput(OutputPlugin):
+    def process_codebase(self, codebase, output, **kwargs):
+        output.write('{"shard": ')
+        output.write(json.dumps(kwargs["shard"]))
+        output.write(', "files": ')
+        self.write_json_files(codebase, output, **kwargs)
+        output.write("}")
+
+
+class FailingOutput(OutputPlugin):
+    def process_codebase(self, codebase, output, **kwargs):
+        raise Exception("failed")
+
+
+def build_codebase(base_dir):
+    for directory in ("a", "b/c", "d"):
+        base_dir.joinpath(directory).mkdir(parents=True)
+        for i in range(3):
+            base_dir.joinpath(directory, "file{}.txt".format(i)).write_text("content")
+    base_dir.joinpath("top.txt").write_text("content")
+    return Codebase(str(base_dir))
+
+
+def load_shards(output_location):
+    with open(get_manifest_location(output_location)) as manifest_file:
+        manifest = json.load(manifest_file)
+    shards = []
+    for shard in manifest["shards"]:
+        with open(output_location.parent / shard["location"]) as shard_file:
+            shards.append(json.load(shard_file))
+    return manifest, shards
+
+
+@pytest.mark.parametrize("strategy", ["directory", "hash", "count"])
+def test_write_shards_keeps_all_files(tmp_path, strategy):
+    codebase = build_codebase(tmp_path / "codebase")
+    output_location = tmp_path / "scan.json"
+    manifest = write_shards(
+        JsonOutput(),
+        codebase,
+        str(output_location),
+        strategy=strategy,
+        shards_count=3,
+        shard_size=4,
+        chunk_size=2,
+    )
+    expected = list(OutputPlugin.get_files(codebase))
+    assert manifest["files_count"] == len(expected)
+
+    saved_manifest, shards = load_shards(output_location)
+    assert saved_manifest == manifest
+    files = []
+    for shard, shard_info in zip(shards, manifest["shards"]):
+        assert shard["shard"]["key"] == shard_info["key"]
+        assert len(shard["files"]) == shard_info["files_count"]
+        files.extend(shard["files"])
+    assert sorted(f["path"] for f in files) == sorted(f["path"] for f in expected)
+
+
+def test_write_shards_by_directory(tmp_path):
+    codebase = build_codebase(tmp_path / "codebase")
+    output_location = tmp_path / "scan.json"
+    manifest = write_shards(
+        JsonOutput(), codebase, str(output_location), strategy="directory", strip_root=True
+    )
+    keys = [s["key"] for s in manifest["shards"]]
+    assert keys == ["", "a", "b", "d"]
+    _manifest, shards = load_shards(output_location)
+    assert [f["path"] for f in shards[0]["files"]] == ["top.txt"]
+    assert all(f["path"].startswith("b") for f in shards[2]["files"])
+
+
+def test_write_shards_by_count(tmp_path):
+    codebase = build_codebase(tmp_path / "codebase")
+    manifest = write_shards(
+        JsonOutput(), codebase, str(tmp_path / "scan.json"), strategy="count", shard_size=5
+    )
+    assert [s["files_count"] for s in manifest["shards"]] == [5, 5, 5]
+
+
+def test_write_shards_raises_on_errors(tmp_path):
+    codebase = build_codebase(tmp_path / "codebase")
+    with pytest.raises(PlugincodeError):
+        write_shards(FailingOutput(), codebase, str(tmp_path / "scan.json"), shard_size=2)
+    with pytest.raises(PlugincodeError):
+        write_shards(JsonOutput(), codebase, str(tmp_path / "scan.json"), strategy="unknown")
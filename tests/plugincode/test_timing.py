@@ -0,0 +1,60 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/plugincode for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+
+import io
+import json
+
+from commoncode.resource import Codebase
+
+from plugincode.timing import LogHistogram
+from plugincode.timing import TimingCollector
+from plugincode.timing import collect_codebase_timings
+from plugincode.timing import timing_codebase_attributes
+
+
+def test_log_histogram_percentiles_are_within_bucket_error():
+    histo = LogHistogram()
+    for i in range(1, 101):
+        histo.add(i / 1000.0)
+    assert histo.count == 100
+    assert histo.max == 0.1
+    assert 0.050 <= histo.percentile(50) <= 0.050 * histo.growth
+    assert 0.095 <= histo.percentile(95) <= 0.095 * histo.growth
+    assert histo.percentile(100) == 0.1
+
+
+def test_timing_collector_merge_and_report():
+    collector1 = TimingCollector(top_n=2)
+    collector1.record("scan:licenses", "a", wall=0.5, cpu=0.4)
+    collector1.record("scan:licenses", "b", wall=0.1, cpu=0.1)
+    collector2 = TimingCollector(top_n=2)
+    collector2.record("scan:licenses", "c", wall=2.0, cpu=1.5)
+    collector2.record("scan:info", "c", wall=0.01, cpu=0.01)
+    collector1.merge(collector2)
+
+    report = collector1.to_dict()
+    assert sorted(report) == ["scan:info", "scan:licenses"]
+    licenses = report["scan:licenses"]
+    assert licenses["wall"]["count"] == 3
+    assert licenses["wall"]["max"] == 2.0
+    assert licenses["slowest"] == [dict(path="c", wall=2.0), dict(path="a", wall=0.5)]
+
+    output = io.StringIO()
+    collector1.write_report(output)
+    assert json.loads(output.getvalue()) == json.loads(json.dumps(report))
+
+
+def test_collect_codebase_timings_sets_codebase_attributes(tmp_path):
+    tmp_path.joinpath("a.txt").write_text("a")
+    codebase = Codebase(str(tmp_path), codebase_attributes=timing_codebase_attributes)
+    resource = codebase.get_resource(tmp_path.name + "/a.txt")
+    resource.scan_timings = {"licenses": 0.2}
+    codebase.save_resource(resource)
+
+    collector = collect_codebase_timings(codebase)
+    collector.set_codebase_attributes(codebase)
+    assert codebase.attributes.plugin_timings["licenses"]["wall"]["count"] == 1
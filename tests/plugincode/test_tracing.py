@@ -0,0 +1,141 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/plugincode for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+
+import gc
+import json
+import os
+
+from pluggy import HookimplMarker
+from pluggy import HookspecMarker
+from pluggy import PluginManager as PluggyPluginManager
+
+from plugincode.tracing import NOOP_SPAN
+from plugincode.tracing import Tracer
+from plugincode.tracing import merge_traces
+
+
+def test_disabled_tracer_returns_noop_span():
+    tracer = Tracer()
+    assert tracer.span("foo") is NOOP_SPAN
+    assert tracer.call("foo", sum, [1, 2]) == 3
+    assert not tracer.events
+
+
+def test_tracer_records_spans_and_merges_traces(tmp_path):
+    trace_dir = str(tmp_path / "traces")
+    tracer = Tracer()
+    tracer.enable(trace_dir)
+    with tracer.span("setup", stage="scan"):
+        pass
+    assert tracer.call("process_codebase", sum, [1, 2]) == 3
+    tracer.dump()
+
+    output = str(tmp_path / "trace.json")
+    assert merge_traces(trace_dir, output) == 2
+    with open(output) as trace:
+        events = json.load(trace)["traceEvents"]
+    assert [e["name"] for e in events] == ["setup", "process_codebase"]
+    assert events[0]["args"] == dict(stage="scan")
+    assert all(e["ph"] == "X" and e["pid"] == os.getpid() for e in events)
+
+
+def test_tracer_sampling_and_ring_buffer(tmp_path):
+    tracer = Tracer()
+    tracer.enable(str(tmp_path), sample_rate=0.0)
+    for _ in range(10):
+        with tracer.span("foo"):
+            pass
+    assert not tracer.events
+
+    tracer.enable(str(tmp_path), buffer_size=3)
+    for _ in range(10):
+        with tracer.span("foo"):
+            pass
+    assert len(tracer.events) == 3
+
+
+hookspec = HookspecMarker("traced")
+hookimpl = HookimplMarker("traced")
+
+
+class TracedSpec(object):
+    @hookspec
+    def compute(self, value):
+        pass
+
+
+class TracedImpl(object):
+    @hookimpl
+    def compute(self, value):
+        return value * 2
+
+
+def test_tracer_traces_hook_calls_of_managers_registered_before_enable(tmp_path):
+    manager = PluggyPluginManager("traced")
+    manager.add_hookspecs(TracedSpec)
+    manager.register(TracedImpl())
+    tracer = Tracer()
+    tracer.register_manager(manager)
+    assert manager.hook.compute(value=1) == [2]
+    assert not tracer.events
+
+    tracer.enable(str(tmp_path))
+    assert manager.hook.compute(value=2) == [4]
+    assert [e["name"] for e in tracer.events] == ["compute"]
+    assert tracer.events[0]["cat"] == "hook"
+
+    tracer.disable()
+    manager.hook.compute(value=3)
+    tracer.enable(str(tmp_path))
+    assert not tracer.events
+    manager.hook.compute(value=3)
+    assert len(tracer.events) == 1
+
+
+def get_traced_manager():
+    manager = PluggyPluginManager("traced")
+    manager.add_hookspecs(TracedSpec)
+    manager.register(TracedImpl())
+    return manager
+
+
+def test_tracer_samples_hook_calls(tmp_path):
+    manager = get_traced_manager()
+    tracer = Tracer()
+    tracer.register_manager(manager)
+    tracer.enable(str(tmp_path), sample_rate=0.0)
+    for i in range(10):
+        manager.hook.compute(value=i)
+    assert not tracer.events
+
+    tracer.sample_rate = 1.0
+    manager.hook.compute(value=1)
+    assert len(tracer.events) == 1
+
+
+def test_tracer_does_not_keep_registered_managers_alive(tmp_path):
+    tracer = Tracer()
+    tracer.register_manager(get_traced_manager())
+    gc.collect()
+    assert len(tracer.pluggy_managers) == 0
+
+    manager = get_traced_manager()
+    tracer.register_manager(manager)
+    tracer.enable(str(tmp_path))
+    tracer.unregister_manager(manager)
+    assert len(tracer.pluggy_managers) == 0
+    assert not tracer.undo_hook_tracing
+    manager.hook.compute(value=1)
+    assert not tracer.events
+
+
+def test_plugin_managers_are_registered_with_the_global_tracer():
+    from plugincode.scan import scan_plugins
+    from plugincode.tracing import tracer
+
+    assert scan_plugins.manager in tracer.pluggy_managers
+    assert not tracer.undo_hook_tracing